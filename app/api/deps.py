@@ -1,3 +1,3 @@
-from app.core.database import get_db
+from app.core.database import AsyncDatabase, get_async_db, get_db
 
-__all__ = ["get_db"]
+__all__ = ["AsyncDatabase", "get_async_db", "get_db"]
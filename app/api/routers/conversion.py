@@ -1,10 +1,11 @@
 import os
-from fastapi import APIRouter, HTTPException, Query
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from app.core.config import settings
 from app.api.deps import get_db
 from fastapi import Depends
-from app.services import file_service, xmind_service
+from app.services import file_service, testcase_store, xmind_service
+from app.services.export_cache import export_cache
 
 from urllib.parse import quote
 
@@ -17,96 +18,149 @@ def download_uploaded_file(filename: str):
         raise HTTPException(status_code=404, detail="File not found")
     return FileResponse(file_path)
 
+def parse_case_filter(cases):
+    """Case indices selected by the `cases` query parameter, None when every case is exported."""
+    if not cases:
+        return None
+    return [int(i) for i in cases.split(',') if i.strip().isdigit()]
+
+def load_record_testcases(db, record, case_filter=None):
+    """Test cases stored with a record, filtered by index; None when the XMind file must be parsed instead.
+
+    Only the selected rows are read, a few cases out of a large record cost a few rows.
+    """
+    if not record or not record.get('content_hash'):
+        return None
+    return testcase_store.load_testcases(db, record['id'], ordinals=case_filter)
+
+def etag_matches(if_none_match, etag: str) -> bool:
+    """Whether an `If-None-Match` header matches an ETag: `*`, or any tag of its list, compared weakly (RFC 9110)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if (tag[2:] if tag.startswith('W/') else tag) == opaque:
+            return True
+    return False
+
+def attachment_headers(download_name: str):
+    return {"Content-Disposition": f"attachment; filename*=UTF-8''{quote(download_name)}"}
+
 @router.get("/{filename}/to/testlink", name="download_testlink_file")
 def download_testlink_file(filename: str, cases: str = Query(None), db=Depends(get_db)):
     record = file_service.get_record_by_filename(db, filename)
-    testsuites = None
-    if record and record['content']:
-        import json
-        try:
-            testcases = json.loads(record['content'])
-            
-            # Filter by cases (indices) if provided
-            if cases:
-                indices = [int(i) for i in cases.split(',') if i.strip().isdigit()]
-                testcases = [testcases[i] for i in indices if 0 <= i < len(testcases)]
-                
-            root_name = os.path.splitext(filename)[0]
-            testsuites = xmind_service.reconstruct_testsuites_from_db_list(testcases, root_name=root_name)
-        except:
-            pass
-            
-    result_file = xmind_service.convert_to_testlink(filename, testsuites=testsuites)
-    if not result_file:
-         raise HTTPException(status_code=404, detail="Conversion failed or file not found")
-    
-    encoded_filename = quote(os.path.basename(result_file))
-    return FileResponse(
-        result_file, 
-        headers={"Content-Disposition": f"attachment; filename*=UTF-8''{encoded_filename}"}
+    source_hash = xmind_service.export_source_hash(filename, record)
+    if source_hash is None:
+        raise HTTPException(status_code=404, detail="Conversion failed or file not found")
+
+    case_filter = parse_case_filter(cases)
+    root_name = os.path.splitext(filename)[0]
+    headers = attachment_headers(root_name + '.xml')
+
+    def build_testsuites():
+        testcases = load_record_testcases(db, record, case_filter)
+        if testcases is None:
+            return None
+        return xmind_service.reconstruct_testsuites_from_db_list(testcases, root_name=root_name)
+
+    if not export_cache.enabled:
+        # the xml is written straight into the response as the suites are iterated, no temp file
+        xml_stream = xmind_service.stream_testlink(filename, testsuites=build_testsuites())
+        return StreamingResponse(xml_stream, media_type="application/xml", headers=headers)
+
+    key = export_cache.make_key(source_hash, 'testlink', case_filter, {'root_name': root_name})
+    result_file = export_cache.get_or_create(
+        key, '.xml', lambda path: xmind_service.write_testlink(filename, path, testsuites=build_testsuites())
     )
+    return FileResponse(result_file, media_type="application/xml", headers=headers)
 
 @router.get("/{filename}/to/zentao", name="download_zentao_file")
-def download_zentao_file(filename: str, cases: str = Query(None), db=Depends(get_db)):
+def download_zentao_file(filename: str, cases: str = Query(None), encoding: str = Query("utf8"), db=Depends(get_db)):
+    if encoding.lower() not in xmind_service.ZENTAO_ENCODINGS:
+        raise HTTPException(status_code=400, detail=f"Unsupported encoding: {encoding}")
+
     record = file_service.get_record_by_filename(db, filename)
-    testcases = None
-    case_type = None
-    apply_phase = None
-    if record:
-        case_type = record.get('case_type')
-        apply_phase = record.get('apply_phase')
-        if record.get('content'):
-            import json
-            try:
-                testcases = json.loads(record['content'])
-                
-                # Filter by cases (indices) if provided
-                if cases:
-                    indices = [int(i) for i in cases.split(',') if i.strip().isdigit()]
-                    testcases = [testcases[i] for i in indices if 0 <= i < len(testcases)]
-            except:
-                pass
-
-    result_file = xmind_service.convert_to_zentao(filename, testcases=testcases, case_type=case_type, apply_phase=apply_phase)
-    if not result_file:
+    source_hash = xmind_service.export_source_hash(filename, record)
+    if source_hash is None:
         raise HTTPException(status_code=404, detail="Conversion failed or file not found")
-        
-    encoded_filename = quote(os.path.basename(result_file))
-    return FileResponse(
-        result_file, 
-        headers={"Content-Disposition": f"attachment; filename*=UTF-8''{encoded_filename}"}
+
+    case_filter = parse_case_filter(cases)
+    options = {
+        'case_type': record.get('case_type') if record else None,
+        'apply_phase': record.get('apply_phase') if record else None,
+        'encoding': encoding.lower()
+    }
+    media_type = f"text/csv; charset={xmind_service.ZENTAO_ENCODINGS[options['encoding']]}"
+    headers = attachment_headers(os.path.splitext(filename)[0] + '.csv')
+
+    if not export_cache.enabled:
+        # encoded csv chunks go straight into the response, nothing is written to disk
+        csv_stream = xmind_service.stream_zentao(filename, testcases=load_record_testcases(db, record, case_filter), **options)
+        return StreamingResponse(csv_stream, media_type=media_type, headers=headers)
+
+    key = export_cache.make_key(source_hash, 'zentao', case_filter, options)
+    result_file = export_cache.get_or_create(
+        key, '.csv',
+        lambda path: xmind_service.write_zentao(filename, path, testcases=load_record_testcases(db, record, case_filter), **options)
+    )
+    return FileResponse(result_file, media_type=media_type, headers=headers)
+
+@router.get("/{filename}/to/xlsx", name="download_xlsx_file")
+def download_xlsx_file(filename: str, cases: str = Query(None), db=Depends(get_db)):
+    record = file_service.get_record_by_filename(db, filename)
+    source_hash = xmind_service.export_source_hash(filename, record)
+    if source_hash is None:
+        raise HTTPException(status_code=404, detail="Conversion failed or file not found")
+
+    case_filter = parse_case_filter(cases)
+    options = {
+        'case_type': record.get('case_type') if record else None,
+        'apply_phase': record.get('apply_phase') if record else None
+    }
+    headers = attachment_headers(os.path.splitext(filename)[0] + '.xlsx')
+
+    if not export_cache.enabled:
+        # the sheet is written row by row into the zip stream, nothing is written to disk
+        xlsx_stream = xmind_service.stream_xlsx(filename, testcases=load_record_testcases(db, record, case_filter), **options)
+        return StreamingResponse(xlsx_stream, media_type=xmind_service.XLSX_MEDIA_TYPE, headers=headers)
+
+    key = export_cache.make_key(source_hash, 'xlsx', case_filter, options)
+    result_file = export_cache.get_or_create(
+        key, '.xlsx',
+        lambda path: xmind_service.write_xlsx(filename, path, testcases=load_record_testcases(db, record, case_filter), **options)
     )
+    return FileResponse(result_file, media_type=xmind_service.XLSX_MEDIA_TYPE, headers=headers)
 
 @router.get("/{filename}/to/xmind", name="download_xmind_file")
-def download_xmind_file(filename: str, cases: str = Query(None), db=Depends(get_db)):
+def download_xmind_file(request: Request, filename: str, cases: str = Query(None), db=Depends(get_db)):
     record = file_service.get_record_by_filename(db, filename)
-    testsuites = None
-    if record and record['content']:
-        import json
-        try:
-            testcases = json.loads(record['content'])
-            
-            # Filter by cases (indices) if provided
-            if cases:
-                indices = [int(i) for i in cases.split(',') if i.strip().isdigit()]
-                testcases = [testcases[i] for i in indices if 0 <= i < len(testcases)]
-                
-            root_name = os.path.splitext(filename)[0]
-            testsuites = xmind_service.reconstruct_testsuites_from_db_list(testcases, root_name=root_name)
-        except:
-            pass
-
-    xmind_stream = xmind_service.convert_to_xmind(filename, testsuites=testsuites)
-    if not xmind_stream:
-        # Fallback if no DB content or conversion fails? 
-        # Actually xmind_service.convert_to_xmind only works with testsuites.
+    if not record or not record.get('content_hash'):
+        # the xmind export is rebuilt from the record, an uploaded file is its own xmind
         raise HTTPException(status_code=404, detail="Conversion failed or no data found")
-        
-    # Return stream as file
-    from fastapi.responses import StreamingResponse
-    encoded_filename = quote(filename)
-    return StreamingResponse(
-        xmind_stream, 
-        media_type="application/zip", 
-        headers={"Content-Disposition": f"attachment; filename*=UTF-8''{encoded_filename}"}
+
+    case_filter = parse_case_filter(cases)
+    root_name = os.path.splitext(filename)[0]
+    # the writer is deterministic, so the cache key identifies the exact bytes; a client that
+    # already has them is answered before any test case is read
+    key = export_cache.make_key(xmind_service.export_source_hash(filename, record), 'xmind', case_filter,
+                                {'root_name': root_name})
+    headers = dict(attachment_headers(filename), ETag=f'"{key}"')
+    if etag_matches(request.headers.get('if-none-match'), headers['ETag']):
+        return Response(status_code=304, headers={'ETag': headers['ETag']})
+
+    def build_testsuites():
+        testcases = load_record_testcases(db, record, case_filter)
+        return xmind_service.reconstruct_testsuites_from_db_list(testcases, root_name=root_name)
+
+    if not export_cache.enabled:
+        # the archive is streamed as it is written, the same bytes as the cached file
+        xmind_stream = xmind_service.stream_xmind(filename, build_testsuites())
+        return StreamingResponse(xmind_stream, media_type="application/zip", headers=headers)
+
+    result_file = export_cache.get_or_create(
+        key, '.xmind', lambda path: xmind_service.write_xmind(filename, path, build_testsuites())
     )
+    return FileResponse(result_file, media_type="application/zip", headers=headers)
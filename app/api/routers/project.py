@@ -3,6 +3,7 @@ from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from app.api.deps import get_db
+from app.services import stats_store
 
 router = APIRouter()
 
@@ -90,8 +91,7 @@ def delete_project(project_id: int, db: sqlite3.Connection = Depends(get_db)):
     cursor = db.cursor()
     
     # Safety Check: 如果项目下还存在测试记录，则不允许删除
-    cursor.execute("SELECT COUNT(*) FROM records WHERE project_id = ?", (project_id,))
-    record_count = cursor.fetchone()[0]
+    record_count = stats_store.project_record_count(db, project_id)
     
     if record_count > 0:
         raise HTTPException(
@@ -1,12 +1,14 @@
 import sqlite3
-import json
+import os
 from urllib.parse import quote
-from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi import APIRouter, Depends, HTTPException, Body, Query, Request
 from pydantic import BaseModel
 from typing import Any, Dict, List
-from app.api.deps import get_db
-from app.services import file_service
-from fastapi.responses import Response
+from app.api.deps import AsyncDatabase, get_async_db, get_db
+from app.lib.xmind2testcase import compact
+from app.api.routers.conversion import parse_case_filter
+from app.services import file_service, report_service, stats_store, testcase_store
+from fastapi.responses import Response, StreamingResponse
 
 router = APIRouter()
 
@@ -14,6 +16,14 @@ class RecordUpdate(BaseModel):
     name: str = None
     note: str = None
     content: List[Dict[str, Any]] = None # List of suites/cases
+    version: int = None # Version `content` is an edit of, required with `content`
+
+class CasePatch(BaseModel):
+    version: int # Version the operations are based on
+    ops: List[Dict[str, Any]] # See testcase_store.apply_ops
+
+def version_conflict(e: testcase_store.VersionConflict):
+    return HTTPException(status_code=409, detail={"message": "Record was modified, reload it", "version": e.version})
 
 @router.put("/{record_id}")
 def update_record(record_id: int, update: RecordUpdate, db: sqlite3.Connection = Depends(get_db)):
@@ -35,172 +45,142 @@ def update_record(record_id: int, update: RecordUpdate, db: sqlite3.Connection =
         fields.append("note = ?")
         values.append(update.note)
         
-    if update.content is not None:
-        fields.append("content = ?")
-        values.append(json.dumps(update.content))
-        
-    if not fields:
+    if not fields and update.content is None:
          return {"status": "no changes"}
+
+    if update.content is not None and update.version is None:
+        # a whole-list save without a base version would overwrite every edit saved since
+        raise HTTPException(status_code=428, detail="version is required to save content")
          
-    values.append(record_id)
-    sql = f"UPDATE records SET {', '.join(fields)} WHERE id = ?"
-    cursor.execute(sql, tuple(values))
+    if fields:
+        values.append(record_id)
+        sql = f"UPDATE records SET {', '.join(fields)} WHERE id = ?"
+        cursor.execute(sql, tuple(values))
+
+    if update.content is not None:
+        try:
+            version = testcase_store.save_testcases(db, record_id, update.content, base_version=update.version)
+        except testcase_store.VersionConflict as e:
+            db.rollback()
+            raise version_conflict(e)
     db.commit()
     
+    if update.content is not None:
+        return {"status": "success", "version": version}
     return {"status": "success"}
 
-@router.get("/{record_id}/content")
-def get_record_content(record_id: int, db: sqlite3.Connection = Depends(get_db)):
+@router.patch("/{record_id}/cases", name="patch_record_cases")
+def patch_record_cases(record_id: int, patch: CasePatch, db: sqlite3.Connection = Depends(get_db)):
+    """Apply a batch of per-case operations to the test cases of a record, in one transaction.
+
+    409 with the current version if the record was saved since `version`, 400 for an invalid operation.
+    """
     cursor = db.cursor()
-    cursor.execute("SELECT content FROM records WHERE id = ? AND is_deleted = 0", (record_id,))
-    row = cursor.fetchone()
-    if not row:
+    cursor.execute("SELECT id FROM records WHERE id = ? AND is_deleted = 0", (record_id,))
+    if not cursor.fetchone():
         raise HTTPException(status_code=404, detail="Record not found")
-        
-    content = row[0]
-    if not content:
-        return []
-        
+
     try:
-        return json.loads(content)
-    except json.JSONDecodeError:
-        return []
+        version = testcase_store.apply_ops(db, record_id, patch.version, patch.ops)
+    except testcase_store.VersionConflict as e:
+        db.rollback()
+        raise version_conflict(e)
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Invalid operation: {e}")
+    db.commit()
+    return {"status": "success", "version": version}
 
-@router.delete("/{record_id}")
-async def delete_record(record_id: int, db: sqlite3.Connection = Depends(get_db)):
-    """Delete a record and associated files"""
+@router.get("/{record_id}/content")
+def get_record_content(record_id: int, cases: str = Query(None), suite: str = Query(None), result: str = Query(None),
+                       db: sqlite3.Connection = Depends(get_db)):
+    """Test cases of a record, optionally only the ones at the `cases` indexes, of a suite or with a result."""
     cursor = db.cursor()
-    cursor.execute("SELECT name FROM records WHERE id = ? AND is_deleted = 0", (record_id,))
-    row = cursor.fetchone()
-    
-    if not row:
+    cursor.execute("SELECT id FROM records WHERE id = ? AND is_deleted = 0", (record_id,))
+    if not cursor.fetchone():
         raise HTTPException(status_code=404, detail="Record not found")
+
+    testcases = testcase_store.load_testcases(db, record_id, ordinals=parse_case_filter(cases), suite=suite, result=result)
+    return testcases if testcases is not None else []
+
+@router.delete("/{record_id}")
+async def delete_record(record_id: int, adb: AsyncDatabase = Depends(get_async_db)):
+    """Delete a record and associated files"""
+    def delete(db):
+        cursor = db.cursor()
+        cursor.execute("SELECT name FROM records WHERE id = ? AND is_deleted = 0", (record_id,))
+        row = cursor.fetchone()
         
-    filename = row[0]
-    file_service.delete_record(filename, record_id, db)
+        if not row:
+            raise HTTPException(status_code=404, detail="Record not found")
+            
+        filename = row[0]
+        file_service.delete_record(filename, record_id, db)
+
+    await adb.run(delete)
     
     return {"status": "success", "message": f"Record {record_id} deleted"}
 
-@router.get("/{record_id}/export", name="export_record")
-def export_record(record_id: int, db: sqlite3.Connection = Depends(get_db)):
+def load_record_content(db: sqlite3.Connection, record_id: int):
+    """Name and test cases of a record, 404 if it does not exist."""
     cursor = db.cursor()
-    cursor.execute("SELECT name, content FROM records WHERE id = ?", (record_id,))
+    cursor.execute("SELECT name FROM records WHERE id = ?", (record_id,))
     row = cursor.fetchone()
     if not row:
         raise HTTPException(status_code=404, detail="Record not found")
     
-    name, content = row
-    testcases = []
-    try:
-        testcases = json.loads(content) if content else []
-    except:
-        pass
-        
-    # --- Statistics Calculation ---
-    
-    # 1. Case Stats
-    total_cases = len(testcases)
-    case_stats = {'Pass': 0, 'Fail': 0, 'Block': 0, 'Skip': 0, 'Not Run': 0}
-    
-    # 2. Step Stats
-    step_stats = {'Total': 0, 'pass': 0, 'fail': 0, 'not_run': 0}
-    
-    # 3. Suite Stats
-    suite_stats = {} # {suite_name: {total, pass, fail, block, skip, not_run}}
-
-    for test in testcases:
-        # Case Stat
-        res = test.get('result', 'Not Run')
-        # Normalize result key to match our map if needed, but usually it's exact
-        if res not in case_stats:
-            case_stats['Not Run'] += 1
-        else:
-            case_stats[res] += 1
-            
-        # Step Stat
-        steps = test.get('steps', [])
-        for step in steps:
-            step_stats['Total'] += 1
-            s_status = step.get('status', 'not_run')
-            step_stats[s_status] = step_stats.get(s_status, 0) + 1
-            
-        # Suite Stat
-        suite = test.get('suite', 'Root')
-        if suite not in suite_stats:
-            suite_stats[suite] = {'Total': 0, 'Pass': 0, 'Fail': 0, 'Block': 0, 'Skip': 0, 'Not Run': 0}
-        
-        suite_stats[suite]['Total'] += 1
-        suite_stats[suite][res] = suite_stats[suite].get(res, 0) + 1
+    return row[0], testcase_store.load_testcases(db, record_id) or []
 
-    executed_cases = case_stats['Pass'] + case_stats['Fail'] + case_stats['Block']
-    
-    # --- Generate Report ---
-    report = f"""# {name.split('.')[0]}执行结果
-
-## 1. 用例执行统计
-- **用例总数**: {total_cases}
-- **已执行**: {executed_cases}
-- **通过**: {case_stats['Pass']}
-- **失败**: {case_stats['Fail']}
-- **阻塞**: {case_stats['Block']}
-- **跳过**: {case_stats['Skip']}
-
-## 2. 步骤执行统计
-- **步骤总数**: {step_stats['Total']}
-- **通过**: {step_stats['pass']}
-- **失败**: {step_stats['fail']}
-- **未执行**: {step_stats['not_run']}
-
-
-## 3. 详细记录
-
-| 序号 | 模块 | 用例名称 | 结果 | 步骤情况 | 备注 |  
-|---|---|---|---|---|---|"""
-    result_mapping = {
-        'Pass': '通过',
-        'Fail': '失败',
-        'Block': '阻塞',
-        'Skip': '跳过',
-        'Not Run': '未执行'
-    }
-
-    for idx, test in enumerate(testcases, 1):
-        raw_result = test.get('result', 'Not Run')
-        result = result_mapping.get(raw_result, raw_result)
-        
-        # Steps execution status
-        steps = test.get('steps', [])
-        step_summary = ""
-        if steps:
-            s_total = len(steps)
-            s_pass = sum(1 for s in steps if s.get('status') == 'pass')
-            s_fail = sum(1 for s in steps if s.get('status') == 'fail')
-            s_block = sum(1 for s in steps if s.get('status') == 'block')
-            
-            details = []
-            if s_pass: details.append(f"通过:{s_pass}")
-            if s_fail: details.append(f"失败:{s_fail}")
-            if s_block: details.append(f"阻塞:{s_block}")
-            
-            step_summary = f"总:{s_total}"
-            if details:
-                step_summary += f" ({', '.join(details)})"
-        
-        # Ensure values are strings to prevent crashes on None
-        comment = str(test.get('comment') or '')
-        suite = str(test.get('suite') or 'Root')
-        title = str(test.get('name') or '')
-        
-        # Simple cleanup
-        title = title.replace('|', '-').replace('\n', ' ')
-        comment = comment.replace('|', '-').replace('\n', ' ')
-        step_summary = step_summary.replace('|', '-')
+@router.get("/{record_id}/stats", name="record_stats")
+def record_stats(record_id: int, db: sqlite3.Connection = Depends(get_db)):
+    """Case, step and suite execution statistics of a record, the numbers of its report, counted by SQL."""
+    cursor = db.cursor()
+    cursor.execute("SELECT id FROM records WHERE id = ?", (record_id,))
+    if not cursor.fetchone():
+        raise HTTPException(status_code=404, detail="Record not found")
+    return testcase_store.record_stats(db, record_id)
+
+@router.get("/{record_id}/compact", name="export_record_compact")
+def export_record_compact(record_id: int, db: sqlite3.Connection = Depends(get_db)):
+    """Test cases of a record in the compact binary format (.xtc)."""
+    name, testcases = load_record_content(db, record_id)
+    encoded_filename = quote(os.path.splitext(name)[0] + compact.EXTENSION)
+    return Response(
+        content=compact.dumps(testcases),
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f"attachment; filename*=utf-8''{encoded_filename}"}
+    )
 
-        report += f"\n| {idx} | {suite} | {title} | {result} | {step_summary} | {comment} |"
+@router.put("/{record_id}/compact", name="import_record_compact")
+async def import_record_compact(record_id: int, request: Request, adb: AsyncDatabase = Depends(get_async_db)):
+    """Replace the test cases of a record by the ones of a compact binary file (.xtc) sent as the body."""
+    body = await request.body()
+
+    def save(db):
+        cursor = db.cursor()
+        cursor.execute("SELECT id FROM records WHERE id = ? AND is_deleted = 0", (record_id,))
+        if not cursor.fetchone():
+            raise HTTPException(status_code=404, detail="Record not found")
+
+        try:
+            testcases = compact.loads(body)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid compact testcase file: {e}")
+        testcase_store.save_testcases(db, record_id, testcases)
+        db.commit()
+        return testcases
+
+    testcases = await adb.run(save)
+    return {"status": "success", "cases": len(testcases)}
+
+@router.get("/{record_id}/export", name="export_record")
+def export_record(record_id: int, db: sqlite3.Connection = Depends(get_db)):
+    name, testcases = load_record_content(db, record_id)
+    stats = stats_store.load_record_stats(db, record_id)  # None for records saved before: counted by the report
         
     encoded_filename = quote(f"{name}_report.md")
-    return Response(
-        content=report, 
+    return StreamingResponse(
+        report_service.iter_markdown_report(name, testcases, stats=stats),
         media_type="text/markdown", 
         headers={"Content-Disposition": f"attachment; filename*=utf-8''{encoded_filename}"}
     )
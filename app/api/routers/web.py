@@ -1,12 +1,12 @@
+import asyncio
 import sqlite3
 import os
-import json
 from fastapi import APIRouter, Request, UploadFile, File, Depends, HTTPException, status, Form, Body
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 from app.core.config import settings
-from app.api.deps import get_db
-from app.services import file_service, xmind_service, automation_scanner
+from app.api.deps import AsyncDatabase, get_async_db, get_db
+from app.services import file_service, stats_store, testcase_store, xmind_service, export_service, automation_scanner
 
 router = APIRouter()
 templates = Jinja2Templates(directory=os.path.join(settings.APP_DIR, "templates"))
@@ -56,12 +56,16 @@ def fetch_configs(db: sqlite3.Connection):
     return configs, DynamicSettings(configs)
 
 @router.get("/configs", response_class=HTMLResponse, name="manage_configs")
-async def manage_configs(request: Request, db: sqlite3.Connection = Depends(get_db)):
-    configs, _ = fetch_configs(db)
+async def manage_configs(request: Request, adb: AsyncDatabase = Depends(get_async_db)):
+    configs, _ = await adb.run(fetch_configs)
     return templates.TemplateResponse("configs.html", {"request": request, "configs": configs})
 
 @router.post("/api/configs")
-async def update_configs(data: dict = Body(...), db: sqlite3.Connection = Depends(get_db)):
+async def update_configs(data: dict = Body(...), adb: AsyncDatabase = Depends(get_async_db)):
+    return await adb.run(save_configs, data)
+
+def save_configs(db: sqlite3.Connection, data: dict):
+    """更新配置并同步项目表（在数据库线程中执行）"""
     cursor = db.cursor()
     try:
         # 1. 更新配置表
@@ -80,8 +84,7 @@ async def update_configs(data: dict = Body(...), db: sqlite3.Connection = Depend
         removed_projects = set(current_projects.keys()) - new_project_names
         for p_name in removed_projects:
             p_id = current_projects[p_name]
-            cursor.execute("SELECT COUNT(*) FROM records WHERE project_id = ?", (p_id,))
-            record_count = cursor.fetchone()[0]
+            record_count = stats_store.project_record_count(db, p_id)
             if record_count > 0:
                 raise HTTPException(
                     status_code=400, 
@@ -108,15 +111,13 @@ async def update_configs(data: dict = Body(...), db: sqlite3.Connection = Depend
         return {"status": "error", "message": str(e)}
 
 @router.post("/api/projects/{project_id}/automation")
-async def update_project_automation(project_id: int, data: dict = Body(...), db: sqlite3.Connection = Depends(get_db)):
+async def update_project_automation(project_id: int, data: dict = Body(...), adb: AsyncDatabase = Depends(get_async_db)):
     path = data.get("playwright_project_path", "").strip()
-    cursor = db.cursor()
-    cursor.execute("""
+    await adb.execute("""
         INSERT INTO automation_configs (project_id, playwright_project_path) 
         VALUES (?, ?)
         ON CONFLICT(project_id) DO UPDATE SET playwright_project_path = excluded.playwright_project_path
     """, (project_id, path))
-    db.commit()
     return {"status": "success"}
 
 @router.get("/", response_class=HTMLResponse, name="index")
@@ -139,15 +140,10 @@ def index(request: Request, db: sqlite3.Connection = Depends(get_db)):
     today = datetime.now().strftime("%Y-%m-%d")
     week_ago = (datetime.now() - timedelta(days=7)).strftime("%Y-%m-%d")
     
-    cursor = db.cursor()
-    cursor.execute("SELECT COUNT(*) FROM records WHERE DATE(create_on) = ?", (today,))
-    today_count = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM records WHERE DATE(create_on) >= ?", (week_ago,))
-    week_count = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM records")
-    total_records = cursor.fetchone()[0]
+    # counters kept by file_service when records are created, no scan of the records
+    today_count = stats_store.created_count(db, day=today)
+    week_count = stats_store.created_count(db, since=week_ago)
+    total_records = stats_store.created_count(db)
     
     stats = {
         "today_count": today_count,
@@ -168,19 +164,30 @@ def index(request: Request, db: sqlite3.Connection = Depends(get_db)):
 @router.api_route("/index", methods=["GET", "POST"], response_class=HTMLResponse)
 async def index_redirect(
     request: Request, 
-    db: sqlite3.Connection = Depends(get_db),
+    adb: AsyncDatabase = Depends(get_async_db),
     file: UploadFile = File(None),
     project_id: int = Form(None),
     case_type: str = Form("功能测试"),
     apply_phase: str = Form("功能测试阶段")
 ):
-    """处理 /index 路由（支持 GET 和 POST）"""
-    if request.method == "POST":
-        # 调用上传处理函数
-        return upload_file(request, file, project_id, db, case_type, apply_phase)
-    else:
-        # GET 请求，显示首页
-        return index(request, db)
+    """处理 /index 路由（支持 GET 和 POST）
+
+    上传文件的保存与解析在普通工作线程中执行，数据库线程只用于写入记录与查询，
+    大文件解析不会占住数据库线程而阻塞其他路由。
+    """
+    if request.method == "POST" and project_id:
+        filename, testcases, _ = await asyncio.to_thread(file_service.receive_file, file)
+        if filename:
+            def insert(db):
+                file_service.insert_record(db, filename, project_id=project_id, testcases=testcases,
+                                           case_type=case_type, apply_phase=apply_phase)
+                file_service.delete_records_keep_latest(db)
+
+            await adb.run(insert)
+            return RedirectResponse(url=f"/preview/{filename}", status_code=status.HTTP_303_SEE_OTHER)
+
+    # GET 请求或上传失败，显示首页
+    return await adb.run(lambda db: index(request, db))
 
 @router.get("/favicon.ico")
 async def favicon():
@@ -265,24 +272,19 @@ def upload_file(
 @router.get("/preview/id/{record_id}", response_class=HTMLResponse, name="preview_record")
 def preview_record(request: Request, record_id: int, db: sqlite3.Connection = Depends(get_db)):
     cursor = db.cursor()
-    cursor.execute("SELECT id, name, content, project_id FROM records WHERE id = ? AND is_deleted <> 1", (record_id,))
+    cursor.execute("SELECT id, name, project_id, version FROM records WHERE id = ? AND is_deleted = 0", (record_id,))
     record = cursor.fetchone()
     if not record:
         raise HTTPException(status_code=404, detail="Record not found")
 
-    testcases = []
     # record is likely sqlite3.Row, but index access is safer if dict access is suspect
-    db_content = record[2] 
     record_name = record[1]
-    
-    if db_content:
-        try:
-            testcases = json.loads(db_content)
-        except Exception as e:
-            # Fallback to file parsing if DB content is corrupt
-            print(f"Error loading JSON for record {record_id}. Type: {type(db_content)}, Error: {e}")
-            testcases = xmind_service.get_testcases(record_name)
-    else:
+    record_project_id = record[2]
+
+    testcases = testcase_store.load_testcases(db, record_id)
+    stored = testcases is not None
+    if not stored:
+        # no stored test cases (or a corrupt legacy JSON text), parse the file
         testcases = xmind_service.get_testcases(record_name)
 
     # suite_count 统计
@@ -293,8 +295,8 @@ def preview_record(request: Request, record_id: int, db: sqlite3.Connection = De
 
     # Fetch automation bindings if project has config
     automation_bindings = []
-    if record[3]: # project_id
-        cursor.execute("SELECT playwright_project_path FROM automation_configs WHERE project_id = ?", (record[3],))
+    if record_project_id:
+        cursor.execute("SELECT playwright_project_path FROM automation_configs WHERE project_id = ?", (record_project_id,))
         auto_row = cursor.fetchone()
         if auto_row and auto_row[0]:
             found_ids = automation_scanner.scanner.scan_directory(auto_row[0])
@@ -306,7 +308,9 @@ def preview_record(request: Request, record_id: int, db: sqlite3.Connection = De
         "suite": testcases, 
         "suite_count": suite_count,
         "record_id": record[0],
-        "project_id": record[3],
+        "record_version": record[3],
+        "cases_stored": stored,
+        "project_id": record_project_id,
         "automation_bindings": automation_bindings,
         "settings": dyn_settings
     })
@@ -349,10 +353,8 @@ def delete_file(filename: str, record_id: int, db: sqlite3.Connection = Depends(
     return RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
 
 @router.post("/api/download-all")
-async def download_all(request: Request):
-    """Download all file formats (XMind, CSV, XML) as a ZIP"""
-    import zipfile
-    import io
+async def download_all(request: Request, adb: AsyncDatabase = Depends(get_async_db)):
+    """Download all file formats (XMind, XML, CSV, JSON) as a ZIP, generated from one parse"""
     from fastapi.responses import StreamingResponse
     
     form_data = await request.form()
@@ -361,34 +363,26 @@ async def download_all(request: Request):
     if not filename:
         raise HTTPException(status_code=400, detail="Filename is required")
     
-    # Prepare file paths
-    xmind_path = os.path.join(settings.UPLOAD_FOLDER, filename)
-    csv_path = os.path.join(settings.UPLOAD_FOLDER, filename.replace('.xmind', '.csv'))
-    xml_path = os.path.join(settings.UPLOAD_FOLDER, filename.replace('.xmind', '.xml'))
-    
-    # Create ZIP file in memory
-    zip_buffer = io.BytesIO()
-    
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        # Add XMind file
-        if os.path.exists(xmind_path):
-            zip_file.write(xmind_path, os.path.basename(xmind_path))
-        
-        # Add CSV file
-        if os.path.exists(csv_path):
-            zip_file.write(csv_path, os.path.basename(csv_path))
-        
-        # Add XML file
-        if os.path.exists(xml_path):
-            zip_file.write(xml_path, os.path.basename(xml_path))
-    
-    zip_buffer.seek(0)
+    def read(db):
+        record = file_service.get_record_by_filename(db, filename)
+        return record, export_service.read_record_testcases(db, record)
+
+    # only the queries hold a database thread, parsing and exporting run on a plain worker thread
+    record, testcases = await adb.run(read)
+    exported = await asyncio.to_thread(export_service.export_all, filename, record, testcases=testcases)
+    if exported is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    # the archive is streamed while the formats are generated, only the load time is known yet
+    zip_stream, timings = exported
     
     # Return ZIP file
     zip_filename = filename.replace('.xmind', '_all_formats.zip')
     
     return StreamingResponse(
-        zip_buffer,
+        zip_stream,
         media_type="application/zip",
-        headers={"Content-Disposition": f"attachment; filename={zip_filename}"}
+        headers={
+            "Content-Disposition": f"attachment; filename={zip_filename}",
+            "Server-Timing": export_service.server_timing(timings)
+        }
     )
@@ -5,11 +5,37 @@ class Settings:
     APP_DIR = os.path.join(BASE_DIR, 'app')
     UPLOAD_FOLDER = os.path.join(BASE_DIR, 'uploads')
     DATABASE_PATH = os.path.join(BASE_DIR, 'data.db3')
-    SCHEMA_PATH = os.path.join(BASE_DIR, 'schema.sql')
+    # 按版本顺序执行的数据库迁移脚本，已执行的版本记录在 schema_version 表
+    MIGRATIONS_DIR = os.path.join(BASE_DIR, 'migrations')
     LOG_FILE = os.path.join(BASE_DIR, 'running.log')
     ALLOWED_EXTENSIONS = {'xmind'}
     DEBUG = True
     
+    # 解析结果缓存（按文件内容 SHA-256 + 解析配置）
+    PARSE_CACHE_SIZE = 32
+    PARSE_CACHE_DISK = True
+    PARSE_CACHE_DIR = os.path.join(UPLOAD_FOLDER, '.parse_cache')
+    PARSE_CACHE_DISK_MAX_FILES = 256
+
+    # 导出文件缓存（按来源内容哈希 + 用例筛选 + 格式 + 导出选项），容量为 0 时不缓存、直接流式输出
+    EXPORT_CACHE_DIR = os.path.join(UPLOAD_FOLDER, '.exports')
+    EXPORT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+    EXPORT_CACHE_MAX_AGE = 7 * 24 * 3600
+    EXPORT_CACHE_GRACE = 60
+
+    # 多 sheet 工作簿并行解析：进程数（0/1 为串行），以及进入进程池的 sheet 最小主题数
+    PARSE_WORKERS = 0
+    PARSE_PARALLEL_MIN_TOPICS = 1000
+
+    # 数据库连接池：最大连接数、借连接的最长等待秒数，以及每个连接的 PRAGMA 设置
+    DB_POOL_SIZE = 8
+    DB_POOL_TIMEOUT = 30
+    DB_BUSY_TIMEOUT_MS = 5000
+    DB_MMAP_SIZE = 256 * 1024 * 1024
+    DB_CACHE_SIZE_KB = 16 * 1024
+    # async 路由的数据库线程数，每个线程一个独立连接
+    DB_EXECUTOR_WORKERS = 4
+
     # 功能开关
     ENABLE_ZENTAO = True
     ENABLE_TESTLINK = True
@@ -1,35 +1,283 @@
+import asyncio
 import sqlite3
 import logging
-import os
-from contextlib import closing
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
 from app.core.config import settings
+from app.core.migrations import migrate
 
-def get_db():
+
+def connect(path=None):
     """
-    依赖注入：提供数据库连接
-    
-    注意：设置 check_same_thread=False 以支持 FastAPI 的异步处理
-    这在 SQLite 中是安全的，因为我们使用了连接池模式
+    打开一个已配置好的数据库连接
+
+    check_same_thread=False：连接由连接池在线程池的不同线程间传递，但同一时刻只借给一个请求。
+    WAL 日志下读者不再被写者阻塞；synchronous=NORMAL 在 WAL 下仍保证一致性，只是断电时可能丢失最后几次提交。
     """
-    db = sqlite3.connect(
-        settings.DATABASE_PATH,
-        check_same_thread=False  # 允许在不同线程中使用连接
-    )
+    db = sqlite3.connect(path or settings.DATABASE_PATH, check_same_thread=False)
     db.row_factory = sqlite3.Row  # 返回字典式的行对象
-    try:
-        yield db
-    finally:
-        db.close()
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.execute(f"PRAGMA busy_timeout={int(settings.DB_BUSY_TIMEOUT_MS)}")
+    db.execute(f"PRAGMA mmap_size={int(settings.DB_MMAP_SIZE)}")
+    db.execute(f"PRAGMA cache_size={-int(settings.DB_CACHE_SIZE_KB)}")  # 负数表示 KiB
+    db.execute("PRAGMA temp_store=MEMORY")
+    return db
 
-def init_db():
-    """初始化数据库 Schema"""
-    if not os.path.exists(settings.DATABASE_PATH):
-        with closing(sqlite3.connect(
-            settings.DATABASE_PATH,
-            check_same_thread=False
-        )) as db:
-            with open(settings.SCHEMA_PATH, mode='r', encoding='utf-8') as f:
-                db.cursor().executescript(f.read())
+
+class ConnectionPool:
+    """
+    Bounded pool of SQLite connections to one database file.
+
+    Connections are opened lazily up to `max_size`, configured once by `connect` and then reused
+    request after request; when all of them are lent out, `acquire` waits up to `timeout` seconds.
+    Idle connections are handed out last-in first-out so the busiest ones keep a warm page cache.
+    A connection is always returned without an open transaction: uncommitted changes are rolled
+    back, just like closing a per-request connection used to discard them.
+    """
+
+    def __init__(self, path=None, max_size=None, timeout=None):
+        self.path = path or settings.DATABASE_PATH
+        self.max_size = max_size if max_size is not None else settings.DB_POOL_SIZE
+        self.timeout = timeout if timeout is not None else settings.DB_POOL_TIMEOUT
+        self._idle = []
+        self._open = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._counters = {"acquired": 0, "opened": 0, "discarded": 0, "waits": 0, "timeouts": 0}
+        self._wait_seconds = 0.0
+
+    def acquire(self) -> sqlite3.Connection:
+        deadline = None
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise sqlite3.ProgrammingError("connection pool is closed")
+                if self._idle:
+                    db = self._idle.pop()
+                    break
+                if self._open < self.max_size:
+                    self._open += 1
+                    db = None
+                    break
+
+                now = time.monotonic()
+                if deadline is None:
+                    deadline = now + self.timeout
+                    started = now
+                    self._counters["waits"] += 1
+                if now >= deadline:
+                    self._counters["timeouts"] += 1
+                    self._wait_seconds += now - started
+                    raise sqlite3.OperationalError(
+                        f"no database connection available after {self.timeout}s (pool size {self.max_size})")
+                self._cond.wait(deadline - now)
+
+            if deadline is not None:
+                self._wait_seconds += time.monotonic() - started
+            self._counters["acquired"] += 1
+
+        if db is None:
+            try:
+                db = connect(self.path)
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._counters["opened"] += 1
+        return db
+
+    def release(self, db: sqlite3.Connection):
+        reusable = True
+        try:
+            if db.in_transaction:
+                db.rollback()
+        except sqlite3.Error:
+            reusable = False
+
+        with self._cond:
+            if reusable and not self._closed:
+                self._idle.append(db)
+            else:
+                self._open -= 1
+                self._counters["discarded"] += 1
+                db.close()
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        db = self.acquire()
+        try:
+            yield db
+        finally:
+            self.release(db)
+
+    def close(self):
+        """Close the idle connections; the ones lent out are closed when they come back."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+            self._cond.notify_all()
+        for db in idle:
+            db.close()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return dict(self._counters, max_size=self.max_size, open=self._open, idle=len(self._idle),
+                        in_use=self._open - len(self._idle), wait_ms=round(self._wait_seconds * 1000, 3))
+
+
+class AsyncDatabase:
+    """
+    Database access for `async def` routes that keeps the event loop free.
+
+    `run(func, *args)` calls `func(db, *args)` on a dedicated executor of `max_workers` threads,
+    each with its own connection opened by `connect`, and awaits the result: a slow query, commit
+    or parse only occupies one of those threads while the loop keeps serving other requests, and
+    at most `max_workers` of them touch the database at once. Like the pool, whatever the function
+    left uncommitted is rolled back afterwards.
+    """
+
+    def __init__(self, path=None, max_workers=None):
+        self.path = path or settings.DATABASE_PATH
+        self.max_workers = max_workers or settings.DB_EXECUTOR_WORKERS
+        self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="db")
+        self._local = threading.local()
+        self._connections = []
+        self._closed = False
+        self._lock = threading.Lock()
+        self._counters = {"calls": 0, "errors": 0, "running": 0}
+
+    def _connection(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = connect(self.path)
+            with self._lock:
+                self._connections.append(db)
+        return db
+
+    def _call(self, func, args, kwargs):
+        with self._lock:
+            self._counters["running"] += 1
+        db = self._connection()
+        try:
+            return func(db, *args, **kwargs)
+        except BaseException:
+            with self._lock:
+                self._counters["errors"] += 1
+            raise
+        finally:
+            if db.in_transaction:
+                db.rollback()
+            with self._lock:
+                self._counters["running"] -= 1
+                self._counters["calls"] += 1
+
+    async def run(self, func, *args, **kwargs):
+        if self._closed:
+            raise sqlite3.ProgrammingError("database executor is closed")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._call, func, args, kwargs)
+
+    async def fetchall(self, sql, params=()):
+        return await self.run(lambda db: db.execute(sql, params).fetchall())
+
+    async def fetchone(self, sql, params=()):
+        return await self.run(lambda db: db.execute(sql, params).fetchone())
+
+    async def execute(self, sql, params=()):
+        """Run a statement and commit it; returns the row count."""
+        def execute(db):
+            count = db.execute(sql, params).rowcount
             db.commit()
-        logging.info('✅ 数据库初始化成功!')
+            return count
+        return await self.run(execute)
+
+    def close(self):
+        """Wait for the queued calls, then close the connections."""
+        self._closed = True
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for db in connections:
+            db.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._counters, max_workers=self.max_workers, connections=len(self._connections))
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """当前数据库文件的连接池（DATABASE_PATH 变化时重建）"""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.path != settings.DATABASE_PATH:
+            if _pool is not None:
+                _pool.close()
+            _pool = ConnectionPool(settings.DATABASE_PATH)
+        return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+_async_db = None
+
+
+def get_async_database() -> AsyncDatabase:
+    """当前数据库文件的异步访问层（DATABASE_PATH 变化时重建）"""
+    global _async_db
+    with _pool_lock:
+        if _async_db is None or _async_db.path != settings.DATABASE_PATH:
+            if _async_db is not None:
+                _async_db.close()
+            _async_db = AsyncDatabase(settings.DATABASE_PATH)
+        return _async_db
+
 
+def close_async_database():
+    global _async_db
+    with _pool_lock:
+        if _async_db is not None:
+            _async_db.close()
+            _async_db = None
+
+
+async def get_async_db():
+    """
+    依赖注入（async 路由）：数据库操作交给独立的线程池执行，不阻塞事件循环
+
+    用法: `await adb.run(func, ...)`，func 的第一个参数为该线程的连接
+    """
+    return get_async_database()
+
+
+def get_db():
+    """
+    依赖注入：从连接池借出数据库连接，请求结束后归还
+
+    连接在池中复用，不再为每个请求新建连接和重复设置 PRAGMA
+    """
+    with get_pool().connection() as db:
+        yield db
+
+def init_db():
+    """初始化数据库 Schema：新库从头建表，已有数据库执行尚未执行的迁移"""
+    with closing(connect(settings.DATABASE_PATH)) as db:
+        applied = migrate(db)
+    if applied:
+        logging.info(f'✅ 数据库已升级到版本 {applied[-1]}')
@@ -0,0 +1,94 @@
+"""
+Versioned schema migrations.
+
+Migrations are the files of `settings.MIGRATIONS_DIR` named `<version>_<name>.sql` or `.py`,
+applied in version order and recorded in the `schema_version` table. A `.sql` script is run
+statement by statement; a `.py` module defines `upgrade(db)` for changes SQL cannot express
+conditionally. All pending migrations run in one `BEGIN IMMEDIATE` transaction, so a failing
+one leaves the database untouched and concurrent starts do not apply anything twice.
+"""
+import importlib.util
+import logging
+import os
+import re
+import sqlite3
+
+import arrow
+
+from app.core.config import settings
+
+MIGRATION_FILE = re.compile(r'^(\d+)_(\w+)\.(sql|py)$')
+
+
+def list_migrations(directory=None):
+    """`(version, name, path)` of the migration files, in version order."""
+    directory = directory or settings.MIGRATIONS_DIR
+    migrations = []
+    for filename in os.listdir(directory):
+        match = MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    migrations.sort()
+
+    versions = [version for version, _, _ in migrations]
+    if len(set(versions)) != len(versions):
+        raise ValueError(f"duplicate migration versions in {directory}")
+    return migrations
+
+
+def iter_statements(script):
+    """Split a SQL script into complete statements."""
+    statement = ''
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            yield statement.strip()
+            statement = ''
+    if re.sub(r'--[^\n]*', '', statement).strip():
+        raise ValueError(f"incomplete statement: {statement.strip()[:80]}")
+
+
+def apply_migration(db: sqlite3.Connection, path):
+    if path.endswith('.py'):
+        spec = importlib.util.spec_from_file_location(f"migration_{os.path.basename(path)[:-3]}", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        module.upgrade(db)
+        return
+
+    with open(path, mode='r', encoding='utf-8') as f:
+        for statement in iter_statements(f.read()):
+            db.execute(statement)
+
+
+def current_version(db: sqlite3.Connection):
+    exists = db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'").fetchone()
+    if not exists:
+        return 0
+    return db.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def migrate(db: sqlite3.Connection, directory=None):
+    """Apply the pending migrations; returns the versions applied."""
+    migrations = list_migrations(directory)
+    if db.in_transaction:
+        db.commit()
+
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        db.execute("CREATE TABLE IF NOT EXISTS schema_version ("
+                   "version INTEGER PRIMARY KEY, name TEXT NOT NULL, applied_on TEXT NOT NULL)")
+        applied = {row[0] for row in db.execute("SELECT version FROM schema_version")}
+        pending = [migration for migration in migrations if migration[0] not in applied]
+        for version, name, path in pending:
+            apply_migration(db, path)
+            db.execute("INSERT INTO schema_version (version, name, applied_on) VALUES (?, ?, ?)",
+                       (version, name, str(arrow.now())))
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+
+    for version, name, _ in pending:
+        logging.info(f"✅ 数据库迁移 {version:04d}_{name} 已执行")
+    return [version for version, _, _ in pending]
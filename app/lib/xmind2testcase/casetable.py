@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+
+"""
+Columnar container for parsed testcases
+
+A `CaseTable` keeps every testcase field (and every step field) in its own column, integer
+fields in compact `array`s and strings interned in a per-table pool, so a workbook with a
+huge number of cases costs a few columns instead of one object graph per case.
+Rows are read back through light `CaseRow`/`StepRow` views.
+"""
+
+from array import array
+from collections.abc import Mapping
+from xmind2testcase.metadata import TestSuite, TestCase, TestStep
+
+CASE_FIELDS = ('name', 'version', 'summary', 'preconditions', 'execution_type', 'importance',
+               'estimated_exec_duration', 'status', 'result', 'tc_id')
+STEP_FIELDS = ('step_number', 'actions', 'expectedresults', 'execution_type', 'result')
+# keys of a testcase data dict, see `xmind2testcase.utils.testsuites_to_testcase_list`
+ROW_KEYS = CASE_FIELDS + ('steps', 'product', 'suite')
+
+_INT_FIELDS = frozenset(('version', 'execution_type', 'importance', 'estimated_exec_duration', 'status',
+                         'result', 'step_number'))
+_CASE_DEFAULTS = TestCase()
+_STEP_DEFAULTS = TestStep()
+
+
+class _Column(object):
+    """a column of values, an `array` while every value is a machine integer, a list otherwise"""
+    __slots__ = ('values',)
+
+    def __init__(self, integer=False):
+        self.values = array('q') if integer else []
+
+    def append(self, value):
+        try:
+            self.values.append(value)
+        except (TypeError, OverflowError):
+            self.values = list(self.values)
+            self.values.append(value)
+
+
+class CaseTable(object):
+
+    def __init__(self):
+        self._strings = {}
+        self._products = []  # (name, details)
+        self._suites = []  # (product index, name, details)
+        self._cases = {field: _Column(field in _INT_FIELDS) for field in CASE_FIELDS}
+        self._case_suite = array('q')
+        # steps of case i are rows step_offsets[i]:step_offsets[i + 1] of the step columns
+        self._step_offsets = array('q', [0])
+        self._steps = {field: _Column(field in _INT_FIELDS) for field in STEP_FIELDS}
+
+    @classmethod
+    def from_testsuites(cls, testsuites):
+        """build a table from a `xmind2testcase.metadata.TestSuite` list"""
+        table = cls()
+        for testsuite in testsuites:
+            table.add_testsuite(testsuite)
+        return table
+
+    @classmethod
+    def from_testcase_list(cls, testcases):
+        """build a table from testcase data dicts, e.g. the ones stored with a record"""
+        table = cls()
+        suite_index = {}
+
+        for case_dict in testcases:
+            key = (case_dict.get('product', ''), case_dict.get('suite', ''))
+            if key not in suite_index:
+                product = table.add_product(key[0])
+                suite_index[key] = table.add_suite(product, key[1])
+
+            steps = [[step_dict.get(field, getattr(_STEP_DEFAULTS, field)) for field in STEP_FIELDS]
+                     for step_dict in case_dict.get('steps') or ()]
+            table._append_case(suite_index[key],
+                               [case_dict.get(field, getattr(_CASE_DEFAULTS, field)) for field in CASE_FIELDS],
+                               steps)
+
+        return table
+
+    def add_product(self, name, details=''):
+        """add a product (the root suite of a sheet) and return its index"""
+        self._products.append((self._intern(name), self._intern(details)))
+        return len(self._products) - 1
+
+    def add_suite(self, product_index, name, details=''):
+        """add a suite under a product and return its index"""
+        self._suites.append((product_index, self._intern(name), self._intern(details)))
+        return len(self._suites) - 1
+
+    def add_testsuite(self, testsuite):
+        """append a parsed sheet: a root `TestSuite` with its sub suites and testcases"""
+        product_index = self.add_product(testsuite.name, testsuite.details)
+
+        for sub_suite in testsuite.sub_suites or ():
+            suite_index = self.add_suite(product_index, sub_suite.name, sub_suite.details)
+            for testcase in sub_suite.testcase_list or ():
+                self.add_testcase(suite_index, testcase)
+
+    def add_testcase(self, suite_index, testcase):
+        """append a `TestCase` (or anything with the same attributes) to a suite"""
+        steps = [[getattr(step, field) for field in STEP_FIELDS] for step in testcase.steps or ()]
+        self._append_case(suite_index, [getattr(testcase, field) for field in CASE_FIELDS], steps)
+
+    def _append_case(self, suite_index, values, steps):
+        for field, value in zip(CASE_FIELDS, values):
+            self._cases[field].append(self._intern(value))
+        self._case_suite.append(suite_index)
+
+        for step_values in steps:
+            for field, value in zip(STEP_FIELDS, step_values):
+                self._steps[field].append(self._intern(value))
+        self._step_offsets.append(self._step_offsets[-1] + len(steps))
+
+    def _intern(self, value):
+        if isinstance(value, str):
+            return self._strings.setdefault(value, value)
+        return value
+
+    def __len__(self):
+        return len(self._case_suite)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield CaseRow(self, index)
+
+    def __getitem__(self, index):
+        size = len(self)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError('case index out of range')
+        return CaseRow(self, index)
+
+    @property
+    def step_count(self):
+        return self._step_offsets[-1]
+
+    def to_testcase_list(self):
+        """the same testcase data list as `xmind2testcase.utils.testsuites_to_testcase_list`"""
+        testcases = []
+        for row in self:
+            case_data = row.to_dict()
+            case_data['product'] = row.product
+            case_data['suite'] = row.suite
+            testcases.append(case_data)
+        return testcases
+
+    def to_testsuites(self):
+        """rebuild the `TestSuite` hierarchy, testcases are `CaseRow` views rather than copies"""
+        testsuites = [TestSuite(name=name, details=details, sub_suites=[]) for name, details in self._products]
+        sub_suites = []
+
+        for product_index, name, details in self._suites:
+            sub_suite = TestSuite(name=name, details=details, testcase_list=[])
+            testsuites[product_index].sub_suites.append(sub_suite)
+            sub_suites.append(sub_suite)
+
+        for row in self:
+            sub_suites[self._case_suite[row.index]].testcase_list.append(row)
+
+        return testsuites
+
+
+class CaseRow(Mapping):
+    """read only view of a testcase in a `CaseTable`
+
+    Works as a testcase data dict (`ROW_KEYS`) and as a `TestCase` (attributes, `to_dict`).
+    """
+    __slots__ = ('_table', 'index')
+
+    def __init__(self, table, index):
+        self._table = table
+        self.index = index
+
+    def __getitem__(self, key):
+        if key in self._table._cases:
+            return self._table._cases[key].values[self.index]
+        elif key == 'steps':
+            return self.steps
+        elif key == 'product':
+            return self.product
+        elif key == 'suite':
+            return self.suite
+        raise KeyError(key)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self._table._cases[name].values[self.index]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __iter__(self):
+        return iter(ROW_KEYS)
+
+    def __len__(self):
+        return len(ROW_KEYS)
+
+    @property
+    def steps(self):
+        offsets = self._table._step_offsets
+        return [StepRow(self._table, i) for i in range(offsets[self.index], offsets[self.index + 1])]
+
+    @property
+    def suite(self):
+        return self._table._suites[self._table._case_suite[self.index]][1]
+
+    @property
+    def product(self):
+        product_index = self._table._suites[self._table._case_suite[self.index]][0]
+        return self._table._products[product_index][0]
+
+    def to_dict(self):
+        data = {field: self._table._cases[field].values[self.index] for field in CASE_FIELDS}
+        data['steps'] = [step.to_dict() for step in self.steps]
+        return data
+
+
+class StepRow(Mapping):
+    """read only view of a test step in a `CaseTable`, works as a step data dict and as a `TestStep`"""
+    __slots__ = ('_table', 'index')
+
+    def __init__(self, table, index):
+        self._table = table
+        self.index = index
+
+    def __getitem__(self, key):
+        return self._table._steps[key].values[self.index]
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self._table._steps[name].values[self.index]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __iter__(self):
+        return iter(STEP_FIELDS)
+
+    def __len__(self):
+        return len(STEP_FIELDS)
+
+    def to_dict(self):
+        return {field: self._table._steps[field].values[self.index] for field in STEP_FIELDS}
@@ -1,11 +1,17 @@
 #!/usr/bin/env python
 # _*_ coding:utf-8 _*_
+import glob
 import logging
+import multiprocessing
+import os
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from xmind2testcase.compact import xmind_testcase_to_compact_file
 from xmind2testcase.zentao import xmind_to_zentao_csv_file
 from xmind2testcase.testlink import xmind_to_testlink_xml_file
-from xmind2testcase.utils import get_absolute_path, xmind_testcase_to_json_file
-from webtool.application import launch
+from xmind2testcase.utils import get_absolute_path, get_xmind_testsuites, testsuites_to_testcase_list, \
+    xmind_testcase_to_json_file
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s  %(name)s  %(levelname)s  [%(module)s - %(funcName)s]: %(message)s',
@@ -16,7 +22,8 @@ using_doc = """
     xml file or a zentao recognized cvs file, then you can import it into testlink or zentao.
     
     Usage:
-     xmind2testcase [path_to_xmind_file] [-csv] [-xml] [-json]
+     xmind2testcase [path_to_xmind_file] [-csv] [-xml] [-json] [-xtc]
+     xmind2testcase batch [dir_or_glob_or_file ...] [-csv] [-xml] [-json] [-xtc] [-w num_workers]
      xmind2testcase [webtool] [port_num]
     
     Example:
@@ -24,11 +31,124 @@ using_doc = """
      xmind2testcase /path/to/testcase.xmind -csv   => output testcase.csv
      xmind2testcase /path/to/testcase.xmind -xml   => output testcase.xml
      xmind2testcase /path/to/testcase.xmind -json  => output testcase.json
+     xmind2testcase /path/to/testcase.xmind -xtc   => output testcase.xtc (compact binary testcase file)
+     xmind2testcase batch /path/to/dir -xml -w 8   => output a xml file for every xmind under dir, using 8 processes
+     xmind2testcase batch "cases/**/*.xmind"       => output csv、xml、json files for every matched xmind
      xmind2testcase webtool                        => launch the web testcase conversion tool locally: 127.0.0.1:5001
      xmind2testcase webtool 8000                   => launch the web testcase conversion tool locally: 127.0.0.1:8000
     """
 
 
+# default formats, the compact 'xtc' file is only written when asked for
+FORMATS = ('json', 'xml', 'csv')
+
+
+def convert_xmind_file(xmind_file, formats=FORMATS):
+    """Parse a XMind file once and write every requested format from that single parse
+
+    :return: dict with the file, its testcase count and the written files by format
+    """
+    xmind_file = get_absolute_path(xmind_file)
+    testsuites = get_xmind_testsuites(xmind_file)
+    testcases = testsuites_to_testcase_list(testsuites)
+    outputs = {}
+
+    if 'json' in formats:
+        outputs['json'] = xmind_testcase_to_json_file(xmind_file, testcases=testcases)
+    if 'xml' in formats:
+        outputs['xml'] = xmind_to_testlink_xml_file(xmind_file, testsuites=testsuites)
+    if 'csv' in formats:
+        outputs['csv'] = xmind_to_zentao_csv_file(xmind_file, testcases=testcases)
+    if 'xtc' in formats:
+        outputs['xtc'] = xmind_testcase_to_compact_file(xmind_file, testcases=testcases)
+
+    return {'file': xmind_file, 'cases': len(testcases), 'outputs': outputs}
+
+
+def find_xmind_files(paths):
+    """Expand directories (recursively), glob patterns and plain files to a sorted list of XMind files"""
+    found = set()
+
+    for path in paths:
+        path = os.path.expanduser(path)
+        if os.path.isdir(path):
+            matches = glob.glob(os.path.join(glob.escape(path), '**', '*.xmind'), recursive=True)
+        elif glob.has_magic(path):
+            matches = glob.glob(path, recursive=True)
+        else:
+            matches = [path]
+
+        found.update(get_absolute_path(f) for f in matches if f.endswith('.xmind') and os.path.isfile(f))
+
+    return sorted(found)
+
+
+def batch_convert(paths, formats=FORMATS, workers=None):
+    """Convert many XMind files, spreading them over a process pool
+
+    :param paths: directories, glob patterns or XMind files
+    :param workers: number of processes, None for the CPU count, 1 converts in this process
+    :return: summary dict: files, cases, failures (file -> error), seconds, files_per_second, cases_per_second
+    """
+    xmind_files = find_xmind_files(paths)
+    workers = min(workers or os.cpu_count() or 1, len(xmind_files) or 1)
+    results = {}
+    failures = {}
+    start = time.perf_counter()
+
+    if workers == 1:
+        for xmind_file in xmind_files:
+            try:
+                results[xmind_file] = convert_xmind_file(xmind_file, formats)
+            except Exception as e:
+                logging.exception('Failed to convert XMind file: %s', xmind_file)
+                failures[xmind_file] = repr(e)
+    else:
+        # spawn rather than fork: forking a process that may already run threads is unsafe
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            futures = {pool.submit(convert_xmind_file, xmind_file, formats): xmind_file for xmind_file in xmind_files}
+            for future in as_completed(futures):
+                xmind_file = futures[future]
+                try:
+                    results[xmind_file] = future.result()
+                except Exception as e:
+                    logging.error('Failed to convert XMind file: %s: %r', xmind_file, e)
+                    failures[xmind_file] = repr(e)
+
+    seconds = time.perf_counter() - start
+    cases = sum(result['cases'] for result in results.values())
+    return {
+        'files': len(results),
+        'cases': cases,
+        'failures': failures,
+        'workers': workers,
+        'seconds': seconds,
+        'files_per_second': len(results) / seconds if seconds else 0.0,
+        'cases_per_second': cases / seconds if seconds else 0.0
+    }
+
+
+def _parse_batch_args(args):
+    paths, formats, workers = [], [], None
+    args = iter(args)
+
+    for arg in args:
+        if arg in ('-json', '-xml', '-csv', '-xtc'):
+            formats.append(arg[1:])
+        elif arg in ('-w', '--workers'):
+            value = next(args, None)
+            try:
+                workers = int(value)
+            except (TypeError, ValueError):
+                workers = 0
+            if workers < 1:
+                raise ValueError('Invalid number of workers: %r, expected a positive integer' % value)
+        else:
+            paths.append(arg)
+
+    return paths, tuple(formats) or FORMATS, workers
+
+
 def cli_main():
     if len(sys.argv) > 1 and sys.argv[1].endswith('.xmind'):
         xmind_file = sys.argv[1]
@@ -44,18 +164,39 @@ def cli_main():
         elif len(sys.argv) == 3 and sys.argv[2] == '-csv':
             zentao_csv_file = xmind_to_zentao_csv_file(xmind_file)
             logging.info('Convert XMind file to zentao csv file successfully: %s', zentao_csv_file)
+        elif len(sys.argv) == 3 and sys.argv[2] == '-xtc':
+            compact_file = xmind_testcase_to_compact_file(xmind_file)
+            logging.info('Convert XMind file to compact testcase file successfully: %s', compact_file)
         else:
-            testlink_json_file = xmind_testcase_to_json_file(xmind_file)
-            testlink_xml_file = xmind_to_testlink_xml_file(xmind_file)
-            zentao_csv_file = xmind_to_zentao_csv_file(xmind_file)
+            # parse once, then write the three formats from the same result
+            outputs = convert_xmind_file(xmind_file)['outputs']
             logging.info('Convert XMind file successfully: \n'
                          '1、 testcase json file(%s)\n'
                          '2、 testlink xml file(%s)\n'
                          '3、 zentao csv file(%s)',
-                         testlink_json_file,
-                         testlink_xml_file,
-                         zentao_csv_file)
+                         outputs['json'],
+                         outputs['xml'],
+                         outputs['csv'])
+    elif len(sys.argv) > 2 and sys.argv[1] == 'batch':
+        try:
+            paths, formats, workers = _parse_batch_args(sys.argv[2:])
+        except ValueError as e:
+            logging.error(e)
+            print(using_doc)
+            sys.exit(2)
+        summary = batch_convert(paths, formats, workers)
+        logging.info('Batch conversion finished: %d files, %d testcases, %d failures in %.2fs '
+                     'with %d workers (%.1f files/s, %.1f testcases/s)',
+                     summary['files'], summary['cases'], len(summary['failures']), summary['seconds'],
+                     summary['workers'], summary['files_per_second'], summary['cases_per_second'])
+        for xmind_file, error in sorted(summary['failures'].items()):
+            logging.error('Failed: %s: %s', xmind_file, error)
+        if summary['failures']:
+            sys.exit(1)
     elif len(sys.argv) > 1 and sys.argv[1] == 'webtool':
+        # the web tool is optional, only import it when it is asked for
+        from webtool.application import launch
+
         if len(sys.argv) == 3:
             try:
                 port = int(sys.argv[2])
@@ -0,0 +1,446 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+
+"""
+Compact binary format for testcase data (.xtc)
+
+A lossless alternative to the testcase json: every distinct value (strings, numbers,
+None/True/False) is stored once in a value table, testcases and test steps are tables
+with one column of value indexes per key, so keys are never repeated and a repeated
+string costs one or two bytes. Columns are plain little endian integer arrays, read
+back with `array.frombytes`, which makes loading much faster than parsing json.
+
+Layout, all integers little endian:
+
+    header   magic b'XTC1', version (u16), flags (u16), cases (u32), steps (u32)
+    sections (u32 byte length + payload each, in this order)
+        strings      u32 count, mode byte, utf-8 text: NUL separated texts (mode 0) or,
+                     when a text holds a NUL, u32 lengths in characters then the texts (mode 1)
+        integers     i64 values
+        floats       f64 values
+        json values  like strings, json texts of the values that are neither scalars nor step lists
+        case keys    like strings
+        case columns per case key: typecode byte ('B', 'H' or 'I') + one index per case
+        step keys    like strings
+        step columns per step key: typecode byte + one index per step
+        step counts  typecode byte + the number of steps of each case
+    with the key orders flag (version 2) only
+        case orders  like strings, key orders as comma separated case key numbers, '' first
+        case order   typecode byte + the key order of each case, 0 when its keys are in key table order
+        step orders  like case orders, for the step keys
+        step order   typecode byte + the key order of each step
+
+Value index 0 marks a key absent from a testcase, 1 its 'steps' list (the next rows of
+the step table), 2, 3 and 4 are None, False and True, then come strings, integers, floats
+and json values in this order.
+
+Rows are decoded with their keys in key table order, which is the order the keys were first
+seen in. Rows that had them in another order get a key order, so the dicts come back with the
+keys in their original order and dump to the same json text. Data without such rows is
+written as version 1, with no key order sections.
+"""
+
+import json
+import logging
+import struct
+import sys
+from array import array
+from itertools import islice, repeat
+from xmind2testcase.utils import atomic_output, get_absolute_path, iter_xmind_testcases
+
+MAGIC = b'XTC1'
+VERSION = 2
+EXTENSION = '.xtc'
+
+_HEADER = struct.Struct('<4sHHII')
+_LENGTH = struct.Struct('<I')
+_MISSING, _STEPS, _NONE, _FALSE, _TRUE = range(5)
+_RESERVED = 5
+_INDEX_TYPECODES = ('B', 'H', 'I')
+_TEXTS_SEPARATED = b'\x00'
+_TEXTS_SIZED = b'\x01'
+_KEY_ORDERS = 0x1  # header flag: key order sections follow the step counts
+
+
+def _little_endian(values):
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values
+
+
+def _index_array(indexes):
+    """smallest unsigned array holding the indexes, typecode byte first"""
+    top = max(indexes, default=0)
+    for typecode in _INDEX_TYPECODES:
+        values = array(typecode)
+        if top < 1 << (8 * values.itemsize):
+            values.extend(indexes)
+            return typecode.encode('ascii') + _little_endian(values).tobytes()
+    raise ValueError('Too many distinct values for the compact format')
+
+
+def _text_table(texts):
+    text = '\x00'.join(texts)
+    if text.count('\x00') == max(len(texts) - 1, 0):
+        # no text holds a NUL: separators are enough, they are split in one go when reading
+        return _LENGTH.pack(len(texts)) + _TEXTS_SEPARATED + text.encode('utf-8')
+    lengths = array('I', [len(text) for text in texts])
+    return _LENGTH.pack(len(texts)) + _TEXTS_SIZED + _little_endian(lengths).tobytes() + ''.join(texts).encode('utf-8')
+
+
+_ABSENT = object()
+_STEP_LIST = object()
+_SPECIALS = {None: _NONE, _ABSENT: _MISSING, _STEP_LIST: _STEPS}
+_STRING_TYPES = {str, type(None), object}
+_INT_TYPES = {int, type(None), object}
+_INT_RANGE = range(-1 << 63, 1 << 63)
+
+
+def _is_step_list(value):
+    return isinstance(value, list) and all(hasattr(step, 'keys') for step in value)
+
+
+def _order_index(orders, known, columns, row):
+    """key order number of a row, 0 when its keys are in column order, a new order gets the next number
+
+    :param known: cache of the numbers by key tuple, rows mostly share a few of them
+    """
+    keys = tuple(row)
+    number = known.get(keys)
+    if number is None:
+        positions = dict(zip(columns, range(len(columns))))
+        order = tuple(map(positions.__getitem__, keys))
+        number = 0 if all(map(int.__lt__, order, order[1:])) else orders.setdefault(order, len(orders) + 1)
+        known[keys] = number
+    return number
+
+
+def _order_sections(orders, order_indexes):
+    texts = [''] + [','.join(map(str, order)) for order in orders]
+    return [_text_table(texts), _index_array(order_indexes)]
+
+
+def _add_row(columns, row, row_number):
+    """append the values of a row to their columns, a key seen first here gets a new column"""
+    for key, value in row.items():
+        column = columns.get(key)
+        if column is None:
+            column = columns[key] = [_ABSENT] * row_number
+        column.append(value)
+    if len(row) != len(columns):
+        for column in columns.values():
+            if len(column) == row_number:
+                column.append(_ABSENT)
+
+
+def _json_text(value):
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _index_columns(columns):
+    """the value tables (strings, integers, floats, json texts) and the index column of each column
+
+    Columns of strings or of integers (the usual case) are indexed with dict lookups mapped
+    over the whole column, other columns value by value.
+    """
+    strings, integers, floats, jsons = {}, {}, {}, {}
+    kinds = []
+    string_columns = []
+
+    for column in columns:
+        types = set(map(type, column))
+        if types <= _STRING_TYPES:
+            kinds.append('str')
+            string_columns.append(dict.fromkeys(column))
+            continue
+        if types <= _INT_TYPES:
+            present = [value for value in column if type(value) is int]
+            if min(present) in _INT_RANGE and max(present) in _INT_RANGE:
+                kinds.append('int')
+                integers.update(dict.fromkeys(present))
+                continue
+
+        kinds.append(None)
+        for value in column:
+            if value is None or value is True or value is False or type(value) is object:
+                continue
+            if isinstance(value, str):
+                strings[value] = None
+            elif isinstance(value, int) and value in _INT_RANGE:
+                integers[value] = None
+            elif isinstance(value, float):
+                floats[value] = None
+            else:
+                jsons[_json_text(value)] = None
+
+    # strings of the columns with few distinct values first, they get the smallest indexes
+    generic_strings = strings
+    strings = {}
+    for distinct in sorted(string_columns, key=len):
+        strings.update(distinct)
+    strings.update(generic_strings)
+    for special in _SPECIALS:
+        strings.pop(special, None)
+
+    offset = _RESERVED
+    lookups = []
+    for table in (strings, integers, floats, jsons):
+        lookups.append(dict(zip(table, range(offset, offset + len(table)))))
+        offset += len(table)
+    string_index, integer_index, float_index, json_index = lookups
+
+    def value_index(value):
+        if value is True:
+            return _TRUE
+        if value is False:
+            return _FALSE
+        if value is None or type(value) is object:
+            return _SPECIALS[value]
+        if isinstance(value, str):
+            return string_index[value]
+        if isinstance(value, int) and value in _INT_RANGE:
+            return integer_index[value]
+        if isinstance(value, float):
+            return float_index[value]
+        return json_index[_json_text(value)]
+
+    string_lookup = dict(string_index)
+    string_lookup.update(_SPECIALS)
+    integer_lookup = dict(integer_index)
+    integer_lookup.update(_SPECIALS)
+
+    indexes = []
+    for column, kind in zip(columns, kinds):
+        if kind == 'str':
+            indexes.append(list(map(string_lookup.__getitem__, column)))
+        elif kind == 'int':
+            indexes.append(list(map(integer_lookup.__getitem__, column)))
+        else:
+            indexes.append(list(map(value_index, column)))
+
+    return (list(strings), list(integers), list(floats), list(jsons)), indexes
+
+
+def dumps(testcases):
+    """Encode testcase data dicts (or `CaseTable` rows) to the compact format bytes"""
+    case_columns = {}  # key -> values, one per case
+    step_columns = {}  # key -> values, one per step
+    step_counts = []
+    step_total = 0
+    case_orders, case_known, case_order_indexes = {}, {}, []
+    step_orders, step_known, step_order_indexes = {}, {}, []
+
+    for testcase in testcases:
+        _add_row(case_columns, testcase, len(step_counts))
+        case_order_indexes.append(_order_index(case_orders, case_known, case_columns, testcase))
+        steps = testcase.get('steps')
+        if _is_step_list(steps):
+            # the steps go to the step table, the case only records that it has a list of them
+            case_columns['steps'][-1] = _STEP_LIST
+            for step in steps:
+                _add_row(step_columns, step, step_total)
+                step_order_indexes.append(_order_index(step_orders, step_known, step_columns, step))
+                step_total += 1
+            step_counts.append(len(steps))
+        else:
+            step_counts.append(0)
+
+    columns = list(case_columns.values()) + list(step_columns.values())
+    (strings, integers, floats, jsons), indexes = _index_columns(columns)
+    case_indexes, step_indexes = indexes[:len(case_columns)], indexes[len(case_columns):]
+
+    sections = [
+        _text_table(strings),
+        _little_endian(array('q', integers)).tobytes(),
+        _little_endian(array('d', floats)).tobytes(),
+        _text_table(jsons),
+        _text_table(list(case_columns)),
+        b''.join(map(_index_array, case_indexes)),
+        _text_table(list(step_columns)),
+        b''.join(map(_index_array, step_indexes)),
+        _index_array(step_counts),
+    ]
+    version, flags = 1, 0
+    if case_orders or step_orders:
+        version, flags = VERSION, _KEY_ORDERS
+        sections += _order_sections(case_orders, case_order_indexes)
+        sections += _order_sections(step_orders, step_order_indexes)
+
+    parts = [_HEADER.pack(MAGIC, version, flags, len(step_counts), step_total)]
+    for section in sections:
+        parts.append(_LENGTH.pack(len(section)))
+        parts.append(section)
+    return b''.join(parts)
+
+
+class _Reader(object):
+    """sequential reader over a section"""
+
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def take(self, size):
+        if self.pos + size > len(self.data):
+            raise ValueError('Truncated compact testcase data')
+        chunk = self.data[self.pos:self.pos + size]
+        self.pos += size
+        return chunk
+
+    def array(self, typecode, count):
+        values = array(typecode)
+        values.frombytes(self.take(values.itemsize * count))
+        if sys.byteorder == 'big':
+            values.byteswap()
+        return values
+
+    def index_array(self, count):
+        typecode = chr(self.take(1)[0])
+        if typecode not in _INDEX_TYPECODES:
+            raise ValueError('Invalid compact testcase data: bad column type')
+        return self.array(typecode, count)
+
+    def texts(self):
+        count = _LENGTH.unpack(self.take(_LENGTH.size))[0]
+        mode = self.take(1).tobytes()
+        if mode == _TEXTS_SEPARATED:
+            texts = bytes(self.take(len(self.data) - self.pos)).decode('utf-8').split('\x00') if count else []
+            if len(texts) != count:
+                raise ValueError('Invalid compact testcase data: bad text table')
+            return texts
+        if mode != _TEXTS_SIZED:
+            raise ValueError('Invalid compact testcase data: bad text table')
+
+        lengths = self.array('I', count)
+        text = bytes(self.take(len(self.data) - self.pos)).decode('utf-8')
+        texts = []
+        start = 0
+        for length in lengths:
+            texts.append(text[start:start + length])
+            start += length
+        return texts
+
+
+def _decode_column(indexes, values, json_start, jsons):
+    highest = max(indexes, default=0)
+    if highest >= json_start + len(jsons):
+        raise ValueError('Invalid compact testcase data: bad value index')
+    if jsons and highest >= json_start:
+        # json values are decoded for every row, rows never share a mutable value
+        return [json.loads(jsons[i - json_start]) if i >= json_start else values[i] for i in indexes]
+    return list(map(values.__getitem__, indexes))
+
+
+def _build_rows(keys, columns, count):
+    """dicts of a table from its decoded columns, leaving absent keys out"""
+    if not keys:
+        return [{} for _ in range(count)]
+
+    rows = list(map(dict, map(zip, repeat(keys), zip(*columns))))
+    for key, column in zip(keys, columns):
+        if _ABSENT in column:
+            for i in [i for i, value in enumerate(column) if value is _ABSENT]:
+                del rows[i][key]
+    return rows
+
+
+def _restore_orders(rows, keys, orders, order_indexes):
+    """put the keys of the rows with a key order back in that order, in place"""
+    if not orders or orders[0] != '':
+        raise ValueError('Invalid compact testcase data: bad key order')
+    try:
+        orders = [None] + [[keys[int(number)] if number.isdigit() else None for number in order.split(',')]
+                           for order in orders[1:]]
+        for i in [i for i, order in enumerate(order_indexes) if order]:
+            row = rows[i]
+            rows[i] = {key: row[key] for key in orders[order_indexes[i]]}
+            if len(rows[i]) != len(row):
+                raise KeyError(i)
+    except (IndexError, KeyError):
+        raise ValueError('Invalid compact testcase data: bad key order')
+
+
+def loads(data):
+    """Decode compact format bytes to the testcase data dicts they were written from
+
+    :raise ValueError: not compact testcase data, a newer version, or corrupted data
+    """
+    data = memoryview(data)
+    if len(data) < _HEADER.size:
+        raise ValueError('Not compact testcase data')
+    magic, version, flags, case_count, step_count = _HEADER.unpack(data[:_HEADER.size])
+    if magic != MAGIC:
+        raise ValueError('Not compact testcase data')
+    if version > VERSION:
+        raise ValueError('Unsupported compact testcase format version: {}'.format(version))
+
+    reader = _Reader(data)
+    reader.take(_HEADER.size)
+    sections = []
+    for _ in range(13 if flags & _KEY_ORDERS else 9):
+        length = _LENGTH.unpack(reader.take(_LENGTH.size))[0]
+        sections.append(_Reader(reader.take(length)))
+
+    strings = sections[0].texts()
+    integers = sections[1].array('q', len(sections[1].data) // 8).tolist()
+    floats = sections[2].array('d', len(sections[2].data) // 8).tolist()
+    jsons = sections[3].texts()
+    values = [_ABSENT, _STEP_LIST, None, False, True] + strings + integers + floats
+    json_start = len(values)
+
+    case_keys = sections[4].texts()
+    case_columns = [_decode_column(sections[5].index_array(case_count), values, json_start, jsons) for _ in case_keys]
+    step_keys = sections[6].texts()
+    step_columns = [_decode_column(sections[7].index_array(step_count), values, json_start, jsons) for _ in step_keys]
+    step_counts = sections[8].index_array(case_count)
+
+    if 'steps' in case_keys:
+        # cut the step table into the step lists of the cases, in one go
+        steps = _build_rows(step_keys, step_columns, step_count)
+        if flags & _KEY_ORDERS:
+            _restore_orders(steps, step_keys, sections[11].texts(), sections[12].index_array(step_count))
+        steps = iter(steps)
+        step_lists = list(map(list, map(islice, repeat(steps), step_counts)))
+        position = case_keys.index('steps')
+        column = case_columns[position]
+        if column.count(_STEP_LIST) == len(column):
+            case_columns[position] = step_lists
+        else:
+            case_columns[position] = [lists if value is _STEP_LIST else value for value, lists in zip(column, step_lists)]
+
+    rows = _build_rows(case_keys, case_columns, case_count)
+    if flags & _KEY_ORDERS:
+        _restore_orders(rows, case_keys, sections[9].texts(), sections[10].index_array(case_count))
+    return rows
+
+
+def write_compact_file(testcases, compact_file):
+    """Write testcase data to a compact format file"""
+    with open(compact_file, 'wb') as f:
+        f.write(dumps(testcases))
+    return compact_file
+
+
+def read_compact_file(compact_file):
+    """Read the testcase data of a compact format file"""
+    with open(compact_file, 'rb') as f:
+        return loads(f.read())
+
+
+def xmind_testcase_to_compact_file(xmind_file, testcases=None):
+    """Convert XMind file to a compact testcase file
+
+    :param testcases: optional testcase data already parsed from the file, to avoid parsing it again
+    """
+    xmind_file = get_absolute_path(xmind_file)
+    logging.info('Start converting XMind file(%s) to a compact testcase file...', xmind_file)
+    if testcases is None:
+        testcases = iter_xmind_testcases(xmind_file)
+
+    compact_file = xmind_file[:-6] + EXTENSION
+    with atomic_output(compact_file) as tmp_file:
+        write_compact_file(testcases, tmp_file)
+    logging.info('Convert XMind file(%s) to a compact testcase file(%s) successfully!', xmind_file, compact_file)
+
+    return compact_file
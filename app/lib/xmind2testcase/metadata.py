@@ -7,6 +7,7 @@ testlink.testlink
 
 
 class TestSuite(object):
+    __slots__ = ('name', 'details', 'testcase_list', 'sub_suites', 'statistics')
 
     def __init__(self, name='', details='', testcase_list=None, sub_suites=None, statistics=None):
         """
@@ -46,8 +47,10 @@ class TestSuite(object):
 
 
 class TestCase(object):
+    __slots__ = ('name', 'version', 'summary', 'preconditions', 'execution_type', 'importance',
+                 'estimated_exec_duration', 'status', 'result', 'steps', 'tc_id', 'labels')
 
-    def __init__(self, name='', version=1, summary='', preconditions='', execution_type=1, importance=2, estimated_exec_duration=3, status=7, result=0, steps=None, tc_id=''):
+    def __init__(self, name='', version=1, summary='', preconditions='', execution_type=1, importance=2, estimated_exec_duration=3, status=7, result=0, steps=None, tc_id='', labels=None):
         """
         TestCase
         :param name: test case name
@@ -61,6 +64,7 @@ class TestCase(object):
         :param result: non-execution:0, pass:1, failed:2, blocked:3, skipped:4
         :param steps: test case step list
         :param tc_id: unique test case id for automation binding
+        :param labels: test case labels, only kept for round-tripping (not part of `to_dict`)
         """
         self.name = name
         self.version = version
@@ -73,6 +77,7 @@ class TestCase(object):
         self.result = result
         self.steps = steps
         self.tc_id = tc_id
+        self.labels = labels
 
     def to_dict(self):
         data = {
@@ -97,6 +102,7 @@ class TestCase(object):
 
 
 class TestStep(object):
+    __slots__ = ('step_number', 'actions', 'expectedresults', 'execution_type', 'result')
 
     def __init__(self, step_number=1, actions='', expectedresults='', execution_type=1, result=0):
         """
@@ -1,8 +1,12 @@
 #!/usr/bin/env python
 # _*_ coding:utf-8 _*_
 
+import functools
 import logging
 from xmind2testcase.metadata import TestSuite, TestCase, TestStep
+from xmind2testcase.trace import tracer
+from xmindparser.parallel import count_topics, map_sheets
+from xmindparser.treewalk import walk, max_depth
 
 config = {'sep': ' ',
           'valid_sep': '&>+/-',
@@ -11,10 +15,52 @@ config = {'sep': ' ',
           'ignore_char': '#!！'
           }
 
+# below this many topics a sheet is cheaper to parse in-process than to ship to a worker
+PARALLEL_MIN_TOPICS = 1000
 
-def xmind_to_testsuites(xmind_content_dict):
+
+class ParseContext(object):
+    """State of one parse: a private copy of `config` and the separator picked for the current sheet.
+
+    Nothing is written to the module `config` while parsing, so several files can be parsed
+    concurrently (thread pool, free-threaded Python) as long as each uses its own context.
+    """
+
+    def __init__(self, reader_session=None, workers=None, parallel_min_topics=PARALLEL_MIN_TOPICS, **options):
+        """
+        :param reader_session: optional `xmindparser.ParseSession` used to read the XMind file
+        :param workers: parse sheets in a process pool of this size, None or 1 parses serially
+        :param parallel_min_topics: sheets with fewer topics are parsed in-process even in parallel mode
+        :param options: overrides of the module `config`
+        """
+        self.config = dict(config, **options)
+        self.sep = self.config['sep']
+        self.reader_session = reader_session
+        self.workers = workers
+        self.parallel_min_topics = parallel_min_topics
+
+    @property
+    def parallel(self):
+        return bool(self.workers and self.workers > 1)
+
+
+def _config_of(context):
+    return config if context is None else context.config
+
+
+def xmind_to_testsuites(xmind_content_dict, context=None):
     """convert xmind file to `xmind2testcase.metadata.TestSuite` list"""
-    suites = []
+    return list(iter_testsuites(xmind_content_dict, context))
+
+
+def iter_testsuites(xmind_content_dict, context=None):
+    """yield a `xmind2testcase.metadata.TestSuite` per (non blank) sheet, one sheet at a time"""
+    context = context or ParseContext()
+
+    if context.parallel:
+        for suites in _map_sheets(_sheet_testsuites, xmind_content_dict, context):
+            yield from suites
+        return
 
     for sheet in xmind_content_dict:
         logging.debug('start to parse a sheet: %s', sheet['title'])
@@ -22,99 +68,177 @@ def xmind_to_testsuites(xmind_content_dict):
         sub_topics = root_topic.get('topics', [])
 
         if sub_topics:
-            root_topic['topics'] = filter_empty_or_ignore_topic(sub_topics)
+            # deeper levels are filtered lazily while the cases are walked
+            visible_topics(root_topic, context)
         else:
             logging.warning('This is a blank sheet(%s), should have at least 1 sub topic(test suite)', sheet['title'])
             continue
-        suite = sheet_to_suite(root_topic)
+
+        with tracer.stage('sheet'):
+            suite = sheet_to_suite(root_topic, context)
         # suite.sheet_name = sheet['title']  # root testsuite has a sheet_name attribute
-        logging.debug('sheet(%s) parsing complete: %s', sheet['title'], suite.to_dict())
-        suites.append(suite)
 
-    return suites
+        if tracer.enabled:
+            tracer.event('sheet', suite.to_dict, sheet['title'])
+        yield suite
 
 
-def filter_empty_or_ignore_topic(topics):
-    """filter blank or start with config.ignore_char topic"""
-    result = [topic for topic in topics if not(
-            topic['title'] is None or
-            topic['title'].strip() == '' or
-            topic['title'][0] in config['ignore_char'])]
+def filter_empty_or_ignore_topic(topics, context=None):
+    """filter blank or start with config.ignore_char topic, on every level of the given topics"""
+    ignore_char = _config_of(context)['ignore_char']
+    result = _filter_topics(topics, ignore_char)
+    stack = list(result)
 
-    for topic in result:
-        sub_topics = topic.get('topics', [])
-        topic['topics'] = filter_empty_or_ignore_topic(sub_topics)
+    while stack:
+        topic = stack.pop()
+        topic['topics'] = _filter_topics(topic.get('topics', []), ignore_char)
+        stack.extend(topic['topics'])
 
     return result
 
 
-def filter_empty_or_ignore_element(values):
+def visible_topics(topic, context=None):
+    """filter the direct subtopics of a topic in place and return them"""
+    topic['topics'] = _filter_topics(topic.get('topics', []), _config_of(context)['ignore_char'])
+    return topic['topics']
+
+
+def _filter_topics(topics, ignore_char):
+    return [topic for topic in topics if not(
+            topic['title'] is None or
+            topic['title'].strip() == '' or
+            topic['title'][0] in ignore_char)]
+
+
+def filter_empty_or_ignore_element(values, context=None):
     """Filter all empty or ignore XMind elements, especially notes、comments、labels element"""
+    ignore_char = _config_of(context)['ignore_char']
     result = []
     for value in values:
         if isinstance(value, str):
-            if not value.strip() == '' and not value[0] in config['ignore_char']:
+            if not value.strip() == '' and not value[0] in ignore_char:
                 result.append(value.strip())
         elif isinstance(value, list):
             for v in value:
-                if isinstance(v, str) and not v.strip() == '' and not v[0] in config['ignore_char']:
+                if isinstance(v, str) and not v.strip() == '' and not v[0] in ignore_char:
                     result.append(v.strip())
     return result
 
 
-def sheet_to_suite(root_topic):
+def sheet_to_suite(root_topic, context=None):
     """convert a xmind sheet to a `TestSuite` instance"""
+    context = context or ParseContext()
     suite = TestSuite()
+    suite.name = sheet_product_name(root_topic, context)
+    suite.details = root_topic['note']
+    suite.sub_suites = []
+
+    for suite_dict in root_topic['topics']:
+        suite.sub_suites.append(parse_testsuite(suite_dict, context))
+
+    return suite
+
+
+def sheet_product_name(root_topic, context):
+    """pick the testcase title separator of a sheet (stored in the context) and return the product name"""
     root_title = root_topic['title']
     separator = root_title[-1]
 
-    if separator in config['valid_sep']:
+    if separator in context.config['valid_sep']:
         logging.debug('find a valid separator for connecting testcase title: %s', separator)
-        config['sep'] = separator  # set the separator for the testcase's title
-        root_title = root_title[:-1]
-    else:
-        config['sep'] = ' - '
+        context.sep = separator  # set the separator for the testcase's title
+        return root_title[:-1]
 
-    suite.name = root_title
-    suite.details = root_topic['note']
-    suite.sub_suites = []
+    context.sep = ' - '
+    return root_title
 
-    for suite_dict in root_topic['topics']:
-        suite.sub_suites.append(parse_testsuite(suite_dict))
 
-    return suite
+def iter_testcase_dicts(xmind_content_dict, context=None):
+    """yield flat testcase data straight from the sheets' topic dicts, in a single pass
+
+    Fused equivalent of `xmind_to_testsuites` followed by `utils.testsuites_to_testcase_list`:
+    no `TestSuite`/`TestCase`/`TestStep` objects are built, each dict is the `TestCase.to_dict`
+    data plus its `product` and `suite`.
+    """
+    context = context or ParseContext()
+
+    if context.parallel:
+        for testcases in _map_sheets(_sheet_testcase_dicts, xmind_content_dict, context):
+            yield from testcases
+        return
+
+    for sheet in xmind_content_dict:
+        logging.debug('start to parse a sheet: %s', sheet['title'])
+        root_topic = sheet['topic']
+
+        if not root_topic.get('topics', []):
+            logging.warning('This is a blank sheet(%s), should have at least 1 sub topic(test suite)', sheet['title'])
+            continue
+
+        product = sheet_product_name(root_topic, context)
+        for suite_dict in visible_topics(root_topic, context):
+            suite = suite_dict['title']
+            for cases_dict in visible_topics(suite_dict, context):
+                for case_dict, ancestors in iter_testcase_topics(cases_dict, context=context):
+                    data = parse_testcase_dict(case_dict, ancestors, context)
+                    data['product'] = product
+                    data['suite'] = suite
+                    yield data
+
+
+def _map_sheets(func, xmind_content_dict, context):
+    """parse the sheets in a process pool, large sheets only, keeping the sheet order
+
+    Workers get a plain copy of the context config (the tracer is not propagated to them).
+    """
+    return map_sheets(functools.partial(func, options=context.config), xmind_content_dict, context.workers,
+                      lambda sheet: count_topics(sheet['topic'], _topics_of) >= context.parallel_min_topics)
+
+
+def _topics_of(topic):
+    return topic.get('topics') or []
 
 
-def parse_testsuite(suite_dict):
+def _sheet_testsuites(sheet, options):
+    return list(iter_testsuites([sheet], ParseContext(**options)))
+
+
+def _sheet_testcase_dicts(sheet, options):
+    return list(iter_testcase_dicts([sheet], ParseContext(**options)))
+
+
+def parse_testsuite(suite_dict, context=None):
     testsuite = TestSuite()
     testsuite.name = suite_dict['title']
     testsuite.details = suite_dict['note']
     testsuite.testcase_list = []
     logging.debug('start to parse a testsuite: %s', testsuite.name)
 
-    for cases_dict in suite_dict.get('topics', []):
-        for case in recurse_parse_testcase(cases_dict):
+    for cases_dict in visible_topics(suite_dict, context):
+        for case in recurse_parse_testcase(cases_dict, context=context):
             testsuite.testcase_list.append(case)
 
-    logging.debug('testsuite(%s) parsing complete: %s', testsuite.name, testsuite.to_dict())
+    if tracer.enabled:
+        tracer.event('testsuite', testsuite.to_dict, testsuite.name)
     return testsuite
 
 
-def recurse_parse_testcase(case_dict, parent=None):
-    if is_testcase_topic(case_dict):
-        case = parse_a_testcase(case_dict, parent)
-        yield case
-    else:
-        if not parent:
-            parent = []
+def recurse_parse_testcase(case_dict, parent=None, context=None):
+    """yield every testcase under a topic, walking it with an explicit stack instead of nested generators"""
+    for topic, ancestors in iter_testcase_topics(case_dict, parent, context):
+        yield parse_a_testcase(topic, ancestors, context)
+
 
-        parent.append(case_dict)
+def iter_testcase_topics(case_dict, parent=None, context=None):
+    """yield (testcase topic, its ancestor topics) for every testcase under a topic"""
 
-        for child_dict in case_dict.get('topics', []):
-            for case in recurse_parse_testcase(child_dict, parent):
-                yield case
+    def children_of(topic):
+        children = visible_topics(topic, context)
+        return [] if is_testcase_topic(topic) else children
 
-        parent.pop()
+    for topic, ancestors, children in walk(case_dict, children_of, parent):
+        if not children:
+            yield topic, ancestors
 
 
 def is_testcase_topic(case_dict):
@@ -131,56 +255,83 @@ def is_testcase_topic(case_dict):
 
 def get_max_depth(topic_dict):
     """Calculate the maximum depth of the topic tree. Leaf = 0."""
-    children = topic_dict.get('topics', [])
-    if not children:
-        return 0
-    return 1 + max(get_max_depth(child) for child in children)
+    return max_depth(topic_dict, lambda topic: topic.get('topics', []))
 
 
-def parse_a_testcase(case_dict, parent):
+def parse_a_testcase(case_dict, parent, context=None):
     testcase = TestCase()
     topics = parent + [case_dict] if parent else [case_dict]
 
-    testcase.name = gen_testcase_title(topics)
+    testcase.name = gen_testcase_title(topics, context)
 
-    preconditions = gen_testcase_preconditions(topics)
+    preconditions = gen_testcase_preconditions(topics, context)
     testcase.preconditions = preconditions if preconditions else '无'
 
-    summary = gen_testcase_summary(topics)
+    summary = gen_testcase_summary(topics, context)
     # testcase.summary = summary if summary else testcase.name
     testcase.summary = summary 
-    testcase.execution_type = get_execution_type(topics)
+    testcase.execution_type = get_execution_type(topics, context)
     testcase.importance = get_priority(case_dict) or 2
-    testcase.tc_id = get_tc_id(topics)
+    testcase.tc_id = get_tc_id(topics, context)
 
     step_dict_list = case_dict.get('topics', [])
     if step_dict_list:
-        testcase.steps = parse_test_steps(step_dict_list)
+        testcase.steps = parse_test_steps(step_dict_list, context)
+
+    testcase.result = merge_test_result(get_test_result(case_dict['markers']),
+                                        [step.result for step in testcase.steps or ()])
 
-    # the result of the testcase take precedence over the result of the teststep
-    testcase.result = get_test_result(case_dict['markers'])
+    if tracer.enabled:
+        tracer.event('testcase', testcase.to_dict, testcase.name)
+    return testcase
 
-    if testcase.result == 0 and testcase.steps:
-        for step in testcase.steps:
-            if step.result == 2:
-                testcase.result = 2
-                break
-            if step.result == 3:
-                testcase.result = 3
-                break
 
-            testcase.result = step.result  # there is no need to judge where test step are ignored
+def parse_testcase_dict(case_dict, parent, context=None):
+    """the data of `parse_a_testcase(...).to_dict()`, built without the intermediate objects"""
+    topics = parent + [case_dict] if parent else [case_dict]
+    preconditions = gen_testcase_preconditions(topics, context)
+    steps = [parse_test_step_dict(step_dict, step_num, context)
+             for step_num, step_dict in enumerate(case_dict.get('topics', []), 1)]
+
+    data = {
+        'name': gen_testcase_title(topics, context),
+        'version': 1,
+        'summary': gen_testcase_summary(topics, context),
+        'preconditions': preconditions if preconditions else '无',
+        'execution_type': get_execution_type(topics, context),
+        'importance': get_priority(case_dict) or 2,
+        'estimated_exec_duration': 3,
+        'status': 7,
+        'result': merge_test_result(get_test_result(case_dict['markers']), [step['result'] for step in steps]),
+        'tc_id': get_tc_id(topics, context),
+        'steps': steps
+    }
+
+    if tracer.enabled:
+        tracer.event('testcase', lambda: data, data['name'])
+    return data
+
+
+def merge_test_result(case_result, step_results):
+    """the result of the testcase take precedence over the result of the teststep"""
+    result = case_result
+
+    if result == 0:
+        for step_result in step_results:
+            if step_result in (2, 3):  # failed or blocked
+                return step_result
+
+            result = step_result  # there is no need to judge where test step are ignored
 
-    logging.debug('finds a testcase: %s', testcase.to_dict())
-    return testcase
+    return result
 
-def get_execution_type(topics):
+def get_execution_type(topics, context=None):
     labels = []
     for topic in topics:
         labels.append(topic.get('label', ''))
         labels.append(topic.get('labels', []))
     
-    labels = filter_empty_or_ignore_element(labels)
+    labels = filter_empty_or_ignore_element(labels, context)
     exe_type = 1
     for item in labels[::-1]:
         if item.lower() in ['自动', 'auto', 'automate', 'automation']:
@@ -192,14 +343,14 @@ def get_execution_type(topics):
     return exe_type
 
 
-def get_tc_id(topics):
+def get_tc_id(topics, context=None):
     """Get the testcase ID from labels (the last one wins)"""
     labels = []
     for topic in topics:
         labels.append(topic.get('label', ''))
         labels.append(topic.get('labels', []))
     
-    labels = filter_empty_or_ignore_element(labels)
+    labels = filter_empty_or_ignore_element(labels, context)
     # Usually we expect IDs like TC-001, but we return any valid label as a potential ID
     # if it doesn't match a known exclusion list (though here we just take the last valid one)
     for item in labels[::-1]:
@@ -217,47 +368,47 @@ def get_priority(case_dict):
                 return int(marker[-1])
 
 
-def gen_testcase_title(topics):
+def gen_testcase_title(topics, context=None):
     """Link all topic's title as testcase title"""
     titles = [topic['title'] for topic in topics]
-    titles = filter_empty_or_ignore_element(titles)
+    titles = filter_empty_or_ignore_element(titles, context)
 
     # when separator is not blank, will add space around separator, e.g. '/' will be changed to ' / '
-    separator = config['sep']
+    separator = config['sep'] if context is None else context.sep
     if separator != ' ':
         separator = ' {} '.format(separator)
 
     return separator.join(titles)
 
 
-def gen_testcase_preconditions(topics):
+def gen_testcase_preconditions(topics, context=None):
     notes = [topic['note'] for topic in topics]
-    notes = filter_empty_or_ignore_element(notes)
-    return config['precondition_sep'].join(notes)
+    notes = filter_empty_or_ignore_element(notes, context)
+    return _config_of(context)['precondition_sep'].join(notes)
 
 
-def gen_testcase_summary(topics):
+def gen_testcase_summary(topics, context=None):
     comments = [topic['comment'] for topic in topics]
-    comments = filter_empty_or_ignore_element(comments)
-    return config['summary_sep'].join(comments)
+    comments = filter_empty_or_ignore_element(comments, context)
+    return _config_of(context)['summary_sep'].join(comments)
 
 
-def parse_test_steps(step_dict_list):
+def parse_test_steps(step_dict_list, context=None):
     steps = []
 
     for step_num, step_dict in enumerate(step_dict_list, 1):
-        test_step = parse_a_test_step(step_dict)
+        test_step = parse_a_test_step(step_dict, context)
         test_step.step_number = step_num
         steps.append(test_step)
 
     return steps
 
 
-def parse_a_test_step(step_dict):
+def parse_a_test_step(step_dict, context=None):
     test_step = TestStep()
     test_step.actions = step_dict['title']
 
-    expected_topics = step_dict.get('topics', [])
+    expected_topics = visible_topics(step_dict, context)
     if expected_topics:  # have expected result
         expected_topic = expected_topics[0]
         test_step.expectedresults = expected_topic['title']  # one test step action, one test expected result
@@ -267,10 +418,34 @@ def parse_a_test_step(step_dict):
         markers = step_dict['markers']
         test_step.result = get_test_result(markers)
 
-    logging.debug('finds a teststep: %s', test_step.to_dict())
+    if tracer.enabled:
+        tracer.event('teststep', test_step.to_dict, test_step.actions)
     return test_step
 
 
+def parse_test_step_dict(step_dict, step_number, context=None):
+    """the data of `parse_a_test_step(...).to_dict()`, built without the intermediate object"""
+    expected_topics = visible_topics(step_dict, context)
+    if expected_topics:  # have expected result
+        expectedresults = expected_topics[0]['title']
+        result = get_test_result(expected_topics[0]['markers'])
+    else:  # only have test step
+        expectedresults = ''
+        result = get_test_result(step_dict['markers'])
+
+    data = {
+        'step_number': step_number,
+        'actions': step_dict['title'],
+        'expectedresults': expectedresults,
+        'execution_type': 1,
+        'result': result
+    }
+
+    if tracer.enabled:
+        tracer.event('teststep', lambda: data, data['actions'])
+    return data
+
+
 def get_test_result(markers):
     """test result: non-execution:0, pass:1, failed:2, blocked:3, skipped:4"""
     if isinstance(markers, list):
@@ -1,119 +1,156 @@
 #!/usr/bin/env python
 # _*_ coding:utf-8 _*_
 import logging
-import os
-from io import BytesIO
-from xml.dom import minidom
 from xml.sax.saxutils import escape
 from xmind2testcase import const
 from xmind2testcase.parser import config
-from xmind2testcase.utils import get_xmind_testsuites, get_absolute_path
-from xml.etree.ElementTree import Element, SubElement, ElementTree, Comment
+from xmind2testcase.utils import atomic_output, get_xmind_testsuites, get_absolute_path
 
 """
 Convert XMind fie to TestLink testcase xml file 
 """
 
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8"?>'
+_ATTR_ENTITIES = {'"': '&quot;', '\n': '&#10;', '\r': '&#13;', '\t': '&#9;'}
 
-def xmind_to_testlink_xml_file(xmind_file, is_all_sheet=True, testsuites=None):
-    """Convert a XMind sheet to a testlink xml file"""
+
+def xmind_to_testlink_xml_file(xmind_file, is_all_sheet=True, testsuites=None, indent='\t'):
+    """Convert a XMind sheet to a testlink xml file
+
+    :param testsuites: optional parsed `TestSuite` list or `xmind2testcase.casetable.CaseTable`
+    :param indent: indentation of the xml elements, None writes a compact document
+    """
     xmind_file = get_absolute_path(xmind_file)
     logging.info('Start converting XMind file(%s) to testlink file...', xmind_file)
     
     if testsuites is None:
         testsuites = get_xmind_testsuites(xmind_file)
+    elif hasattr(testsuites, 'to_testsuites'):
+        testsuites = testsuites.to_testsuites()
         
     if not is_all_sheet and testsuites:
         testsuites = [testsuites[0]]
 
-    xml_content = testsuites_to_xml_content(testsuites)
     testlink_xml_file = xmind_file[:-6] + '.xml'
 
-    if os.path.exists(testlink_xml_file):
-        logging.info('the testlink xml file already exists, return it directly: %s', testlink_xml_file)
-        return testlink_xml_file
+    # always regenerated: an existing file may come from an older version of the XMind file
+    with atomic_output(testlink_xml_file) as tmp_file:
+        write_testlink_xml_file(testsuites, tmp_file, indent)
+    logging.info('convert XMind file(%s) to a testlink xml file(%s) successfully!', xmind_file, testlink_xml_file)
+
+    return testlink_xml_file
+
 
+def write_testlink_xml_file(testsuites, testlink_xml_file, indent='\t'):
+    """Write the testsuites to a testlink xml file, streaming the document"""
     with open(testlink_xml_file, 'w', encoding='utf-8') as f:
-        pretty_content = minidom.parseString(xml_content).toprettyxml(indent='\t')
-        f.write(pretty_content)
-        logging.info('convert XMind file(%s) to a testlink xml file(%s) successfully!', xmind_file, testlink_xml_file)
+        f.writelines(iter_testlink_xml(testsuites, indent))
 
     return testlink_xml_file
 
 
 def testsuites_to_xml_content(testsuites):
     """Convert the testsuites to testlink xml file format"""
-    root_element = Element(const.TAG_TESTSUITE)
-    # setting the root suite's name attribute, that will generate a new testsuite folder on testlink
-    # root_element.set(const.ATTR_NMAE, testsuite.name)
+    return ''.join(iter_testlink_xml(testsuites, indent=None)).encode('utf-8')
+
+
+def iter_testlink_xml(testsuites, indent='\t'):
+    """Yield the testlink xml document piece by piece (about one testcase per piece) while iterating the suites
+
+    Nothing but the current testcase is held in memory, so the output can go straight to a file
+    or an HTTP response. Text contents are written as real CDATA sections.
+
+    :param indent: indentation of the xml elements, None (or '') writes a compact document
+    """
+    indent = indent or ''
+    newline = '\n' if indent else ''
+
+    def line(depth, text):
+        return indent * depth + text + newline
+
+    yield XML_DECLARATION + newline
+    yield line(0, start_tag(const.TAG_TESTSUITE))
 
     for testsuite in testsuites:
-        suite_element = SubElement(root_element, const.TAG_TESTSUITE)
-        suite_element.set(const.ATTR_NMAE, testsuite.name)
-        gen_text_element(suite_element, const.TAG_DETAILS, testsuite.details)
+        yield line(1, start_tag(const.TAG_TESTSUITE, testsuite.name))
+        yield text_element_xml(testsuite.details, const.TAG_DETAILS, 2, line)
 
-        for sub_suite in testsuite.sub_suites:
+        for sub_suite in testsuite.sub_suites or ():
             if is_should_skip(sub_suite.name):
                 continue
-            sub_suite_element = SubElement(suite_element, const.TAG_TESTSUITE)
-            sub_suite_element.set(const.ATTR_NMAE, sub_suite.name)
-            gen_text_element(sub_suite_element, const.TAG_DETAILS, sub_suite.details)
-            gen_testcase_element(sub_suite_element, sub_suite)
+            yield line(2, start_tag(const.TAG_TESTSUITE, sub_suite.name))
+            yield text_element_xml(sub_suite.details, const.TAG_DETAILS, 3, line)
 
-    testlink = ElementTree(root_element)
-    content_stream = BytesIO()
-    testlink.write(content_stream, encoding='utf-8', xml_declaration=True)
-    return content_stream.getvalue()
+            for testcase in sub_suite.testcase_list or ():
+                if not is_should_skip(testcase.name):
+                    yield testcase_xml(testcase, 3, line)
 
+            yield line(2, end_tag(const.TAG_TESTSUITE))
 
-def gen_testcase_element(suite_element, suite):
-    for testcase in suite.testcase_list:
+        yield line(1, end_tag(const.TAG_TESTSUITE))
 
-        if is_should_skip(testcase.name):
-            continue
+    yield line(0, end_tag(const.TAG_TESTSUITE))
 
-        testcase_elment = SubElement(suite_element, const.TAG_TESTCASE)
-        testcase_elment.set(const.ATTR_NMAE, testcase.name)
 
-        gen_text_element(testcase_elment, const.TAG_VERSION, str(testcase.version))
-        gen_text_element(testcase_elment, const.TAG_SUMMARY, testcase.summary)
-        gen_text_element(testcase_elment, const.TAG_PRECONDITIONS, testcase.preconditions)
-        gen_text_element(testcase_elment, const.TAG_EXECUTION_TYPE, _convert_execution_type(testcase.execution_type))
-        gen_text_element(testcase_elment, const.TAG_IMPORTANCE, _convert_importance(testcase.importance))
+def testcase_xml(testcase, depth, line):
+    """the xml of a testcase element, `line(depth, text)` lays out a line at the given depth"""
+    parts = [line(depth, start_tag(const.TAG_TESTCASE, testcase.name))]
+    inner = depth + 1
 
-        estimated_exec_duration_element = SubElement(testcase_elment, const.TAG_ESTIMATED_EXEC_DURATION)
-        estimated_exec_duration_element.text = str(testcase.estimated_exec_duration)
+    parts.append(text_element_xml(str(testcase.version), const.TAG_VERSION, inner, line))
+    parts.append(text_element_xml(testcase.summary, const.TAG_SUMMARY, inner, line))
+    parts.append(text_element_xml(testcase.preconditions, const.TAG_PRECONDITIONS, inner, line))
+    parts.append(text_element_xml(_convert_execution_type(testcase.execution_type), const.TAG_EXECUTION_TYPE,
+                                  inner, line))
+    parts.append(text_element_xml(_convert_importance(testcase.importance), const.TAG_IMPORTANCE, inner, line))
 
-        status = SubElement(testcase_elment, const.TAG_STATUS)
-        status.text = str(testcase.status) if testcase.status in (1, 2, 3, 4, 5, 6, 7) else '7'
+    status = str(testcase.status) if testcase.status in (1, 2, 3, 4, 5, 6, 7) else '7'
+    parts.append(line(inner, plain_element(const.TAG_ESTIMATED_EXEC_DURATION, str(testcase.estimated_exec_duration))))
+    parts.append(line(inner, plain_element(const.TAG_STATUS, status)))
 
-        gen_steps_element(testcase_elment, testcase)
+    if testcase.steps:
+        steps = [step for step in testcase.steps if not is_should_skip(step.actions)]
+        if not steps:
+            parts.append(line(inner, '<{}/>'.format(const.TAG_STEPS)))
+        else:
+            parts.append(line(inner, start_tag(const.TAG_STEPS)))
+            for step in steps:
+                parts.append(line(inner + 1, start_tag(const.TAG_STEP)))
+                parts.append(text_element_xml(str(step.step_number), const.TAG_STEP_NUMBER, inner + 2, line))
+                parts.append(text_element_xml(step.actions, const.TAG_ACTIONS, inner + 2, line))
+                parts.append(text_element_xml(step.expectedresults, const.TAG_EXPECTEDRESULTS, inner + 2, line))
+                parts.append(text_element_xml(_convert_execution_type(step.execution_type), const.TAG_EXECUTION_TYPE,
+                                              inner + 2, line))
+                parts.append(line(inner + 1, end_tag(const.TAG_STEP)))
+            parts.append(line(inner, end_tag(const.TAG_STEPS)))
 
+    parts.append(line(depth, end_tag(const.TAG_TESTCASE)))
+    return ''.join(parts)
 
-def gen_steps_element(testcase_element, testcase):
-    if testcase.steps:
-        steps_element = SubElement(testcase_element, const.TAG_STEPS)
 
-        for step in testcase.steps:
+def start_tag(tag_name, name=None):
+    if name is None:
+        return '<{}>'.format(tag_name)
+    return '<{} {}="{}">'.format(tag_name, const.ATTR_NMAE, escape(str(name), _ATTR_ENTITIES))
 
-            if is_should_skip(step.actions):
-                continue
 
-            step_element = SubElement(steps_element, const.TAG_STEP)
-            gen_text_element(step_element, const.TAG_STEP_NUMBER, str(step.step_number))
-            gen_text_element(step_element, const.TAG_ACTIONS, step.actions)
-            gen_text_element(step_element, const.TAG_EXPECTEDRESULTS, step.expectedresults)
-            gen_text_element(step_element, const.TAG_EXECUTION_TYPE, _convert_execution_type(step.execution_type))
+def end_tag(tag_name):
+    return '</{}>'.format(tag_name)
 
 
-def gen_text_element(parent_element, tag_name, content):
-    """generate an element's text conent: <![CDATA[text]]>"""
-    if is_should_parse(content):
-        child_element = SubElement(parent_element, tag_name)
-        element_set_text(child_element, content)
+def plain_element(tag_name, content):
+    return '<{0}>{1}</{0}>'.format(tag_name, escape(content))
+
 
+def text_element_xml(content, tag_name, depth, line):
+    """an element with a CDATA text content, or '' when the content should not be parsed"""
+    if not is_should_parse(content):
+        return ''
+    return line(depth, '<{0}>{1}</{0}>'.format(tag_name, cdata_text(content)))
 
-def element_set_text(element, content):
+
+def cdata_text(content):
+    """generate an element's text conent: <![CDATA[text]]>"""
     # retain html tags in content
     content = escape(content, entities={'\r\n': '<br />'})
     # replace new line for *nix system
@@ -121,8 +158,7 @@ def element_set_text(element, content):
     # add the line break in source to make it readable
     content = content.replace('<br />', '<br />\n')
 
-    # add CDATA for a element
-    element.append(Comment(' --><![CDATA[' + content.replace(']]>', ']]]]><![CDATA[>') + ']]> <!-- '))
+    return '<![CDATA[' + content.replace(']]>', ']]]]><![CDATA[>') + ']]>'
 
 
 def is_should_parse(content):
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import logging
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager, nullcontext
+
+"""
+Opt-in structured tracing of the XMind parser
+
+Tracing is disabled by default and every call site is guarded by `tracer.enabled`, so payloads
+such as `TestCase.to_dict()` are only built while tracing is switched on.
+"""
+
+
+class ParseTracer(object):
+
+    def __init__(self, max_events=1000):
+        """
+        ParseTracer
+        :param max_events: how many recent events (with their payloads) to keep
+        """
+        self.enabled = False
+        self.max_events = max_events
+        self.reset()
+
+    def enable(self, max_events=None):
+        if max_events is not None:
+            self.max_events = max_events
+            self.events = deque(self.events, maxlen=max_events)
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        self.counters = defaultdict(int)
+        self.timings = defaultdict(float)
+        self.events = deque(maxlen=self.max_events)
+
+    def event(self, stage, payload=None, label=None):
+        """Count an event of a parsing stage
+
+        :param stage: stage name, e.g. 'sheet', 'testsuite', 'testcase', 'teststep'
+        :param payload: zero-argument callable building the event data, only called here
+        :param label: short description of the object, e.g. a sheet title
+        """
+        self.counters[stage] += 1
+        data = payload() if payload is not None else None
+        self.events.append((stage, label, data))
+        logging.debug('[trace] %s(%s): %s', stage, label, data)
+
+    def stage(self, name):
+        """Context manager accumulating the wall time of a stage, a no-op while disabled"""
+        if not self.enabled:
+            return nullcontext()
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] += time.perf_counter() - start
+
+    def snapshot(self):
+        return {'counters': dict(self.counters),
+                'timings': dict(self.timings),
+                'events': list(self.events)}
+
+
+tracer = ParseTracer()
@@ -2,10 +2,14 @@
 # _*_ coding:utf-8 _*_
 import json
 import os
+import uuid
 import xmind
 import logging
-from xmind2testcase.parser import xmind_to_testsuites
-from xmindparser import is_xmind_zen,xmind_to_dict
+from contextlib import contextmanager
+from xmind2testcase.casetable import CaseTable
+from xmind2testcase.parser import xmind_to_testsuites, iter_testsuites, iter_testcase_dicts, ParseContext
+from xmind2testcase.trace import tracer
+from xmindparser import is_xmind_zen, iter_xmind_sheets
 
 
 def get_absolute_path(path):
@@ -23,36 +27,94 @@ def get_absolute_path(path):
     return os.path.join(fp, fn)
 
 
-def get_xmind_testsuites(xmind_file):
-    """Load the XMind file and parse to `xmind2testcase.metadata.TestSuite` list"""
+def load_xmind_sheets(xmind_file, context=None):
+    """Load the sheets of a XMind file, Zen sheets are streamed lazily
+
+    :param context: optional `xmind2testcase.parser.ParseContext`
+    """
     xmind_file = get_absolute_path(xmind_file)
+    context = context or ParseContext()
     '''
         适配xmind高版本
     '''
     if is_xmind_zen(xmind_file):
-        xmind_content_dict = xmind_to_dict(xmind_file)
-    else:
+        # sheets are streamed one by one, so the whole content.json is never materialized
+        return iter_xmind_sheets(xmind_file, context.reader_session)
+
+    with tracer.stage('load'):
         workbook = xmind.load(xmind_file)
         xmind_content_dict = workbook.getData()
-    logging.debug("loading XMind file(%s) dict data: %s", xmind_file, xmind_content_dict)
 
-    if xmind_content_dict:
-        testsuites = xmind_to_testsuites(xmind_content_dict)
-        return testsuites
-    else:
+    if tracer.enabled:
+        tracer.event('load', lambda: xmind_content_dict, xmind_file)
+
+    return xmind_content_dict or []
+
+
+@contextmanager
+def atomic_output(target):
+    """Yield a temporary path next to `target`, moved over `target` only once it was fully written
+
+    Readers never see a partial file and concurrent writers never interleave, the last one wins.
+    """
+    tmp_file = '{}.{}.tmp'.format(target, uuid.uuid4().hex[:12])
+    try:
+        yield tmp_file
+        os.replace(tmp_file, target)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+
+
+def get_xmind_testsuites(xmind_file, context=None):
+    """Load the XMind file and parse to `xmind2testcase.metadata.TestSuite` list
+
+    :param context: optional `xmind2testcase.parser.ParseContext`, a fresh one is used by default
+    """
+    xmind_file = get_absolute_path(xmind_file)
+    context = context or ParseContext()
+    xmind_content_dict = load_xmind_sheets(xmind_file, context)
+
+    with tracer.stage('parse'):
+        testsuites = xmind_to_testsuites(xmind_content_dict, context)
+    if not testsuites:
         logging.error('Invalid XMind file(%s): it is empty!', xmind_file)
-        return []
 
+    return testsuites
+
+
+def get_xmind_case_table(xmind_file, context=None):
+    """Load the XMind file and parse it into a columnar `xmind2testcase.casetable.CaseTable`
+
+    Sheets are parsed and packed one at a time, so only one sheet's metadata objects are alive.
+
+    :param context: optional `xmind2testcase.parser.ParseContext`
+    """
+    xmind_file = get_absolute_path(xmind_file)
+    context = context or ParseContext()
+    xmind_content_dict = load_xmind_sheets(xmind_file, context)
+    table = CaseTable()
+
+    with tracer.stage('parse'):
+        for testsuite in iter_testsuites(xmind_content_dict, context):
+            table.add_testsuite(testsuite)
+    if not len(table):
+        logging.error('Invalid XMind file(%s): it has no testcase!', xmind_file)
 
-def get_xmind_testsuite_list(xmind_file):
+    return table
+
+
+def get_xmind_testsuite_list(xmind_file, context=None):
     """Load the XMind file and get all testsuite in it
 
     :param xmind_file: the target XMind file
+    :param context: optional `xmind2testcase.parser.ParseContext`
     :return: a list of testsuite data
     """
     xmind_file = get_absolute_path(xmind_file)
     logging.info('Start converting XMind file(%s) to testsuite data list...', xmind_file)
-    testsuite_list = get_xmind_testsuites(xmind_file)
+    testsuite_list = get_xmind_testsuites(xmind_file, context)
     suite_data_list = []
 
     for testsuite in testsuite_list:
@@ -86,15 +148,69 @@ def get_xmind_testsuite_list(xmind_file):
     return suite_data_list
 
 
-def get_xmind_testcase_list(xmind_file):
+def get_xmind_testcase_list(xmind_file, context=None):
     """Load the XMind file and get all testcase in it
 
     :param xmind_file: the target XMind file
+    :param context: optional `xmind2testcase.parser.ParseContext`
     :return: a list of testcase data
     """
     xmind_file = get_absolute_path(xmind_file)
     logging.info('Start converting XMind file(%s) to testcases dict data...', xmind_file)
-    testsuites = get_xmind_testsuites(xmind_file)
+    testcases = list(iter_xmind_testcases(xmind_file, context))
+
+    logging.info('Convert XMind file(%s) to testcases dict data successfully!', xmind_file)
+    return testcases
+
+
+def iter_xmind_testcases(xmind_file, context=None):
+    """Load the XMind file and yield its testcase data one by one
+
+    This is the fused fast path: flat testcase dicts are built straight from the reader's topic
+    dicts, without the `TestSuite`/`TestCase`/`TestStep` objects in between.
+
+    :param xmind_file: the target XMind file
+    :param context: optional `xmind2testcase.parser.ParseContext`
+    """
+    xmind_file = get_absolute_path(xmind_file)
+    context = context or ParseContext()
+    xmind_content_dict = load_xmind_sheets(xmind_file, context)
+    empty = True
+
+    for case_data in iter_testcase_dicts(xmind_content_dict, context):
+        empty = False
+        yield case_data
+
+    if empty:
+        logging.error('Invalid XMind file(%s): it has no testcase!', xmind_file)
+
+
+def iter_json_chunks(items, indent=None, ensure_ascii=True):
+    """Yield the text of `json.dumps(list(items), ...)` piece by piece, encoding one item at a time
+
+    The output is identical to `json.dumps` with the default separators (or `(',', ': ')` when
+    indenting), so arrays can be written to a file or a response while the items are produced.
+    """
+    separators = (', ', ': ') if indent is None else (',', ': ')
+    newline = '' if indent is None else '\n' + ' ' * indent
+    first = True
+
+    for item in items:
+        text = json.dumps(item, indent=indent, separators=separators, ensure_ascii=ensure_ascii)
+        if newline:
+            # nest the item one level deeper, encoded strings never hold a raw line break
+            text = text.replace('\n', newline)
+        yield ('[' if first else separators[0]) + newline + text
+        first = False
+
+    yield '[]' if first else newline[:1] + ']'
+
+
+def testsuites_to_testcase_list(testsuites):
+    """Flatten parsed `TestSuite` list (or a `CaseTable`) to testcase data, tagging every case with its product and suite"""
+    if hasattr(testsuites, 'to_testcase_list'):
+        return testsuites.to_testcase_list()
+
     testcases = []
 
     for testsuite in testsuites:
@@ -106,7 +222,6 @@ def get_xmind_testcase_list(xmind_file):
                 case_data['suite'] = suite.name
                 testcases.append(case_data)
 
-    logging.info('Convert XMind file(%s) to testcases dict data successfully!', xmind_file)
     return testcases
 
 
@@ -123,18 +238,22 @@ def xmind_testsuite_to_json_file(xmind_file):
         # return testsuite_json_file
 
     with open(testsuite_json_file, 'w', encoding='utf8') as f:
-        f.write(json.dumps(testsuites, indent=4, separators=(',', ': '), ensure_ascii=False))
+        f.writelines(iter_json_chunks(testsuites, indent=4, ensure_ascii=False))
         logging.info('Convert XMind file(%s) to a testsuite json file(%s) successfully!', xmind_file,
                      testsuite_json_file)
 
     return testsuite_json_file
 
 
-def xmind_testcase_to_json_file(xmind_file):
-    """Convert XMind file to a testcase json file"""
+def xmind_testcase_to_json_file(xmind_file, testcases=None):
+    """Convert XMind file to a testcase json file
+
+    :param testcases: optional testcase data already parsed from the file, to avoid parsing it again
+    """
     xmind_file = get_absolute_path(xmind_file)
     logging.info('Start converting XMind file(%s) to testcases json file...', xmind_file)
-    testcases = get_xmind_testcase_list(xmind_file)
+    if testcases is None:
+        testcases = iter_xmind_testcases(xmind_file)
     testcase_json_file = xmind_file[:-6] + '.json'
 
     if os.path.exists(testcase_json_file):
@@ -143,7 +262,7 @@ def xmind_testcase_to_json_file(xmind_file):
         # return testcase_json_file
 
     with open(testcase_json_file, 'w', encoding='utf8') as f:
-        f.write(json.dumps(testcases, indent=4, separators=(',', ': '), ensure_ascii=False))
+        f.writelines(iter_json_chunks(testcases, indent=4, ensure_ascii=False))
         logging.info('Convert XMind file(%s) to a testcase json file(%s) successfully!', xmind_file, testcase_json_file)
 
     return testcase_json_file
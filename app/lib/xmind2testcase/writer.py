@@ -1,43 +1,102 @@
+import hashlib
 import json
+import time
 import uuid
 from io import BytesIO
-from zipfile import ZipFile, ZIP_DEFLATED
+from zipfile import ZipInfo, ZIP_DEFLATED
 from .metadata import TestSuite, TestCase, TestStep
+from .zipstream import iter_zip
+
+# timestamp of every entry of a deterministic archive (the earliest one a zip can hold)
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+MANIFEST = {
+    "file-entries": {
+        "content.json": {},
+        "metadata.json": {}
+    }
+}
 
 def gen_id():
     return str(uuid.uuid4())
 
-def get_xmind_zen_content(testsuites):
+def path_id(path):
+    """
+    Deterministic topic id: a short hash of the topic position in the map ("0.2.1").
+    Positions are unique within a map, so the same testsuites always get the same ids.
+    """
+    return hashlib.blake2b(path.encode('ascii'), digest_size=13).hexdigest()
+
+def topic_id(path=None):
+    return gen_id() if path is None else path_id(path)
+
+def child_path(path, index):
+    return None if path is None else f'{path}.{index}'
+
+def get_root_suite(testsuites):
+    """
+    If list is just one root suite, use it as Central Topic,
+    otherwise put all testsuites as Main Topics under one Central Topic.
+    """
+    if len(testsuites) == 1:
+        return testsuites[0]
+
+    root_suite = TestSuite()
+    root_suite.name = "Test Plan"
+    root_suite.sub_suites = testsuites
+    return root_suite
+
+def get_xmind_zen_content(testsuites, deterministic=False):
     """
     Convert testsuites to XMind Zen content.json structure.
     Expects a list of TestSuite objects (usually one root sheet).
+    With `deterministic`, topic ids are derived from the topic positions instead of random uuids.
     """
     sheets = []
     
-    # If list is empty or just one root suite, treat as one sheet
     # XMind usually has one map per file unless multiple sheets.
-    # We will put all testsuites as Main Topics under one Central Topic if multiple,
-    # or if single root suite, use it as Central Topic.
-    
-    root_suite = None
-    if len(testsuites) == 1:
-        root_suite = testsuites[0]
-    else:
-        root_suite = TestSuite()
-        root_suite.name = "Test Plan"
-        root_suite.sub_suites = testsuites
-    
     sheet = {
-        "id": gen_id(),
+        "id": topic_id('sheet' if deterministic else None),
         "title": "Canvas 1",
-        "rootTopic": suite_to_topic(root_suite, is_root=True)
+        "rootTopic": suite_to_topic(get_root_suite(testsuites), is_root=True, path='0' if deterministic else None)
     }
     sheets.append(sheet)
     return sheets
 
-def suite_to_topic(suite, is_root=False):
+def iter_xmind_zen_content(testsuites, deterministic=False):
+    """
+    Encode the content.json of `get_xmind_zen_content` incrementally, as str chunks.
+    Only one testcase topic is held as a dict at a time; with `deterministic` the joined chunks
+    are exactly `json.dumps(get_xmind_zen_content(testsuites, deterministic=True))`.
+    """
+    yield '[{"id": %s, "title": "Canvas 1", "rootTopic": ' % json.dumps(topic_id('sheet' if deterministic else None))
+    yield from iter_suite_topic(get_root_suite(testsuites), is_root=True, path='0' if deterministic else None)
+    yield '}]'
+
+def iter_suite_topic(suite, is_root=False, path=None):
+    yield '{"id": %s, "title": %s' % (json.dumps(topic_id(path)), json.dumps(suite.name))
+
+    sub_suites = suite.sub_suites or []
+    testcases = suite.testcase_list or []
+    if sub_suites or testcases:
+        yield ', "children": {"attached": ['
+        for i, sub in enumerate(sub_suites):
+            if i:
+                yield ', '
+            yield from iter_suite_topic(sub, path=child_path(path, i))
+        for i, case in enumerate(testcases, len(sub_suites)):
+            if i:
+                yield ', '
+            yield json.dumps(case_to_topic(case, path=child_path(path, i)))
+        yield ']}'
+
+    # Structure Class (Logic right for root)
+    if is_root:
+        yield ', "structureClass": "org.xmind.ui.logic.right"'
+    yield '}'
+
+def suite_to_topic(suite, is_root=False, path=None):
     topic = {
-        "id": gen_id(),
+        "id": topic_id(path),
         "title": suite.name,
         "children": {
             "attached": []
@@ -48,25 +107,27 @@ def suite_to_topic(suite, is_root=False):
     if is_root:
         topic["structureClass"] = "org.xmind.ui.logic.right"
 
+    attached = topic["children"]["attached"]
+
     # Sub Suites
     if suite.sub_suites:
         for sub in suite.sub_suites:
-            topic["children"]["attached"].append(suite_to_topic(sub))
+            attached.append(suite_to_topic(sub, path=child_path(path, len(attached))))
             
     # Test Cases
     if suite.testcase_list:
         for case in suite.testcase_list:
-            topic["children"]["attached"].append(case_to_topic(case))
+            attached.append(case_to_topic(case, path=child_path(path, len(attached))))
             
     # Clean up empty children
-    if not topic["children"]["attached"]:
+    if not attached:
         del topic["children"]
         
     return topic
 
-def case_to_topic(case):
+def case_to_topic(case, path=None):
     topic = {
-        "id": gen_id(),
+        "id": topic_id(path),
         "title": case.name,
         "children": {
             "attached": []
@@ -97,18 +158,18 @@ def case_to_topic(case):
     
     # Steps
     if case.steps:
-        for step in case.steps:
-            topic["children"]["attached"].append(step_to_topic(step))
+        for i, step in enumerate(case.steps):
+            topic["children"]["attached"].append(step_to_topic(step, path=child_path(path, i)))
             
     if not topic["children"]["attached"]:
         del topic["children"]
         
     return topic
 
-def step_to_topic(step):
+def step_to_topic(step, path=None):
     # Step Action
     topic = {
-        "id": gen_id(),
+        "id": topic_id(path),
         "title": step.actions,
         "children": {
             "attached": []
@@ -118,7 +179,7 @@ def step_to_topic(step):
     # Expected Result
     if step.expectedresults:
         expected_topic = {
-            "id": gen_id(),
+            "id": topic_id(child_path(path, 0)),
             "title": step.expectedresults
         }
         topic["children"]["attached"].append(expected_topic)
@@ -128,29 +189,54 @@ def step_to_topic(step):
         
     return topic
 
-def write_xmind_zip(testsuites):
+def zip_entry_info(name, deterministic=False):
+    date_time = ZIP_DATE_TIME if deterministic else time.localtime(time.time())[:6]
+    info = ZipInfo(name, date_time=date_time)
+    info.compress_type = ZIP_DEFLATED
+    info.external_attr = 0o600 << 16
+    return info
+
+def encode_chunks(chunks, buffer_size=64 * 1024):
+    """Encode str chunks to utf-8 bytes chunks of about `buffer_size` characters."""
+    buffer = []
+    size = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        size += len(chunk)
+        if size >= buffer_size:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+def iter_xmind_zip(testsuites, deterministic=False):
+    """
+    Yield the XMind file of testsuites as bytes chunks, while it is generated.
+
+    content.json is encoded incrementally straight into its (deflated) zip entry, which is
+    streamed out with a data descriptor, so neither the document nor the archive is ever held
+    in memory. With `deterministic`, topic ids and entry timestamps are fixed: the same
+    testsuites always give byte-identical files.
     """
-    Generate XMind file bytes from testsuites.
+    entries = [
+        (zip_entry_info('content.json', deterministic), encode_chunks(iter_xmind_zen_content(testsuites, deterministic))),
+        # 'manifest.json' is required by some readers, content.json is usually enough for Zen
+        (zip_entry_info('manifest.json', deterministic), [json.dumps(MANIFEST).encode('utf-8')]),
+        (zip_entry_info('metadata.json', deterministic), [json.dumps({}).encode('utf-8')]),
+    ]
+    return iter_zip(entries)
+
+def write_xmind_zip(testsuites, fileobj=None, deterministic=False):
     """
-    content = get_xmind_zen_content(testsuites)
-    json_str = json.dumps(content)
-    
-    # Create simple metadata and manifest just in case, though content.json is usually enough for Zen
-    # Actually 'manifest.json' is required by some readers.
-    manifest = {
-        "file-entries": {
-            "content.json": {},
-            "metadata.json": {}
-        }
-    }
-    
-    metadata = {}
+    Generate XMind file bytes from testsuites, see `iter_xmind_zip`.
 
-    out = BytesIO()
-    with ZipFile(out, 'w', ZIP_DEFLATED) as zf:
-        zf.writestr('content.json', json_str)
-        zf.writestr('manifest.json', json.dumps(manifest))
-        zf.writestr('metadata.json', json.dumps(metadata))
-        
-    out.seek(0)
+    :param fileobj: binary file to write to, a new `BytesIO` (returned seeked to 0) by default
+    """
+    out = fileobj if fileobj is not None else BytesIO()
+    for chunk in iter_xmind_zip(testsuites, deterministic):
+        out.write(chunk)
+
+    if fileobj is None:
+        out.seek(0)
     return out
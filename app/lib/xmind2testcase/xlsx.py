@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import logging
+import re
+from xml.sax.saxutils import escape
+
+from xmind2testcase.utils import atomic_output, get_absolute_path, iter_xmind_testcases
+from xmind2testcase.writer import encode_chunks, zip_entry_info
+from xmind2testcase.zentao import FILEHEADER, gen_a_testcase_row
+from xmind2testcase.zipstream import iter_zip
+
+"""
+Convert XMind file to a xlsx workbook with the zentao csv columns
+
+The sheet xml is generated row by row straight into its zip entry and cells hold inline
+strings (no shared strings table to build first), so memory stays flat whatever the number
+of testcases. Steps and expected results go in wrapped, multi-line cells.
+"""
+
+MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+SHEET_NAME = "testcases"
+# column widths (in characters) of the FILEHEADER columns, and the ones holding multi-line text
+COLUMN_WIDTHS = [20, 40, 30, 50, 50, 10, 8, 12, 14]
+WRAPPED_COLUMNS = {2, 3, 4}
+COLUMN_LETTERS = [chr(ord('A') + i) for i in range(len(FILEHEADER))]
+# cell styles, see STYLES: 0 default, 1 wrapped text, 2 bold header
+STYLE_WRAPPED = 1
+STYLE_HEADER = 2
+
+_XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+_PACKAGE_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+# characters xml 1.0 cannot hold at all
+_INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]')
+
+CONTENT_TYPES = (
+    _XML_DECLARATION +
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+ROOT_RELS = (
+    _XML_DECLARATION +
+    '<Relationships xmlns="%s">'
+    '<Relationship Id="rId1" Type="%s/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>' % (_PACKAGE_REL_NS, _REL_NS)
+)
+WORKBOOK = (
+    _XML_DECLARATION +
+    '<workbook xmlns="%s" xmlns:r="%s"><sheets><sheet name="%s" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    % (_MAIN_NS, _REL_NS, SHEET_NAME)
+)
+WORKBOOK_RELS = (
+    _XML_DECLARATION +
+    '<Relationships xmlns="%s">'
+    '<Relationship Id="rId1" Type="%s/worksheet" Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" Type="%s/styles" Target="styles.xml"/>'
+    '</Relationships>' % (_PACKAGE_REL_NS, _REL_NS, _REL_NS)
+)
+STYLES = (
+    _XML_DECLARATION +
+    '<styleSheet xmlns="%s">'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="3">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0" applyAlignment="1">'
+    '<alignment vertical="top" wrapText="1"/></xf>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+    '</cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>' % _MAIN_NS
+)
+
+
+def xmind_to_xlsx_file(xmind_file, testcases=None, case_type=None, apply_phase=None):
+    """Convert XMind file to a xlsx workbook with the zentao csv columns
+
+    :param testcases: optional testcase data list or iterator, `xmind2testcase.casetable.CaseTable` rows work as well
+    """
+    xmind_file = get_absolute_path(xmind_file)
+    logging.info("Start converting XMind file(%s) to xlsx file...", xmind_file)
+
+    if testcases is None:
+        testcases = iter_xmind_testcases(xmind_file)
+
+    xlsx_file = xmind_file[:-6] + ".xlsx"
+    with atomic_output(xlsx_file) as tmp_file:
+        write_xlsx_file(testcases, tmp_file, case_type=case_type, apply_phase=apply_phase)
+    logging.info("Convert XMind file(%s) to a xlsx file(%s) successfully!", xmind_file, xlsx_file)
+
+    return xlsx_file
+
+
+def write_xlsx_file(testcases, xlsx_file, case_type=None, apply_phase=None):
+    """Write testcase data to a xlsx file, chunk by chunk as the testcases come"""
+    with open(xlsx_file, "wb") as f:
+        for chunk in iter_xlsx(testcases, case_type=case_type, apply_phase=apply_phase):
+            f.write(chunk)
+
+    return xlsx_file
+
+
+def iter_xlsx(testcases, case_type=None, apply_phase=None):
+    """Yield the xlsx workbook (bytes chunks) while iterating the testcases, the same input gives the same bytes"""
+    entries = [
+        ("[Content_Types].xml", [CONTENT_TYPES.encode("utf-8")]),
+        ("_rels/.rels", [ROOT_RELS.encode("utf-8")]),
+        ("xl/workbook.xml", [WORKBOOK.encode("utf-8")]),
+        ("xl/_rels/workbook.xml.rels", [WORKBOOK_RELS.encode("utf-8")]),
+        ("xl/styles.xml", [STYLES.encode("utf-8")]),
+        ("xl/worksheets/sheet1.xml",
+         encode_chunks(iter_sheet_xml(testcases, case_type=case_type, apply_phase=apply_phase))),
+    ]
+    return iter_zip((zip_entry_info(name, deterministic=True), chunks) for name, chunks in entries)
+
+
+def iter_sheet_xml(testcases, case_type=None, apply_phase=None):
+    """Yield the worksheet xml, one row per piece"""
+    yield _XML_DECLARATION + '<worksheet xmlns="%s"><sheetViews><sheetView workbookViewId="0">' \
+                             '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>' \
+                             '</sheetView></sheetViews><cols>' % _MAIN_NS
+    yield ''.join('<col min="%d" max="%d" width="%d" customWidth="1"/>' % (i, i, width)
+                  for i, width in enumerate(COLUMN_WIDTHS, 1))
+    yield '</cols><sheetData>'
+    yield row_xml(1, FILEHEADER, header=True)
+
+    for row_number, testcase in enumerate(testcases, 2):
+        yield row_xml(row_number, gen_a_testcase_row(testcase, case_type=case_type, apply_phase=apply_phase))
+
+    yield '</sheetData></worksheet>'
+
+
+def row_xml(row_number, values, header=False):
+    cells = []
+    for index, value in enumerate(values):
+        reference = COLUMN_LETTERS[index] + str(row_number)
+        if header:
+            style = STYLE_HEADER
+        elif index in WRAPPED_COLUMNS:
+            style = STYLE_WRAPPED
+        else:
+            style = 0
+        cells.append(cell_xml(reference, value, style))
+    return '<row r="%d">%s</row>' % (row_number, ''.join(cells))
+
+
+def cell_xml(reference, value, style=0):
+    style_attr = ' s="%d"' % style if style else ''
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return '<c r="%s"%s><v>%s</v></c>' % (reference, style_attr, value)
+
+    text = '' if value is None else str(value)
+    if style == STYLE_WRAPPED:
+        # zentao step lists end every line with a line break, a wrapped cell does not need the last one
+        text = text.rstrip('\n')
+    text = escape(_INVALID_XML_CHARS.sub('', text))
+    return '<c r="%s"%s t="inlineStr"><is><t xml:space="preserve">%s</t></is></c>' % (reference, style_attr, text)
+
@@ -1,10 +1,10 @@
 #!/usr/bin/env python
 # _*_ coding:utf-8 _*_
 import csv
+import io
 import logging
-import os
 
-from xmind2testcase.utils import get_absolute_path, get_xmind_testcase_list
+from xmind2testcase.utils import atomic_output, get_absolute_path, iter_xmind_testcases
 
 """
 Convert XMind fie to Zentao testcase csv file
@@ -13,48 +13,78 @@ Zentao official document about import CSV testcase file: https://www.zentao.net/
 """
 
 
-def xmind_to_zentao_csv_file(xmind_file, testcases=None, case_type=None, apply_phase=None):
-    """Convert XMind file to a zentao csv file"""
+FILEHEADER = [
+    "所属模块",
+    "用例名称",
+    "前置条件",
+    "步骤",
+    "预期",
+    "关键词",
+    "优先级",
+    "用例类型",
+    "适用阶段",
+]
+# output encodings zentao can import: utf8, or gbk for the Chinese versions of Excel
+ENCODINGS = {"utf8": "utf-8", "utf-8": "utf-8", "gbk": "gbk"}
+
+
+def xmind_to_zentao_csv_file(xmind_file, testcases=None, case_type=None, apply_phase=None, encoding="utf8"):
+    """Convert XMind file to a zentao csv file
+
+    :param testcases: optional testcase data list or iterator, `xmind2testcase.casetable.CaseTable` rows work as well
+    :param encoding: 'utf8' or 'gbk'
+    """
     xmind_file = get_absolute_path(xmind_file)
     logging.info("Start converting XMind file(%s) to zentao file...", xmind_file)
     
     if testcases is None:
-        testcases = get_xmind_testcase_list(xmind_file)
-
-    fileheader = [
-        "所属模块",
-        "用例名称",
-        "前置条件",
-        "步骤",
-        "预期",
-        "关键词",
-        "优先级",
-        "用例类型",
-        "适用阶段",
-    ]
-    zentao_testcase_rows = [fileheader]
-    for testcase in testcases:
-        row = gen_a_testcase_row(testcase, case_type=case_type, apply_phase=apply_phase)
-        zentao_testcase_rows.append(row)
+        testcases = iter_xmind_testcases(xmind_file)
 
     zentao_file = xmind_file[:-6] + ".csv"
-    if os.path.exists(zentao_file):
-        os.remove(zentao_file)
-        # logging.info('The zentao csv file already exists, return it directly: %s', zentao_file)
-        # return zentao_file
-
-    with open(zentao_file, "w", encoding="utf8") as f:
-        writer = csv.writer(f)
-        writer.writerows(zentao_testcase_rows)
-        logging.info(
-            "Convert XMind file(%s) to a zentao csv file(%s) successfully!",
-            xmind_file,
-            zentao_file,
-        )
+    # written aside and moved in place, so concurrent conversions never see a half written file
+    with atomic_output(zentao_file) as tmp_file:
+        write_zentao_csv_file(testcases, tmp_file, case_type=case_type, apply_phase=apply_phase, encoding=encoding)
+    logging.info(
+        "Convert XMind file(%s) to a zentao csv file(%s) successfully!",
+        xmind_file,
+        zentao_file,
+    )
 
     return zentao_file
 
 
+def write_zentao_csv_file(testcases, zentao_file, case_type=None, apply_phase=None, encoding="utf8"):
+    """Write testcase data to a zentao csv file, chunk by chunk as the testcases come"""
+    with open(zentao_file, "wb") as f:
+        for chunk in iter_zentao_csv(testcases, case_type=case_type, apply_phase=apply_phase, encoding=encoding):
+            f.write(chunk)
+
+    return zentao_file
+
+
+def iter_zentao_csv(testcases, case_type=None, apply_phase=None, encoding="utf8", chunk_size=64 * 1024):
+    """Yield the encoded zentao csv (bytes chunks of about `chunk_size`) while iterating the testcases
+
+    Characters the encoding cannot represent (e.g. emoji in gbk) are replaced by '?'.
+    """
+    if encoding.lower() not in ENCODINGS:
+        raise ValueError("Unsupported zentao csv encoding: {}".format(encoding))
+    codec = ENCODINGS[encoding.lower()]
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(FILEHEADER)
+
+    for testcase in testcases:
+        writer.writerow(gen_a_testcase_row(testcase, case_type=case_type, apply_phase=apply_phase))
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue().encode(codec, errors="replace")
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue().encode(codec, errors="replace")
+
+
 def gen_a_testcase_row(testcase_dict, case_type=None, apply_phase=None):
     case_module = gen_case_module(testcase_dict["suite"])
     case_title = testcase_dict["name"]
@@ -90,26 +120,18 @@ def gen_case_module(module_name):
 
 
 def gen_case_step_and_expected_result(steps):
-    case_step = ""
-    case_expected_result = ""
+    case_steps = []
+    case_expected_results = []
 
     for step_dict in steps:
-        case_step += (
-            str(step_dict["step_number"])
-            + ". "
-            + step_dict["actions"].replace("\n", "").strip()
-            + "\n"
-        )
-        case_expected_result += (
-            str(step_dict["step_number"])
-            + ". "
-            + step_dict["expectedresults"].replace("\n", "").strip()
-            + "\n"
-            if step_dict.get("expectedresults", "")
-            else ""
-        )
-
-    return case_step, case_expected_result
+        step_number = str(step_dict["step_number"])
+        case_steps.append(step_number + ". " + step_dict["actions"].replace("\n", "").strip() + "\n")
+        if step_dict.get("expectedresults", ""):
+            case_expected_results.append(
+                step_number + ". " + step_dict["expectedresults"].replace("\n", "").strip() + "\n"
+            )
+
+    return "".join(case_steps), "".join(case_expected_results)
 
 
 def gen_case_priority(priority):
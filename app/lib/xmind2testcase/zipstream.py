@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+
+"""
+Zip archives produced as a stream of bytes chunks
+
+`zipfile` writing to an unseekable sink cannot go back to patch the local headers, so it
+sets the data descriptor flag and writes each entry's CRC and sizes right after its data.
+The archive can then be sent (e.g. as an HTTP response body) while its entries are still
+being generated, only the current compression window is held in memory.
+"""
+
+from zipfile import ZipFile, ZIP_DEFLATED
+
+
+class ChunkSink(object):
+    """unseekable file object collecting what is written until it is drained"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        if data:
+            self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        """the bytes written since the last drain, as one chunk"""
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_zip(entries, compression=ZIP_DEFLATED):
+    """Yield a zip archive as bytes chunks while its entries are written
+
+    :param entries: iterable of `(name or ZipInfo, iterable of bytes chunks)`, consumed lazily:
+                    an entry's content is only pulled when the archive gets to it
+    """
+    sink = ChunkSink()
+    with ZipFile(sink, 'w', compression) as zf:
+        for info, chunks in entries:
+            with zf.open(info, 'w') as entry:
+                for chunk in chunks:
+                    entry.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            # local header or end of the compressed data and the data descriptor
+            data = sink.drain()
+            if data:
+                yield data
+
+    # central directory
+    data = sink.drain()
+    if data:
+        yield data
+
+
+def iter_file_chunks(fileobj, chunk_size=64 * 1024):
+    """read a binary file object by chunks, from its current position"""
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
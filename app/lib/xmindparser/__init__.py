@@ -2,6 +2,7 @@
 Parse xmind to programmable data types.
 """
 
+import functools
 import json
 import logging
 import os
@@ -30,6 +31,27 @@ def set_logger_level(new_level):
     logger.setLevel(new_level)
 
 
+class ParseSession(object):
+    """State of one parse: its own copy of `config` and its own zip content cache.
+
+    Sessions share nothing, so several workbooks can be parsed concurrently in one process.
+    """
+
+    def __init__(self, **options):
+        self.config = dict(config, **options)
+        self.cache = {}
+
+
+def session_config(session):
+    """Return the config of a session, or the module config when parsing without one."""
+    return config if session is None else session.config
+
+
+def session_cache(session):
+    """Return the zip content cache of a session, or the module cache when parsing without one."""
+    return cache if session is None else session.cache
+
+
 def is_xmind_zen(file_path):
     """Determine if this is a xmind zen file type."""
     with ZipFile(file_path) as xmind:
@@ -54,20 +76,43 @@ def _get_out_file_name(xmind_file, suffix):
     return name
 
 
-def xmind_to_dict(file_path):
-    """Open and convert xmind to dict type."""
-    if is_xmind_zen(file_path):
-        from .zenreader import open_xmind, get_sheets, sheet_to_dict
-    else:
-        from .xreader import open_xmind, get_sheets, sheet_to_dict
+def xmind_to_dict(file_path, session=None, workers=None, min_topics=0):
+    """Open and convert xmind to dict type.
+
+    With `workers` > 1 the XMind Zen sheets holding at least `min_topics` topics are converted in a
+    process pool (see `xmindparser.parallel`), sheet order is kept. XMind 8 sheets are always
+    converted in a single serial pass.
+    """
+    if workers and workers > 1 and is_xmind_zen(file_path):
+        from .parallel import count_topics, map_sheets
+        from .zenreader import children_topics_of, convert_sheet, iter_sheets
+
+        session = session or ParseSession()
+        return map_sheets(functools.partial(convert_sheet, config=session.config), iter_sheets(file_path), workers,
+                          lambda s: count_topics(s['rootTopic'], children_topics_of) >= min_topics)
+
+    return list(iter_xmind_sheets(file_path, session))
+
 
-    open_xmind(file_path)
-    data = []
+def iter_xmind_sheets(file_path, session=None):
+    """Open xmind and yield every sheet converted to dict type.
 
-    for s in get_sheets():
-        data.append(sheet_to_dict(s))
+    XMind Zen content.json is decoded incrementally, so only one sheet is held in memory at a time;
+    XMind 8 content.xml and comments.xml are parsed once in a single pass.
+    Without an explicit `ParseSession` a fresh one is used, so concurrent calls never share state.
+    """
+    session = session or ParseSession()
+
+    if is_xmind_zen(file_path):
+        from .zenreader import iter_sheets, sheet_to_dict
+
+        for s in iter_sheets(file_path):
+            yield sheet_to_dict(s, session)
+    else:
+        from .xreader import iter_sheet_dicts
 
-    return data
+        for s in iter_sheet_dicts(file_path, session):
+            yield s
 
 
 def xmind_to_file(file_path, file_type):
@@ -0,0 +1,89 @@
+"""
+Opt-in parallel processing of independent sheets.
+
+Large sheets are handed to a process pool while the small ones are processed in the calling
+process, results always come back in sheet order. Pools are started with the "spawn" method
+(safe inside threaded servers) and reused between calls, since starting workers costs far more
+than parsing a typical sheet.
+"""
+
+import atexit
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from . import logger
+from .treewalk import walk
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def count_topics(root, children_of):
+    """Number of topics in a tree, the size measure used to decide if a sheet is worth a worker."""
+    return sum(1 for _ in walk(root, children_of))
+
+
+def shared_pool(workers):
+    """Return the process pool of the given size, starting it on first use."""
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _pools[workers] = pool
+        return pool
+
+
+def shutdown_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+
+    for pool in pools:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+atexit.register(shutdown_pools)
+
+
+def _discard_pool(workers, pool):
+    with _pools_lock:
+        if _pools.get(workers) is pool:
+            del _pools[workers]
+
+
+def map_sheets(func, sheets, workers=None, is_large=None):
+    """Return `[func(sheet) for sheet in sheets]`, running `func` for large sheets in a process pool.
+
+    :param func: picklable callable (module level function or `functools.partial` of one)
+    :param workers: size of the process pool, None or 1 keeps everything in this process
+    :param is_large: predicate telling which sheets go to the pool, all of them by default
+    """
+    sheets = list(sheets)
+    large = [i for i, sheet in enumerate(sheets) if is_large is None or is_large(sheet)]
+
+    # a single large sheet gains nothing from a pool, it would only pay the pickling twice
+    if not workers or workers < 2 or len(large) < 2:
+        return [func(sheet) for sheet in sheets]
+
+    pool = shared_pool(workers)
+    try:
+        futures = {i: pool.submit(func, sheets[i]) for i in large}
+    except (BrokenProcessPool, RuntimeError) as e:
+        logger.warning('Sheet process pool unavailable, parsing serially: %s', e)
+        _discard_pool(workers, pool)
+        return [func(sheet) for sheet in sheets]
+
+    # small sheets are processed here while the workers handle the large ones
+    results = [None if i in futures else func(sheet) for i, sheet in enumerate(sheets)]
+
+    for i, future in futures.items():
+        try:
+            results[i] = future.result()
+        except BrokenProcessPool as e:
+            logger.warning('Sheet process pool broke, parsing the sheet serially: %s', e)
+            _discard_pool(workers, pool)
+            results[i] = func(sheets[i])
+
+    return results
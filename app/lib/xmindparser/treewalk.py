@@ -0,0 +1,57 @@
+"""
+Iterative traversal of topic trees.
+
+Both readers and the xmind2testcase parser walk mind maps with an explicit stack,
+so arbitrarily deep maps never hit the interpreter recursion limit.
+"""
+
+
+def walk(root, children_of, ancestors=None):
+    """Depth-first pre-order traversal yielding `(node, ancestors, children)`.
+
+    `children_of(node)` returns the children to descend into (empty or None for a leaf), it is
+    called exactly once per node. `ancestors` is a shared list of the nodes above `node`, starting
+    with the given ancestors; it is only valid until the next step, copy it to keep it.
+    """
+    path = list(ancestors) if ancestors else []
+    base = len(path)
+    stack = [(root, 0)]
+
+    while stack:
+        node, depth = stack.pop()
+        del path[base + depth:]
+        children = children_of(node)
+
+        yield node, path, children
+
+        if children:
+            path.append(node)
+            stack.extend((child, depth + 1) for child in reversed(children))
+
+
+def build_tree(root, convert, key='topics'):
+    """Convert a tree to nested dicts without recursion.
+
+    `convert(node)` returns `(data, children)`; when `children` is not empty, `data[key]` must be
+    a list, which receives the converted children in order.
+    """
+    data, children = convert(root)
+    stack = [(data, children)] if children else []
+
+    while stack:
+        parent, children = stack.pop()
+        slot = parent[key]
+
+        for child in children:
+            child_data, grandchildren = convert(child)
+            slot.append(child_data)
+
+            if grandchildren:
+                stack.append((child_data, grandchildren))
+
+    return data
+
+
+def max_depth(root, children_of):
+    """Maximum depth of a tree, a leaf root has depth 0."""
+    return max(len(ancestors) for _, ancestors, _ in walk(root, children_of))
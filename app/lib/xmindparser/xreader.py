@@ -1,16 +1,21 @@
 import re
+from collections import defaultdict
 from xml.etree import ElementTree as  ET
 from xml.etree.ElementTree import Element
 from zipfile import ZipFile
 
-from . import config, logger, cache
+from . import logger, session_config, session_cache
+from .treewalk import build_tree
 
 content_xml = "content.xml"
 comments_xml = "comments.xml"
+xhtml_ns = 'http://www.w3.org/1999/xhtml'
+xlink_ns = 'http://www.w3.org/1999/xlink'
 
 
-def open_xmind(file_path):
+def open_xmind(file_path, session=None):
     """open xmind as zip file and cache the content."""
+    cache = session_cache(session)
     cache.clear()
     with ZipFile(file_path) as xmind:
         for f in xmind.namelist():
@@ -19,19 +24,20 @@ def open_xmind(file_path):
                     cache[key] = xmind.open(f).read().decode('utf-8')
 
 
-def get_sheets():
+def get_sheets(session=None):
     """get all sheet as generator and yield."""
-    tree = xmind_content_to_etree(cache[content_xml])
+    tree = xmind_content_to_etree(session_cache(session)[content_xml])
     assert isinstance(tree, Element)
 
     for sheet in tree.findall('sheet'):
         yield sheet
 
 
-def sheet_to_dict(sheet):
+def sheet_to_dict(sheet, session=None):
     """convert a sheet to dict type."""
+    config = session_config(session)
     topic = sheet.find('topic')
-    result = {'title': title_of(sheet), 'topic': node_to_dict(topic), 'structure': get_sheet_structure(sheet)}
+    result = {'title': title_of(sheet), 'topic': node_to_dict(topic, session), 'structure': get_sheet_structure(sheet)}
 
     if config['showTopicId']:
         result['id'] = sheet.attrib['id']
@@ -47,12 +53,18 @@ def get_sheet_structure(sheet):
     return root_topic.attrib.get('structure-class', None)
 
 
-def node_to_dict(node):
+def node_to_dict(node, session=None):
     """parse Element to dict data type."""
+    return build_tree(node, lambda n: _topic_data(n, session))
+
+
+def _topic_data(node, session):
+    """convert a single topic Element, returning its dict and the children still to be converted."""
+    config = session_config(session)
     child = children_topics_of(node)
 
     d = {'title': title_of(node),
-         'comment': comments_of(node),
+         'comment': comments_of(node, session),
          'note': note_of(node),
          'makers': maker_of(node),
          'labels': labels_of(node),
@@ -67,18 +79,19 @@ def node_to_dict(node):
             del d['link']
             d['title'] = '[Attachment]{0}'.format(d['title'])
 
+    # an Element is falsy when it has no child elements
+    child = list(child) if child is not None else None
+
     if child:
         d['topics'] = []
-        for c in child:
-            d['topics'].append(node_to_dict(c))
 
     if config['showTopicId']:
         d['id'] = id_of(node)
 
     if config['hideEmptyValue']:
-        d = {k: v for k, v in d.items() if v or k == 'title'}
+        d = {k: v for k, v in d.items() if v or k in ('title', 'topics')}
 
-    return d
+    return d, child
 
 
 def xmind_content_to_etree(content):
@@ -99,7 +112,10 @@ def xmind_xml_to_etree(xml_path):
         return xmind_content_to_etree(content)
 
 
-def comments_of(node):
+def comments_of(node, session=None):
+    config = session_config(session)
+    cache = session_cache(session)
+
     if cache.get(comments_xml, None):
         node_id = node.attrib.get('id', None)
 
@@ -185,3 +201,187 @@ def children_topics_of(topic_node):
 
     if children is not None:
         return children.find('./topics[@type="attached"]')
+
+
+class _Tags(object):
+    """Fully qualified tag names of a content.xml, resolved once for its default namespace."""
+
+    def __init__(self, ns):
+        prefix = '{%s}' % ns if ns else ''
+        self.sheet = prefix + 'sheet'
+        self.topic = prefix + 'topic'
+        self.title = prefix + 'title'
+        self.notes = prefix + 'notes'
+        self.plain = prefix + 'plain'
+        self.labels = prefix + 'labels'
+        self.label = prefix + 'label'
+        self.marker_refs = prefix + 'marker-refs'
+        self.children = prefix + 'children'
+        self.topics = prefix + 'topics'
+        self.img = '{%s}img' % xhtml_ns
+        self.href = '{%s}href' % xlink_ns
+
+
+def iter_sheet_dicts(file_path, session=None):
+    """parse content.xml and comments.xml in a single pass and yield each sheet as dict type.
+
+    Produces the same output as `sheet_to_dict`, but without the module cache: comments are
+    indexed by object id up front and every sheet is released once it has been converted.
+    """
+    config = session_config(session)
+
+    with ZipFile(file_path) as xmind:
+        names = xmind.namelist()
+        comments = None
+
+        if comments_xml in names:
+            with xmind.open(comments_xml) as f:
+                comments = comments_index(f, config)
+
+        with xmind.open(content_xml) as f:
+            tags = None
+
+            for event, elem in ET.iterparse(f, events=('start-ns', 'end')):
+                if event == 'start-ns':
+                    if tags is None and elem[0] == '':
+                        tags = _Tags(elem[1])
+                    continue
+
+                if tags is None:
+                    tags = _Tags('')
+
+                if elem.tag == tags.sheet:
+                    yield _sheet_to_dict(elem, tags, comments, config)
+                    elem.clear()
+
+
+def comments_index(source, config=None):
+    """build an object-id -> comments index from a comments.xml file object in one pass."""
+    config = config or session_config(None)
+    index = defaultdict(list)
+
+    for _, elem in ET.iterparse(source, events=('end',)):
+        if _local_name(elem.tag) != 'comment':
+            continue
+
+        object_id = elem.attrib['object-id']
+        content = None
+
+        for child in elem:
+            if _local_name(child.tag) == 'content':
+                content = child.text
+                break
+
+        i = {'author': elem.attrib['author'], 'content': content}
+
+        if config['showTopicId']:
+            i['id'] = object_id
+
+        index[object_id].append(i)
+        elem.clear()
+
+    return dict(index)
+
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def _sheet_to_dict(sheet, tags, comments, config):
+    title = None
+    topic = None
+
+    for child in sheet:
+        if child.tag == tags.img:
+            title = '[Image]'
+        elif child.tag == tags.title and title is None:
+            title = child.text
+        elif child.tag == tags.topic and topic is None:
+            topic = child
+
+    result = {'title': title,
+              'topic': build_tree(topic, lambda n: _topic_dict(n, tags, comments, config)),
+              'structure': topic.attrib.get('structure-class', None)}
+
+    if config['showTopicId']:
+        result['id'] = sheet.attrib['id']
+
+    if config['hideEmptyValue']:
+        result = {k: v for k, v in result.items() if v}
+
+    return result
+
+
+def _topic_dict(node, tags, comments, config):
+    """convert a topic Element to dict, resolving all of its fields in one scan of its children.
+
+    Returns the dict and the child topic Elements still to be converted.
+    """
+    title = image = note = makers = labels = children = None
+
+    for child in node:
+        tag = child.tag
+
+        if tag == tags.title:
+            if title is None:
+                title = child
+        elif tag == tags.img:
+            if image is None:
+                image = '[Image]'
+        elif tag == tags.notes:
+            if note is None:
+                note = _note_text(child, tags)
+        elif tag == tags.marker_refs:
+            if makers is None:
+                makers = [m.attrib['marker-id'] for m in child]
+        elif tag == tags.labels:
+            if labels is None:
+                labels = [l.text for l in child if l.tag == tags.label] or None
+        elif tag == tags.children:
+            if children is None:
+                children = _attached_topics(child, tags)
+
+    node_id = node.attrib.get('id', None)
+    comment = None
+
+    if comments and node_id:
+        comment = comments.get(node_id, None)
+
+    d = {'title': image or (title.text if title is not None else None),
+         'comment': comment,
+         'note': note,
+         'makers': makers,
+         'labels': labels,
+         'link': node.attrib.get(tags.href, None) or node.attrib.get('href', None)}
+
+    if d['link']:
+
+        if d['link'].startswith('xmind'):
+            d['link'] = '[To another xmind topic!]'
+
+        if d['link'].startswith('xap:attachments'):
+            del d['link']
+            d['title'] = '[Attachment]{0}'.format(d['title'])
+
+    if children:
+        d['topics'] = []
+
+    if config['showTopicId']:
+        d['id'] = node_id
+
+    if config['hideEmptyValue']:
+        d = {k: v for k, v in d.items() if v or k in ('title', 'topics')}
+
+    return d, children
+
+
+def _note_text(notes, tags):
+    for child in notes:
+        if child.tag == tags.plain:
+            return child.text.strip() if child.text is not None else None
+
+
+def _attached_topics(children, tags):
+    for child in children:
+        if child.tag == tags.topics and child.attrib.get('type', None) == 'attached':
+            return list(child)
@@ -1,13 +1,18 @@
+import io
 import json
+import re
 from zipfile import ZipFile
 
-from . import config, cache
+from . import ParseSession, session_config, session_cache
+from .treewalk import build_tree
 
 content_json = "content.json"
+_whitespace = re.compile(r'[ \t\n\r]*')
 
 
-def open_xmind(file_path):
+def open_xmind(file_path, session=None):
     """open xmind as zip file and cache the content."""
+    cache = session_cache(session)
     cache.clear()
     with ZipFile(file_path) as xmind:
         for f in xmind.namelist():
@@ -16,16 +21,78 @@ def open_xmind(file_path):
                     cache[key] = xmind.open(f).read().decode('utf-8')
 
 
-def get_sheets():
+def get_sheets(session=None):
     """get all sheet as generator and yield."""
-    for sheet in json.loads(cache[content_json]):
+    for sheet in json.loads(session_cache(session)[content_json]):
         yield sheet
 
 
-def sheet_to_dict(sheet):
+def iter_sheets(file_path, chunk_size=64 * 1024):
+    """stream the sheets of content.json one by one, only a single sheet is decoded at a time."""
+    with ZipFile(file_path) as xmind:
+        with xmind.open(content_json) as raw:
+            stream = io.TextIOWrapper(raw, encoding='utf-8-sig')
+            for sheet in iter_json_array(stream, chunk_size):
+                yield sheet
+
+
+def iter_json_array(stream, chunk_size=64 * 1024):
+    """incrementally decode the items of a top-level json array from a text stream."""
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+    started = False
+
+    while True:
+        pos = _whitespace.match(buf, pos).end()
+
+        if pos == len(buf):
+            buf, pos = stream.read(chunk_size), 0
+            if not buf:
+                raise ValueError('Unexpected end of {}!'.format(content_json))
+            continue
+
+        char = buf[pos]
+
+        if not started:
+            if char != '[':
+                raise ValueError('Invalid {}: not a json array!'.format(content_json))
+            started = True
+            pos += 1
+            continue
+
+        if char == ']':
+            return
+
+        if char == ',':
+            pos += 1
+            continue
+
+        eof = False
+        while True:
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+                # a scalar ending at the buffer boundary may still be truncated
+                if end < len(buf) or eof:
+                    break
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+
+            # read at least as much as is buffered, so re-decoding stays linear overall
+            more = stream.read(max(chunk_size, len(buf) - pos))
+            eof = not more
+            buf, pos = buf[pos:] + more, 0
+
+        yield item
+        buf, pos = buf[end:], 0
+
+
+def sheet_to_dict(sheet, session=None):
     """convert a sheet to dict type."""
+    config = session_config(session)
     topic = sheet['rootTopic']
-    result = {'title': sheet['title'], 'topic': node_to_dict(topic), 'structure': get_sheet_structure(sheet)}
+    result = {'title': sheet['title'], 'topic': node_to_dict(topic, session), 'structure': get_sheet_structure(sheet)}
 
     if config['showTopicId']:
         result['id'] = sheet['id']
@@ -36,13 +103,24 @@ def sheet_to_dict(sheet):
     return result
 
 
+def convert_sheet(sheet, config):
+    """`sheet_to_dict` taking a plain config, picklable entry point for process pool workers."""
+    return sheet_to_dict(sheet, ParseSession(**config))
+
+
 def get_sheet_structure(sheet):
     root_topic = sheet['rootTopic']
     return root_topic.get('structureClass', None)
 
 
-def node_to_dict(node):
+def node_to_dict(node, session=None):
     """parse Element to dict data type."""
+    config = session_config(session)
+    return build_tree(node, lambda n: _topic_data(n, config))
+
+
+def _topic_data(node, config):
+    """convert a single topic, returning its dict and the children still to be converted."""
     child = children_topics_of(node)
 
     d = {
@@ -68,8 +146,6 @@ def node_to_dict(node):
 
     if child:
         d['topics'] = []
-        for c in child:
-            d['topics'].append(node_to_dict(c))
 
     if config['showTopicId']:
         d['id'] = node['id']
@@ -77,7 +153,7 @@ def node_to_dict(node):
     # if config['hideEmptyValue']:
     # d = {k: v for k, v in d.items() if v or k == 'title'}
 
-    return d
+    return d, child
 
 
 def children_topics_of(topic_node):
@@ -17,7 +17,7 @@ mimetypes.add_type('application/vnd.xmind.workbook', '.xmind')
 mimetypes.add_type('application/x-xmind', '.xmind')
 
 from app.core.config import settings
-from app.core.database import init_db
+from app.core.database import init_db, close_pool, get_pool, close_async_database, get_async_database
 
 # 确保 app/lib 在 Python 路径中（用于 xmind2testcase 和 xmindparser）
 sys.path.append(os.path.join(settings.APP_DIR, "lib"))
@@ -124,6 +124,8 @@ def create_app() -> FastAPI:
         """应用关闭事件"""
         logger.info("=" * 60)
         logger.info("👋 XMind2TestCase 应用关闭")
+        close_async_database()
+        close_pool()
         logger.info("=" * 60)
     
     # ==================== 健康检查 ====================
@@ -141,6 +143,20 @@ def create_app() -> FastAPI:
             "debug_mode": settings.DEBUG
         }
     
+    @app.get("/api/metrics", tags=["System"])
+    async def metrics():
+        """运行时指标：解析缓存命中率、数据库连接池等"""
+        from app.services.parse_cache import parse_cache
+        from app.services.export_cache import export_cache
+        from app.services import export_service
+        return {
+            "parse_cache": parse_cache.stats(),
+            "export_cache": export_cache.stats(),
+            "exports": export_service.stats(),
+            "database": get_pool().stats(),
+            "database_executor": get_async_database().stats()
+        }
+    
     # ==================== 静态文件 ====================
     static_dir = os.path.join(settings.APP_DIR, "static")
     if os.path.exists(static_dir):
@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from app.lib.xmind2testcase.utils import atomic_output
+from app.core.config import settings
+
+
+class ExportCache:
+    """
+    Content-addressed cache of generated export files (TestLink XML, ZenTao CSV...).
+
+    Keys cover everything the artifact depends on: the hash of the source (record content or
+    XMind file), the case filter, the format and the export options, so an edited record or a
+    different filter can never be served a stale file. Files are written atomically, generation
+    is single-flight per key (concurrent requests for the same export wait for one generation),
+    and the directory is bounded by total size and by the age of the last use. Artifacts used
+    within the last `grace` seconds are never evicted, so a path just returned to a request is
+    still there when the response opens it.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=None, max_age=None, grace=None):
+        self.cache_dir = cache_dir or settings.EXPORT_CACHE_DIR
+        self.max_bytes = max_bytes if max_bytes is not None else settings.EXPORT_CACHE_MAX_BYTES
+        self.max_age = max_age if max_age is not None else settings.EXPORT_CACHE_MAX_AGE
+        self.grace = grace if grace is not None else settings.EXPORT_CACHE_GRACE
+        self._lock = threading.Lock()
+        self._key_locks = {}  # key -> [lock, number of requests using it]
+        self._counters = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def make_key(source_hash: str, export_format: str, cases=None, options=None) -> str:
+        payload = json.dumps([source_hash, export_format, cases, options or {}], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get_or_create(self, key: str, suffix: str, generate) -> str:
+        """Return the path of the cached artifact, calling `generate(path)` to write it on a miss."""
+        path = os.path.join(self.cache_dir, key + suffix)
+        if self._touch(path):
+            with self._lock:
+                self._counters["hits"] += 1
+            return path
+
+        with self._key_lock(key):
+            # another request may have generated it while this one was waiting
+            if self._touch(path):
+                with self._lock:
+                    self._counters["coalesced"] += 1
+                return path
+
+            with self._lock:
+                self._counters["misses"] += 1
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with atomic_output(path) as tmp_path:
+                generate(tmp_path)
+
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep=None):
+        """Drop artifacts unused for longer than `max_age`, then the least recently used above `max_bytes`.
+
+        Artifacts used within the last `grace` seconds are kept, even above `max_bytes`.
+
+        :param keep: path never evicted, the artifact that is about to be served
+        """
+        entries = []
+        total = 0
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+
+        for name in names:
+            if name.endswith(".tmp"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:  # removed meanwhile
+                continue
+            total += stat.st_size
+            if path != keep:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        entries.sort()
+        now = time.time()
+        expired_before = now - self.max_age
+        in_use_since = now - self.grace
+
+        for mtime, size, path in entries:
+            if mtime >= in_use_since or (mtime >= expired_before and total <= self.max_bytes):
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            with self._lock:
+                self._counters["evictions"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._counters, max_bytes=self.max_bytes, max_age=self.max_age, grace=self.grace)
+
+    @staticmethod
+    def _touch(path) -> bool:
+        """Mark an artifact as just used, False if it does not exist (anymore)."""
+        try:
+            os.utime(path)
+            return True
+        except OSError:
+            return False
+
+    @contextmanager
+    def _key_lock(self, key):
+        """Serialize the generations of one key, the lock only lives while requests use it."""
+        with self._lock:
+            entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._key_locks[key]
+
+
+# Global instance
+export_cache = ExportCache()
@@ -0,0 +1,200 @@
+"""
+Multi-format export of one XMind file in a single pass.
+
+The record test cases are read once and the suite tree rebuilt once (or the XMind file parsed
+once, through the parse cache), then every format is generated concurrently from that shared,
+read-only data into temporary files. The archive is streamed while it is written: an entry
+goes out as soon as its format is ready, so the download starts before the slowest format is
+done and no archive is ever held in memory. Each step is timed and the timings are logged.
+"""
+import logging
+import os
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from app.lib.xmind2testcase import utils
+from app.lib.xmind2testcase.testlink import iter_testlink_xml
+from app.lib.xmind2testcase.writer import encode_chunks, iter_xmind_zip, zip_entry_info
+from app.lib.xmind2testcase.zentao import iter_zentao_csv
+from app.lib.xmind2testcase.zipstream import iter_file_chunks, iter_zip
+from app.core.config import settings
+from app.services import testcase_store, xmind_service
+
+# archive entries, in archive order: format -> file extension
+FORMATS = {
+    'xmind': '.xmind',
+    'testlink': '.xml',
+    'zentao': '.csv',
+    'json': '.json',
+}
+
+# generated formats stay in memory up to this size, larger ones are spooled to disk
+SPOOL_MAX_SIZE = 1024 * 1024
+
+_executor = ThreadPoolExecutor(max_workers=len(FORMATS), thread_name_prefix='export')
+_stats_lock = threading.Lock()
+_stats = {'exports': 0, 'ms': {}}
+
+
+class ExportSource:
+    """What every format of an export is generated from, built once and shared read-only."""
+
+    def __init__(self, filename, testcases, testsuites, xmind_path=None, case_type=None, apply_phase=None):
+        self.filename = filename
+        self.testcases = testcases
+        self.testsuites = testsuites
+        # original upload, shipped as is when the export is not built from an edited record
+        self.xmind_path = xmind_path
+        self.case_type = case_type
+        self.apply_phase = apply_phase
+
+
+def read_record_testcases(db, record):
+    """Test cases stored with a record, None when the XMind file must be parsed instead."""
+    if not record or not record.get('content_hash'):
+        return None
+    return testcase_store.load_testcases(db, record['id'])
+
+
+def load_source(filename: str, record=None, db=None, testcases=None):
+    """Read the record test cases (or parse the XMind file) once; None when there is nothing to export.
+
+    :param testcases: record test cases already read with `read_record_testcases`, `db` is not used then
+    """
+    if testcases is None and db is not None:
+        testcases = read_record_testcases(db, record)
+    if testcases is not None:
+        root_name = os.path.splitext(filename)[0]
+        testsuites = xmind_service.reconstruct_testsuites_from_db_list(testcases, root_name=root_name)
+        return ExportSource(filename, testcases, testsuites,
+                            case_type=record.get('case_type'), apply_phase=record.get('apply_phase'))
+
+    full_path = os.path.join(settings.UPLOAD_FOLDER, filename)
+    if not os.path.exists(full_path):
+        return None
+    testsuites = xmind_service.get_testsuites(filename)
+    return ExportSource(filename, utils.testsuites_to_testcase_list(testsuites), testsuites, xmind_path=full_path,
+                        case_type=record.get('case_type') if record else None,
+                        apply_phase=record.get('apply_phase') if record else None)
+
+
+def generate_xmind(source, encoding):
+    if source.xmind_path:
+        with open(source.xmind_path, 'rb') as f:
+            yield from iter_file_chunks(f)
+    else:
+        yield from iter_xmind_zip(source.testsuites, deterministic=True)
+
+
+def generate_testlink(source, encoding):
+    return encode_chunks(iter_testlink_xml(source.testsuites))
+
+
+def generate_zentao(source, encoding):
+    return iter_zentao_csv(source.testcases, case_type=source.case_type, apply_phase=source.apply_phase,
+                           encoding=encoding)
+
+
+def generate_json(source, encoding):
+    return encode_chunks(utils.iter_json_chunks(source.testcases, indent=4, ensure_ascii=False))
+
+
+GENERATORS = {
+    'xmind': generate_xmind,
+    'testlink': generate_testlink,
+    'zentao': generate_zentao,
+    'json': generate_json,
+}
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def _spool(name, source, encoding):
+    """Generate a format into a temporary file, kept in memory while small."""
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    try:
+        for chunk in GENERATORS[name](source, encoding):
+            spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+def _close_spool(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result()[0].close()
+
+
+def export_all(filename: str, record=None, formats=None, encoding="utf8", db=None, testcases=None):
+    """Generate every format of a file concurrently into one zip archive, streamed as it is written.
+
+    :param db: connection the record test cases are read with, the XMind file is exported without it
+    :param testcases: record test cases already read with `read_record_testcases`, instead of `db`
+    :param formats: formats to export (keys of `FORMATS`), all of them by default
+    :param encoding: encoding of the ZenTao csv
+    :return: `(chunks, timings)`: the archive as an iterator of bytes chunks and the timings in
+             milliseconds by step, 'load' right away, each format once it is generated and 'total'
+             once the archive is consumed; None if the file does not exist
+    """
+    formats = [name for name in FORMATS if formats is None or name in formats]
+    start = time.perf_counter()
+
+    source, load_ms = _timed(load_source, filename, record, db, testcases)
+    if source is None:
+        return None
+    timings = {'load': load_ms}
+    return _iter_archive(source, formats, encoding, timings, start), timings
+
+
+def _iter_archive(source, formats, encoding, timings, start):
+    futures = {name: _executor.submit(_timed, _spool, name, source, encoding) for name in formats}
+    base_name = os.path.splitext(source.filename)[0]
+
+    def entries():
+        # entries are written in a fixed order, each one as soon as it is generated
+        for name in formats:
+            spool, timings[name] = futures[name].result()
+            with spool:
+                info = zip_entry_info(base_name + FORMATS[name], deterministic=True)
+                if name == 'xmind':
+                    info.compress_type = zipfile.ZIP_STORED  # already deflated
+                yield info, iter_file_chunks(spool)
+
+    try:
+        yield from iter_zip(entries())
+    finally:
+        # nothing left behind when the download is aborted
+        for future in futures.values():
+            future.cancel()
+            future.add_done_callback(_close_spool)
+
+    timings['total'] = (time.perf_counter() - start) * 1000
+    _record(timings)
+    logging.info(f"Exported {source.filename}: {server_timing(timings)}")
+
+
+def _record(timings):
+    with _stats_lock:
+        _stats['exports'] += 1
+        for name, duration in timings.items():
+            _stats['ms'][name] = _stats['ms'].get(name, 0.0) + duration
+
+
+def stats() -> dict:
+    """Number of completed exports and the cumulated milliseconds of each step."""
+    with _stats_lock:
+        return {'exports': _stats['exports'], 'ms': {name: round(ms, 1) for name, ms in _stats['ms'].items()}}
+
+
+def server_timing(timings):
+    """`Server-Timing` header value of export timings."""
+    return ', '.join(f'{name};dur={duration:.1f}' for name, duration in timings.items())
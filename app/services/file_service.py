@@ -1,5 +1,6 @@
 import os
 import re
+import json
 import arrow
 import sqlite3
 import shutil
@@ -20,16 +21,27 @@ def check_file_name(name: str) -> str:
         assert secured, f'Unable to parse file name: {name}!'
     return secured + '.xmind'
 
-import json
-from app.services import xmind_service
+from app.services import stats_store, testcase_store, xmind_service
 
 def save_file(file: UploadFile, db: sqlite3.Connection, project_id: int = None, case_type: str = "功能用例", apply_phase: str = "功能测试阶段"):
     """Save uploaded file and create record."""
+    filename, testcases, error = receive_file(file)
+    if not filename:
+        return None, error
+
+    insert_record(db, filename, project_id=project_id, testcases=testcases, case_type=case_type, apply_phase=apply_phase)
+    return filename, None
+
+def receive_file(file: UploadFile):
+    """Write an uploaded file to the upload folder and parse its test cases, without touching the database.
+
+    :return: `(filename, testcases, error)`, filename is None when the file is refused
+    """
     if not file.filename:
-        return None, "Please select a file!"
+        return None, None, "Please select a file!"
     
     if not allowed_file(file.filename):
-        return None, "Invalid file type!"
+        return None, None, "Invalid file type!"
 
     filename = file.filename
     upload_to = os.path.join(settings.UPLOAD_FOLDER, filename)
@@ -41,24 +53,33 @@ def save_file(file: UploadFile, db: sqlite3.Connection, project_id: int = None,
     with open(upload_to, "wb") as buffer:
         shutil.copyfileobj(file.file, buffer)
     
-    # Parse XMind and get content
+    # Parse XMind and get the test cases
     try:
-        testcases = xmind_service.get_testcases(filename)
-        content_json = json.dumps(testcases)
+        testcases = list(xmind_service.iter_testcases(filename))
     except Exception as e:
         print(f"Error parsing xmind: {e}")
-        content_json = "[]"
+        testcases = []
 
-    insert_record(db, filename, project_id=project_id, content=content_json, case_type=case_type, apply_phase=apply_phase)
-    return filename, None
+    return filename, testcases, None
+
+def insert_record(db: sqlite3.Connection, xmind_name, note='', project_id=None, content='', case_type="功能用例", apply_phase="功能测试阶段", testcases=None):
+    """Insert upload record into database, its test cases (list, or `content` JSON text) in the testcases table."""
+    if testcases is None and content:
+        try:
+            testcases = json.loads(content)
+        except ValueError:
+            pass
 
-def insert_record(db: sqlite3.Connection, xmind_name, note='', project_id=None, content='', case_type="功能用例", apply_phase="功能测试阶段"):
-    """Insert upload record into database."""
     c = db.cursor()
     now = str(arrow.now())
     sql = "INSERT INTO records (name, create_on, note, project_id, content, case_type, apply_phase) VALUES (?, ?, ?, ?, ?, ?, ?)"
-    c.execute(sql, (xmind_name, now, str(note), project_id, content, case_type, apply_phase))
+    c.execute(sql, (xmind_name, now, str(note), project_id, content if testcases is None else None, case_type, apply_phase))
+    record_id = c.lastrowid
+    stats_store.record_created(db, project_id, now)
+    if testcases is not None:
+        testcase_store.save_testcases(db, record_id, testcases)
     db.commit()
+    return record_id
 
 def delete_record(filename: str, record_id: int, db: sqlite3.Connection):
     """Delete file and soft-delete record."""
@@ -81,14 +102,16 @@ def delete_record(filename: str, record_id: int, db: sqlite3.Connection):
                 pass
 
     c = db.cursor()
-    sql = 'UPDATE records SET is_deleted=1 WHERE id = ?'
-    c.execute(sql, (record_id,))
+    sql = 'UPDATE records SET is_deleted=1 WHERE id = ? AND is_deleted = 0 RETURNING project_id, create_on'
+    row = c.execute(sql, (record_id,)).fetchone()
+    if row:
+        stats_store.record_deleted(db, row[0], row[1])
     db.commit()
 
 def delete_records_keep_latest(db: sqlite3.Connection, keep=20):
     """Clean up old records and files."""
     # This logic might need to be smarter with projects, but keeping it simple for now.
-    sql = "SELECT * from records where is_deleted<>1 ORDER BY id desc LIMIT -1 offset {}".format(keep)
+    sql = "SELECT * from records where is_deleted = 0 ORDER BY id desc LIMIT -1 offset {}".format(keep)
     c = db.cursor()
     c.execute(sql)
     rows = c.fetchall()
@@ -111,7 +134,7 @@ def get_records(db: sqlite3.Connection, limit=8, project_id=None):
             SELECT r.id, r.name, r.create_on, r.note, p.name as project_name, r.project_id, r.case_type, r.apply_phase
             FROM records r 
             LEFT JOIN projects p ON r.project_id = p.id
-            WHERE r.is_deleted<>1 AND r.project_id = ?
+            WHERE r.is_deleted = 0 AND r.project_id = ?
             ORDER BY r.id DESC 
         """
         c.execute(sql, (project_id,))
@@ -120,7 +143,7 @@ def get_records(db: sqlite3.Connection, limit=8, project_id=None):
             SELECT r.id, r.name, r.create_on, r.note, p.name as project_name, r.project_id, r.case_type, r.apply_phase
             FROM records r 
             LEFT JOIN projects p ON r.project_id = p.id
-            WHERE r.is_deleted<>1 
+            WHERE r.is_deleted = 0 
             ORDER BY r.id DESC 
             LIMIT ?
         """
@@ -157,17 +180,18 @@ def get_record_by_filename(db: sqlite3.Connection, filename: str):
     """Get a record by filename."""
     c = db.cursor()
     # Ordered by ID desc to get the latest if duplicates exist (though save_file ensures uniqueness usually)
-    sql = "SELECT id, name, content, note, project_id, case_type, apply_phase FROM records WHERE name = ? AND is_deleted <> 1 ORDER BY id DESC LIMIT 1"
+    sql = "SELECT id, name, note, project_id, case_type, apply_phase FROM records WHERE name = ? AND is_deleted = 0 ORDER BY id DESC LIMIT 1"
     c.execute(sql, (filename,))
     row = c.fetchone()
     if row:
         return {
             "id": row[0],
             "name": row[1],
-            "content": row[2],
-            "note": row[3],
-            "project_id": row[4],
-            "case_type": row[5],
-            "apply_phase": row[6]
+            "note": row[2],
+            "project_id": row[3],
+            "case_type": row[4],
+            "apply_phase": row[5],
+            # None when the record stores no test cases and exports come from the XMind file
+            "content_hash": testcase_store.record_content_hash(db, row[0])
         }
     return None
@@ -0,0 +1,177 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from app.lib.xmind2testcase import utils
+from xmind2testcase.metadata import TestCase, TestStep, TestSuite
+from app.core.config import settings
+
+# Bump whenever the parser or the metadata classes change what a parse produces, so keys and
+# cache files written by an older version are never served again.
+CACHE_FORMAT_VERSION = 2
+
+_CACHED_TYPES = {cls.__name__: cls for cls in (TestSuite, TestCase, TestStep)}
+
+
+def _encode(obj):
+    cls = _CACHED_TYPES.get(type(obj).__name__)
+    if type(obj) is not cls:
+        raise TypeError(f"Object of type {type(obj).__name__} is not cached")
+    return {"__type__": cls.__name__, "fields": {name: getattr(obj, name) for name in cls.__slots__}}
+
+
+def _decode(data):
+    if "__type__" not in data:
+        return data
+    cls = _CACHED_TYPES.get(data["__type__"])
+    if cls is None or set(data["fields"]) - set(cls.__slots__):
+        raise ValueError(f"unexpected cached object {data['__type__']!r}")
+    return cls(**data["fields"])
+
+
+class ParseCache:
+    """
+    Cache of parsed XMind files keyed by the SHA-256 of the file bytes, the parser config and
+    `CACHE_FORMAT_VERSION`.
+
+    Entries live in a bounded in-memory LRU tier and, optionally, in an on-disk tier under
+    the upload folder so results survive restarts and are shared between workers. Disk entries
+    are plain JSON tagged with `CACHE_FORMAT_VERSION` and rebuilt into the metadata classes, never
+    unpickled.
+    Cached `TestSuite` objects are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_entries=None, disk=None, disk_dir=None, disk_max_files=None):
+        self.max_entries = max_entries if max_entries is not None else settings.PARSE_CACHE_SIZE
+        self.disk = disk if disk is not None else settings.PARSE_CACHE_DISK
+        self.disk_dir = disk_dir or settings.PARSE_CACHE_DIR
+        self.disk_max_files = disk_max_files if disk_max_files is not None else settings.PARSE_CACHE_DISK_MAX_FILES
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "disk_hits": 0, "disk_writes": 0}
+
+    def get_testsuites(self, xmind_file: str, context=None):
+        """Return the parsed testsuites of a file, parsing it only on a cache miss.
+
+        `context` (a `ParseContext`) only controls how a miss is parsed, e.g. in parallel;
+        it must not override the parser config, which is not part of the key.
+        """
+        key = self.make_key(xmind_file)
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return self._entries[key]
+
+        testsuites = self._load_from_disk(key)
+        if testsuites is None:
+            with self._lock:
+                self._counters["misses"] += 1
+            testsuites = utils.get_xmind_testsuites(xmind_file, context)
+            self._save_to_disk(key, testsuites)
+
+        self._put(key, testsuites)
+        return testsuites
+
+    def get_testcases(self, xmind_file: str, context=None):
+        """Return the flat testcase list of a file, derived from the cached testsuites."""
+        return utils.testsuites_to_testcase_list(self.get_testsuites(xmind_file, context))
+
+    @staticmethod
+    def make_key(xmind_file: str) -> str:
+        digest = hashlib.sha256(f"v{CACHE_FORMAT_VERSION}:".encode("utf-8"))
+        with open(xmind_file, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+
+        parser_config = json.dumps(utils.ParseContext().config, sort_keys=True)
+        digest.update(parser_config.encode("utf-8"))
+        return digest.hexdigest()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._counters, entries=len(self._entries), max_entries=self.max_entries, disk=self.disk)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _put(self, key, testsuites):
+        with self._lock:
+            self._entries[key] = testsuites
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key + ".json")
+
+    def _load_from_disk(self, key):
+        if not self.disk:
+            return None
+
+        path = self._disk_path(key)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f, object_hook=_decode)
+            if data.get("version") != CACHE_FORMAT_VERSION:
+                raise ValueError(f"format version {data.get('version')!r}")
+            testsuites = data["testsuites"]
+        except Exception as e:
+            logging.warning(f"Discarding unreadable parse cache file {path}: {e}")
+            return None
+
+        with self._lock:
+            self._counters["disk_hits"] += 1
+        return testsuites
+
+    def _save_to_disk(self, key, testsuites):
+        if not self.disk:
+            return
+
+        tmp_path = None
+        try:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"version": CACHE_FORMAT_VERSION, "testsuites": testsuites}, f,
+                          default=_encode, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_path, self._disk_path(key))
+        except (OSError, TypeError, ValueError) as e:
+            logging.warning(f"Unable to write parse cache file for {key}: {e}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        with self._lock:
+            self._counters["disk_writes"] += 1
+        self._prune_disk()
+
+    def _prune_disk(self):
+        try:
+            files = [os.path.join(self.disk_dir, f) for f in os.listdir(self.disk_dir) if f.endswith(".json")]
+        except OSError:
+            return
+
+        if len(files) <= self.disk_max_files:
+            return
+
+        files.sort(key=os.path.getmtime)
+        for path in files[:len(files) - self.disk_max_files]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+# Global instance
+parse_cache = ParseCache()
@@ -0,0 +1,136 @@
+"""
+Execution report of a record.
+
+The case, step and suite aggregates are computed in one pass over the test cases, which also
+keeps the per-case step counts, so the Markdown report is then streamed row by row without
+scanning the steps again. The same aggregates are served as JSON by the stats API, and stored
+with each record when its test cases are saved (see stats_store), which the report then reuses.
+"""
+
+CASE_RESULTS = ('Pass', 'Fail', 'Block', 'Skip', 'Not Run')
+EXECUTED_RESULTS = ('Pass', 'Fail', 'Block')
+RESULT_LABELS = {
+    'Pass': '通过',
+    'Fail': '失败',
+    'Block': '阻塞',
+    'Skip': '跳过',
+    'Not Run': '未执行'
+}
+# per-case step statuses shown in the report details, with their labels
+STEP_DETAILS = (('pass', '通过'), ('fail', '失败'), ('block', '阻塞'))
+
+
+def aggregate(testcases):
+    """Case, step and suite statistics of test cases, plus the step status counts of each case.
+
+    :return: `(stats, case_step_counts)`, `case_step_counts[i]` being the `{status: count}` of case i
+    """
+    case_stats = dict.fromkeys(CASE_RESULTS, 0)
+    step_stats = {'Total': 0, 'pass': 0, 'fail': 0, 'not_run': 0}
+    suite_stats = {}  # {suite_name: {Total, Pass, Fail, Block, Skip, Not Run}}
+    case_step_counts = []
+
+    for test in testcases:
+        result = test.get('result', 'Not Run')
+        if result not in case_stats:
+            result = 'Not Run'
+        case_stats[result] += 1
+
+        counts = step_counts(test)
+        case_step_counts.append(counts)
+
+        step_stats['Total'] += sum(counts.values())
+        for status, count in counts.items():
+            step_stats[status] = step_stats.get(status, 0) + count
+
+        suite = test.get('suite', 'Root')
+        if suite not in suite_stats:
+            suite_stats[suite] = dict.fromkeys(('Total',) + CASE_RESULTS, 0)
+        suite_stats[suite]['Total'] += 1
+        suite_stats[suite][result] += 1
+
+    stats = {
+        'cases': dict(case_stats, Total=len(case_step_counts),
+                      Executed=sum(case_stats[result] for result in EXECUTED_RESULTS)),
+        'steps': step_stats,
+        'suites': suite_stats
+    }
+    return stats, case_step_counts
+
+
+def step_counts(test):
+    """`{status: count}` of the steps of a test case."""
+    counts = {}
+    for step in test.get('steps') or ():
+        status = step.get('status', 'not_run')
+        counts[status] = counts.get(status, 0) + 1
+    return counts
+
+
+def record_stats(testcases):
+    """Case, step and suite statistics of test cases, see `aggregate`."""
+    return aggregate(testcases)[0]
+
+
+def step_summary(counts):
+    total = sum(counts.values())
+    if not total:
+        return ""
+
+    details = [f"{label}:{counts[status]}" for status, label in STEP_DETAILS if counts.get(status)]
+    summary = f"总:{total}"
+    if details:
+        summary += f" ({', '.join(details)})"
+    return summary
+
+
+def iter_markdown_report(name, testcases, rows_per_chunk=500, stats=None):
+    """Yield the Markdown execution report of test cases, the details table by chunks of rows.
+
+    :param stats: `record_stats` of the test cases when already known, e.g. stored with the record
+    """
+    if stats is None:
+        stats, case_step_counts = aggregate(testcases)
+    else:
+        case_step_counts = map(step_counts, testcases)
+    cases, steps = stats['cases'], stats['steps']
+
+    yield f"""# {name.split('.')[0]}执行结果
+
+## 1. 用例执行统计
+- **用例总数**: {cases['Total']}
+- **已执行**: {cases['Executed']}
+- **通过**: {cases['Pass']}
+- **失败**: {cases['Fail']}
+- **阻塞**: {cases['Block']}
+- **跳过**: {cases['Skip']}
+
+## 2. 步骤执行统计
+- **步骤总数**: {steps['Total']}
+- **通过**: {steps['pass']}
+- **失败**: {steps['fail']}
+- **未执行**: {steps['not_run']}
+
+
+## 3. 详细记录
+
+| 序号 | 模块 | 用例名称 | 结果 | 步骤情况 | 备注 |  
+|---|---|---|---|---|---|"""
+
+    rows = []
+    for idx, (test, counts) in enumerate(zip(testcases, case_step_counts), 1):
+        raw_result = test.get('result', 'Not Run')
+        result = RESULT_LABELS.get(raw_result, raw_result)
+
+        # Ensure values are strings to prevent crashes on None
+        comment = str(test.get('comment') or '').replace('|', '-').replace('\n', ' ')
+        suite = str(test.get('suite') or 'Root')
+        title = str(test.get('name') or '').replace('|', '-').replace('\n', ' ')
+
+        rows.append(f"\n| {idx} | {suite} | {title} | {result} | {step_summary(counts).replace('|', '-')} | {comment} |")
+        if len(rows) >= rows_per_chunk:
+            yield ''.join(rows)
+            rows = []
+
+    if rows:
+        yield ''.join(rows)
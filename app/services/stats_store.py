@@ -0,0 +1,72 @@
+"""
+Statistics maintained when records are written (see migrations/0006_statistics.sql).
+
+Creating or deleting a record bumps the counters of its day and project, and saving the test
+cases of a record stores their case, step and suite aggregates, so the index page and the
+reports read a few rows instead of counting records or test cases on every view.
+
+Counters keep every record created, deleted ones included, which is what the index page shows;
+`deleted` tells the live ones apart.
+"""
+import json
+import sqlite3
+
+
+def record_day(create_on):
+    """Day a record is counted on: the local date of its `create_on` timestamp."""
+    return str(create_on)[:10]
+
+
+def _count(db: sqlite3.Connection, project_id, create_on, created, deleted):
+    project_id = project_id or 0
+    db.execute("INSERT INTO daily_record_counts (day, project_id, created, deleted) VALUES (?, ?, ?, ?) "
+               "ON CONFLICT (day, project_id) DO UPDATE SET created = created + excluded.created, "
+               "deleted = deleted + excluded.deleted", (record_day(create_on), project_id, created, deleted))
+    db.execute("INSERT INTO project_record_counts (project_id, created, deleted) VALUES (?, ?, ?) "
+               "ON CONFLICT (project_id) DO UPDATE SET created = created + excluded.created, "
+               "deleted = deleted + excluded.deleted", (project_id, created, deleted))
+
+
+def record_created(db: sqlite3.Connection, project_id, create_on):
+    """Count a new record; the caller commits."""
+    _count(db, project_id, create_on, 1, 0)
+
+
+def record_deleted(db: sqlite3.Connection, project_id, create_on):
+    """Count a record soft deleted; the caller commits."""
+    _count(db, project_id, create_on, 0, 1)
+
+
+def created_count(db: sqlite3.Connection, day=None, since=None):
+    """Records created on `day`, on `since` or later, or in total."""
+    if day is not None:
+        sql, params = "SELECT SUM(created) FROM daily_record_counts WHERE day = ?", (day,)
+    elif since is not None:
+        sql, params = "SELECT SUM(created) FROM daily_record_counts WHERE day >= ?", (since,)
+    else:
+        sql, params = "SELECT SUM(created) FROM project_record_counts", ()
+    return db.execute(sql, params).fetchone()[0] or 0
+
+
+def project_record_count(db: sqlite3.Connection, project_id):
+    """Records created in a project, deleted ones included."""
+    row = db.execute("SELECT created FROM project_record_counts WHERE project_id = ?",
+                     (project_id or 0,)).fetchone()
+    return row[0] if row else 0
+
+
+def save_record_stats(db: sqlite3.Connection, record_id: int, stats):
+    """Store the aggregates of the test cases of a record; the caller commits."""
+    db.execute("INSERT OR REPLACE INTO record_stats (record_id, data) VALUES (?, ?)", (record_id, json.dumps(stats)))
+
+
+def load_record_stats(db: sqlite3.Connection, record_id: int):
+    """Stored aggregates of a record, None if they were never computed."""
+    row = db.execute("SELECT data FROM record_stats WHERE record_id = ?", (record_id,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def delete_record_stats(db: sqlite3.Connection, record_ids):
+    """Drop the stored aggregates of records, they are recounted when read; the caller commits."""
+    db.execute("DELETE FROM record_stats WHERE record_id IN (SELECT value FROM json_each(?))",
+               (json.dumps(list(record_ids)),))
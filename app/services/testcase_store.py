@@ -0,0 +1,479 @@
+"""
+Normalized storage of the test cases of a record.
+
+Cases live in the `testcases` table and their steps in `test_steps` (see migrations/0003_testcase_tables.sql),
+one row each, so reading a few selected cases, filtering by suite or result, or counting results
+only touches the matching rows instead of decoding the whole record. Every row keeps its dict as
+JSON next to the indexed columns, so the cases come back exactly as they were saved.
+
+Records written before the tables existed keep their JSON list in `records.content` and are read
+from there until they are saved again or `normalize_records` converts them.
+
+Every save moves `records.version` to the next number. Editors send the version their copy is
+based on, with the whole list (`save_testcases`) or with the changed cases only (`apply_ops`),
+and get a `VersionConflict` instead of overwriting what was saved since.
+
+`records.content_hash` is an opaque change token: a whole-list save sets it to `content_hash` of
+the cases, `apply_ops` chains it from the previous token and the ops. It changes whenever the cases
+do, so it can key caches and ETags, but it cannot be recomputed from the cases to compare them.
+"""
+import hashlib
+import json
+import sqlite3
+
+from app.lib.xmind2testcase import utils
+from app.services import report_service, stats_store
+
+
+def content_hash(testcases):
+    """SHA-256 of the cases as the `records.content` JSON text.
+
+    Only the first value of the `records.content_hash` change token; edits applied with `apply_ops`
+    chain it, so the column must not be compared with this hash recomputed from the cases.
+    """
+    digest = hashlib.sha256()
+    for chunk in utils.iter_json_chunks(testcases):
+        digest.update(chunk.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _column(value):
+    """Indexed copy of a field, only scalars are worth filtering on."""
+    if isinstance(value, int) and not -2 ** 63 <= value < 2 ** 63:
+        return None
+    return value if isinstance(value, (str, int, float)) else None
+
+
+class VersionConflict(Exception):
+    """The test cases of a record were saved since the version an edit is based on."""
+
+    def __init__(self, version):
+        super().__init__(f"record is at version {version}")
+        self.version = version
+
+
+def record_version(db: sqlite3.Connection, record_id: int):
+    """Version of the test cases of a record, None if there is no such record."""
+    row = db.execute("SELECT version FROM records WHERE id = ?", (record_id,)).fetchone()
+    return row[0] if row else None
+
+
+def _next_version(db: sqlite3.Connection, record_id: int, base_version=None):
+    """Move a record to its next version, from `base_version` only if given; starts the write transaction."""
+    sql = "UPDATE records SET version = version + 1 WHERE id = ?"
+    params = (record_id,)
+    if base_version is not None:
+        sql += " AND version = ?"
+        params += (base_version,)
+    # compare and set in one statement: no other writer can slip in between the check and the update
+    row = db.execute(sql + " RETURNING version", params).fetchall()
+    if not row:
+        raise VersionConflict(record_version(db, record_id))
+    return row[0][0]
+
+
+def _rows(testcases, record_id, first_id, first_ordinal=0):
+    """Case and step rows of the test cases, None if they cannot be stored as rows and read back identical."""
+    case_rows, step_rows = [], []
+    try:
+        for n, case in enumerate(testcases):
+            case_id = first_id + n
+            ordinal = first_ordinal + n
+            steps = case.get('steps')
+            step_count = None
+            if isinstance(steps, list):
+                step_count = len(steps)
+                for step_ordinal, step in enumerate(steps):
+                    step_rows.append((case_id, record_id, step_ordinal, _column(step.get('status')),
+                                      _column(step.get('result')), _column(step.get('execution_type')),
+                                      json.dumps(step, allow_nan=False)))
+                case = dict(case, steps=[])  # keeps the key where it was
+            case_rows.append((case_id, record_id, ordinal, _column(case.get('suite')), _column(case.get('name')),
+                              _column(case.get('importance')), _column(case.get('result')),
+                              _column(case.get('execution_type')), _column(case.get('tc_id')), step_count,
+                              json.dumps(case, allow_nan=False)))
+    except (AttributeError, TypeError, ValueError):
+        # not a list of dicts with dict steps, or not valid JSON for SQLite: kept as a JSON text
+        return None
+    return case_rows, step_rows
+
+
+def _insert_rows(db: sqlite3.Connection, case_rows, step_rows):
+    db.executemany("INSERT OR REPLACE INTO testcases (id, record_id, ordinal, suite, name, priority, result, "
+                   "execution_type, tc_id, step_count, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", case_rows)
+    db.executemany("INSERT INTO test_steps (testcase_id, record_id, ordinal, status, result, execution_type, data) "
+                   "VALUES (?, ?, ?, ?, ?, ?, ?)", step_rows)
+
+
+def save_testcases(db: sqlite3.Connection, record_id: int, testcases, base_version=None):
+    """Replace the test cases of a record and return its new version; the caller commits.
+
+    :param base_version: version the test cases are an edit of, `VersionConflict` if the record is no longer at it
+    """
+    version = _next_version(db, record_id, base_version)
+    _store(db, record_id, testcases)
+    return version
+
+
+def _store(db: sqlite3.Connection, record_id: int, testcases):
+    testcases = list(testcases)
+    db.execute("DELETE FROM test_steps WHERE record_id = ?", (record_id,))
+    db.execute("DELETE FROM testcases WHERE record_id = ?", (record_id,))
+    # the deletes hold the write lock, so the ids below stay free until the commit
+    first_id = db.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM testcases").fetchone()[0]
+
+    rows = _rows(testcases, record_id, first_id)
+    if rows is not None:
+        case_rows, step_rows = rows
+        db.execute("SAVEPOINT save_testcases")
+        try:
+            _insert_rows(db, case_rows, step_rows)
+        except (sqlite3.DataError, UnicodeEncodeError):
+            # e.g. a lone surrogate in an indexed text column
+            db.execute("ROLLBACK TO save_testcases")
+            rows = None
+        db.execute("RELEASE save_testcases")
+
+    content = None if rows is not None else json.dumps(testcases)
+    db.execute("UPDATE records SET content = ?, content_hash = ? WHERE id = ?",
+               (content, content_hash(testcases), record_id))
+    if rows is not None:
+        stats_store.save_record_stats(db, record_id, _count_stats(db, record_id))
+        return
+    try:
+        stats_store.save_record_stats(db, record_id, report_service.record_stats(testcases))
+    except (AttributeError, TypeError):
+        # not cases the report can count
+        stats_store.delete_record_stats(db, [record_id])
+
+
+def _index(op, key, size):
+    value = op.get(key)
+    if not isinstance(value, int) or isinstance(value, bool) or not 0 <= value < size:
+        raise ValueError(f"{op.get('op')}: {key} {value!r} is out of range")
+    return value
+
+
+def _edit_case(case, op):
+    """Copy of a case with a `set` or `set_step` operation applied."""
+    field = op.get('field')
+    if not isinstance(case, dict) or not isinstance(field, str):
+        raise ValueError(f"{op['op']}: needs a case object and a field name")
+    if op['op'] == 'set':
+        return dict(case, **{field: op.get('value')})
+
+    steps = case.get('steps')
+    steps = list(steps) if isinstance(steps, list) else []
+    step = _index(op, 'step', len(steps))
+    if not isinstance(steps[step], dict):
+        raise ValueError(f"set_step: step {step} is not an object")
+    steps[step] = dict(steps[step], **{field: op.get('value')})
+    return dict(case, steps=steps)
+
+
+def _apply(items, ops, edit):
+    """Apply the operations to a list of cases in place; `edit(item, op)` returns the item of an edited case."""
+    for op in ops:
+        kind = op.get('op') if isinstance(op, dict) else None
+        if kind in ('set', 'set_step'):
+            i = _index(op, 'case', len(items))
+            items[i] = edit(items[i], op)
+        elif kind == 'insert':
+            i = _index(op, 'case', len(items) + 1) if op.get('case') is not None else len(items)
+            if not isinstance(op.get('value'), dict):
+                raise ValueError("insert: value must be a case object")
+            items.insert(i, edit(None, op))
+        elif kind == 'delete':
+            del items[_index(op, 'case', len(items))]
+        elif kind == 'move':
+            i = _index(op, 'case', len(items))
+            items.insert(_index(op, 'to', len(items)), items.pop(i))
+        else:
+            raise ValueError(f"unknown operation {kind!r}")
+
+
+def _load_case(db: sqlite3.Connection, case_id: int):
+    case = json.loads(db.execute("SELECT data FROM testcases WHERE id = ?", (case_id,)).fetchone()[0])
+    if isinstance(case.get('steps'), list) and not case['steps']:
+        rows = db.execute("SELECT data FROM test_steps WHERE testcase_id = ? ORDER BY ordinal", (case_id,)).fetchall()
+        case['steps'] = _decode_rows(rows)
+    return case
+
+
+def apply_ops(db: sqlite3.Connection, record_id: int, base_version, ops):
+    """Apply a batch of per-case operations to the test cases of a record and return its new version.
+
+    The operations are applied in order, indexes referring to the list as left by the previous ones:
+
+    - `{"op": "set", "case": i, "field": f, "value": v}`: set a field of a case (`steps` replaces them all)
+    - `{"op": "set_step", "case": i, "step": j, "field": f, "value": v}`: set a field of a step
+    - `{"op": "insert", "case": i, "value": case}`: insert a case before index i (at the end without `case`)
+    - `{"op": "delete", "case": i}`: remove a case
+    - `{"op": "move", "case": i, "to": j}`: move a case to index j
+
+    Only the rows of the cases edited are rewritten, the others at most renumbered. Raises
+    `VersionConflict` if the record is no longer at `base_version` and ValueError for an invalid
+    operation, leaving the transaction to the caller to commit or roll back.
+    """
+    version = _next_version(db, record_id, base_version)
+    old_ids = [row[0] for row in db.execute(
+        "SELECT id FROM testcases WHERE record_id = ? ORDER BY ordinal", (record_id,))]
+    if not old_ids:
+        # a JSON text (or nothing) rather than rows: edit the list, storing it as rows if it fits
+        testcases = _legacy_testcases(db, record_id)
+        testcases = [] if testcases is None else testcases
+        if not isinstance(testcases, list):
+            raise ValueError("the record does not store a list of cases")
+        _apply(testcases, ops, lambda case, op: op['value'] if case is None else _edit_case(case, op))
+        _store(db, record_id, testcases)
+        return version
+
+    # (case id, None while untouched or the edited case), the ids of inserted cases are found at the end
+    items = [(case_id, None) for case_id in old_ids]
+
+    def edit(item, op):
+        if item is None:
+            return None, op['value']
+        case_id, case = item
+        return case_id, _edit_case(_load_case(db, case_id) if case is None else case, op)
+
+    _apply(items, ops, edit)
+
+    kept = {case_id for case_id, _ in items if case_id is not None}
+    deleted = [case_id for case_id in old_ids if case_id not in kept]
+    # the stored aggregates move by what the removed and rewritten rows counted, then what the new rows count
+    stats = stats_store.load_record_stats(db, record_id)
+    if stats is not None:
+        _add_counts(stats, _count_rows(db, record_id, deleted + [case_id for case_id, case in items
+                                                                 if case is not None and case_id is not None]), -1)
+    deleted = json.dumps(deleted)
+    db.execute("DELETE FROM test_steps WHERE testcase_id IN (SELECT value FROM json_each(?))", (deleted,))
+    db.execute("DELETE FROM testcases WHERE id IN (SELECT value FROM json_each(?))", (deleted,))
+
+    # rows that change are written at -ordinal - 1 first, so none collides with one not moved yet
+    old_ordinals = {case_id: ordinal for ordinal, case_id in enumerate(old_ids)}
+    next_id = db.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM testcases").fetchone()[0]
+    moved, case_rows, step_rows = [], [], []
+    for ordinal, (case_id, case) in enumerate(items):
+        if case is None:
+            if old_ordinals[case_id] != ordinal:
+                moved.append((-ordinal - 1, case_id))
+            continue
+        if case_id is None:
+            case_id, next_id = next_id, next_id + 1
+        rows = _rows([case], record_id, case_id, -ordinal - 1)
+        if rows is None:
+            raise ValueError(f"case {ordinal} cannot be stored")
+        case_rows += rows[0]
+        step_rows += rows[1]
+
+    rewritten = json.dumps([row[0] for row in case_rows])
+    db.execute("DELETE FROM test_steps WHERE testcase_id IN (SELECT value FROM json_each(?))", (rewritten,))
+    db.executemany("UPDATE testcases SET ordinal = ? WHERE id = ?", moved)
+    try:
+        _insert_rows(db, case_rows, step_rows)
+    except (sqlite3.DataError, UnicodeEncodeError) as e:
+        raise ValueError(f"cases cannot be stored: {e}")
+    db.execute("UPDATE testcases SET ordinal = -ordinal - 1 WHERE record_id = ? AND ordinal < 0", (record_id,))
+
+    # the change token is chained rather than hashed over the whole record again: it only has to change with the cases
+    previous = db.execute("SELECT content_hash FROM records WHERE id = ?", (record_id,)).fetchone()[0] or ''
+    digest = hashlib.sha256(f"{previous}:{version}:{json.dumps(ops)}".encode('utf-8'))
+    db.execute("UPDATE records SET content_hash = ? WHERE id = ?", (digest.hexdigest(), record_id))
+    if stats is None:
+        stats = _count_stats(db, record_id)
+    else:
+        _add_counts(stats, _count_rows(db, record_id, [row[0] for row in case_rows]))
+    stats_store.save_record_stats(db, record_id, stats)
+    return version
+
+
+def _legacy_testcases(db: sqlite3.Connection, record_id: int):
+    """The JSON list of a record not stored as rows, None when there is none."""
+    row = db.execute("SELECT content FROM records WHERE id = ?", (record_id,)).fetchone()
+    if not row or not row[0]:
+        return None
+    try:
+        return json.loads(row[0])
+    except ValueError:
+        return None
+
+
+def record_content_hash(db: sqlite3.Connection, record_id: int):
+    """Change token of the test cases stored with a record (see `records.content_hash`), None if it stores none."""
+    row = db.execute("SELECT content_hash, content FROM records WHERE id = ?", (record_id,)).fetchone()
+    if not row:
+        return None
+    if row[0]:
+        return row[0]
+    if row[1]:
+        return hashlib.sha256(row[1].encode('utf-8')).hexdigest()
+    return None
+
+
+def load_testcases(db: sqlite3.Connection, record_id: int, ordinals=None, suite=None, result=None):
+    """Test cases stored with a record, None if it stores none.
+
+    :param ordinals: indexes of the cases to return, in this order (out of range ones are skipped)
+    :param suite: only the cases of this suite
+    :param result: only the cases with this result
+    """
+    if record_content_hash(db, record_id) is None:
+        return None
+
+    where, params = ["t.record_id = ?"], [record_id]
+    if ordinals is not None:
+        where.append("t.ordinal IN (SELECT value FROM json_each(?))")
+        params.append(json.dumps([i for i in ordinals if isinstance(i, int)]))
+    if suite is not None:
+        where.append("t.suite = ?")
+        params.append(suite)
+    if result is not None:
+        where.append("t.result = ?")
+        params.append(result)
+    where = " AND ".join(where)
+
+    cursor = db.cursor()
+    cursor.row_factory = None  # plain tuples, faster to fetch by the thousand
+    case_rows = cursor.execute(f"SELECT t.id, t.ordinal, t.data FROM testcases t WHERE {where} ORDER BY t.ordinal",
+                                params).fetchall()
+    step_rows = cursor.execute(f"SELECT s.testcase_id, s.data FROM testcases t "
+                                f"JOIN test_steps s ON s.testcase_id = t.id "
+                                f"WHERE {where} ORDER BY t.ordinal, s.ordinal", params).fetchall()
+    # one decode per table rather than per row
+    case_list = _decode_rows(case_rows)
+    cases = {row[1]: case for row, case in zip(case_rows, case_list)}  # ordinal -> case
+    by_id = {row[0]: case for row, case in zip(case_rows, case_list)}
+    for row, step in zip(step_rows, _decode_rows(step_rows)):
+        by_id[row[0]]['steps'].append(step)
+
+    if not cases and not db.execute("SELECT 1 FROM testcases WHERE record_id = ? LIMIT 1", (record_id,)).fetchone():
+        testcases = _legacy_testcases(db, record_id)
+        if testcases:
+            return _filter_legacy(testcases, ordinals, suite, result)
+
+    if ordinals is not None:
+        return [cases[i] for i in ordinals if i in cases]
+    return list(cases.values())
+
+
+def _decode_rows(rows):
+    """Decode the JSON `data` (last column) of rows."""
+    return json.loads('[' + ','.join(row[-1] for row in rows) + ']')
+
+
+def _filter_legacy(testcases, ordinals, suite, result):
+    if ordinals is not None:
+        testcases = [testcases[i] for i in ordinals if isinstance(i, int) and 0 <= i < len(testcases)]
+    if suite is not None:
+        testcases = [case for case in testcases if case.get('suite') == suite]
+    if result is not None:
+        testcases = [case for case in testcases if case.get('result') == result]
+    return testcases
+
+
+def record_stats(db: sqlite3.Connection, record_id: int):
+    """Case, step and suite statistics of a record, see `report_service.record_stats`.
+
+    Read from the aggregates stored when the test cases were saved, counted for records saved before.
+    """
+    stats = stats_store.load_record_stats(db, record_id)
+    if stats is not None:
+        return stats
+    if not db.execute("SELECT 1 FROM testcases WHERE record_id = ? LIMIT 1", (record_id,)).fetchone():
+        return report_service.record_stats(load_testcases(db, record_id) or [])
+    return _count_stats(db, record_id)
+
+
+def _count_rows(db: sqlite3.Connection, record_id: int, case_ids=None):
+    """`(case counts, step counts)` of a record's rows, or of the cases `case_ids` only.
+
+    Case counts are `(suite, result, count)`, step counts `(status, count)`, as `record_stats` counts them.
+    """
+    if case_ids is None:
+        case_where = step_where = "record_id = ?"
+        params = (record_id,)
+    else:
+        case_where = "id IN (SELECT value FROM json_each(?))"
+        step_where = "testcase_id IN (SELECT value FROM json_each(?))"
+        params = (json.dumps(list(case_ids)),)
+
+    results = ", ".join("'%s'" % result for result in report_service.CASE_RESULTS)
+    cases = db.execute(
+        f"SELECT COALESCE(suite, 'Root') AS s, CASE WHEN result IN ({results}) THEN result ELSE 'Not Run' END AS r, "
+        f"COUNT(*) FROM testcases WHERE {case_where} GROUP BY s, r ORDER BY MIN(ordinal)", params).fetchall()
+    steps = db.execute(
+        f"SELECT COALESCE(status, 'not_run') AS st, COUNT(*) FROM test_steps WHERE {step_where} "
+        f"GROUP BY st ORDER BY MIN(id)", params).fetchall()
+    return cases, steps
+
+
+def _json_key(value):
+    """The key a counted value becomes in the stored (JSON) stats."""
+    return value if isinstance(value, str) else json.dumps(value)
+
+
+def _add_counts(stats, counts, sign=1):
+    """Add (or with `sign=-1` remove) counts of `_count_rows` to `record_stats`, in place.
+
+    Suites and extra step statuses left at zero are dropped once `sign` is 1, as a count from scratch
+    would not list them; a suite only emptied by a removal keeps its place for the counts added next.
+    """
+    case_counts, step_counts = counts
+    case_stats, suite_stats = stats['cases'], stats['suites']
+    for suite, result, count in case_counts:
+        suite = _json_key(suite)
+        case_stats[result] += sign * count
+        if suite not in suite_stats:
+            suite_stats[suite] = dict.fromkeys(('Total',) + report_service.CASE_RESULTS, 0)
+        suite_stats[suite]['Total'] += sign * count
+        suite_stats[suite][result] += sign * count
+    case_stats['Total'] = sum(case_stats[result] for result in report_service.CASE_RESULTS)
+    case_stats['Executed'] = sum(case_stats[result] for result in report_service.EXECUTED_RESULTS)
+
+    step_stats = stats['steps']
+    for status, count in step_counts:
+        status = _json_key(status)
+        step_stats['Total'] += sign * count
+        step_stats[status] = step_stats.get(status, 0) + sign * count
+
+    if sign > 0:
+        for suite in [suite for suite, counts in suite_stats.items() if not counts['Total']]:
+            del suite_stats[suite]
+        for status in [status for status, count in step_stats.items()
+                       if not count and status not in ('Total', 'pass', 'fail', 'not_run')]:
+            del step_stats[status]
+    return stats
+
+
+def _count_stats(db: sqlite3.Connection, record_id: int):
+    """`record_stats` of a record stored as rows, counted by SQL."""
+    stats = {
+        'cases': dict(dict.fromkeys(report_service.CASE_RESULTS, 0), Total=0, Executed=0),
+        'steps': {'Total': 0, 'pass': 0, 'fail': 0, 'not_run': 0},
+        'suites': {}
+    }
+    return _add_counts(stats, _count_rows(db, record_id))
+
+
+def normalize_records(db: sqlite3.Connection):
+    """Move the JSON lists still in `records.content` to the tables, one commit per record; returns the count.
+
+    Also stores the aggregates of the records saved as rows before they were kept.
+    """
+    record_ids = [row[0] for row in db.execute(
+        "SELECT id FROM records WHERE content IS NOT NULL AND content <> '' AND content_hash IS NULL")]
+    converted = 0
+    for record_id in record_ids:
+        testcases = _legacy_testcases(db, record_id)
+        if testcases is None:
+            continue
+        _store(db, record_id, testcases)  # same cases: open editors keep their version
+        db.commit()
+        converted += 1
+
+    for (record_id,) in db.execute("SELECT DISTINCT record_id FROM testcases "
+                                   "WHERE record_id NOT IN (SELECT record_id FROM record_stats)").fetchall():
+        stats_store.save_record_stats(db, record_id, _count_stats(db, record_id))
+        db.commit()
+    return converted
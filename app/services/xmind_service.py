@@ -4,24 +4,38 @@ import sys
 # Ensure app/lib is in path for relative imports inside the libs if needed, 
 # or just import directly if they are packages.
 # Assuming xmind2testcase and xmindparser are packages in app/lib
-from app.lib.xmind2testcase.utils import get_xmind_testsuites, get_xmind_testcase_list
-from app.lib.xmind2testcase.testlink import xmind_to_testlink_xml_file
-from app.lib.xmind2testcase.zentao import xmind_to_zentao_csv_file
+from app.lib.xmind2testcase.testlink import xmind_to_testlink_xml_file, iter_testlink_xml, write_testlink_xml_file
+from app.lib.xmind2testcase.zentao import ENCODINGS as ZENTAO_ENCODINGS, iter_zentao_csv, xmind_to_zentao_csv_file, \
+    write_zentao_csv_file
+from app.lib.xmind2testcase.xlsx import MEDIA_TYPE as XLSX_MEDIA_TYPE, iter_xlsx, write_xlsx_file
+from app.lib.xmind2testcase import utils
 from app.core.config import settings
+from app.services.parse_cache import parse_cache
+
+def parse_context():
+    """A parser context following the parallel parsing settings."""
+    return utils.ParseContext(workers=settings.PARSE_WORKERS, parallel_min_topics=settings.PARSE_PARALLEL_MIN_TOPICS)
 
 def get_testsuites(filename: str):
-    """Parse xmind file to get test suites."""
+    """Parse xmind file to get test suites (served from the parse cache, treat as read-only)."""
     full_path = os.path.join(settings.UPLOAD_FOLDER, filename)
     if not os.path.exists(full_path):
         return []
-    return get_xmind_testsuites(full_path)
+    return parse_cache.get_testsuites(full_path, parse_context())
 
 def get_testcases(filename: str):
-    """Parse xmind file to get test cases."""
+    """Parse xmind file to get test cases (served from the parse cache)."""
     full_path = os.path.join(settings.UPLOAD_FOLDER, filename)
     if not os.path.exists(full_path):
         return []
-    return get_xmind_testcase_list(full_path)
+    return parse_cache.get_testcases(full_path, parse_context())
+
+def iter_testcases(filename: str):
+    """Stream the flat test cases of a xmind file through the fused parser (bypasses the parse cache)."""
+    full_path = os.path.join(settings.UPLOAD_FOLDER, filename)
+    if not os.path.exists(full_path):
+        return iter(())
+    return utils.iter_xmind_testcases(full_path, parse_context())
 
 def convert_to_testlink(filename: str, testsuites=None):
     """Convert xmind to TestLink XML."""
@@ -29,20 +43,79 @@ def convert_to_testlink(filename: str, testsuites=None):
     # Check path logic is handled in lib, but we pass full path
     return xmind_to_testlink_xml_file(full_path, testsuites=testsuites)
 
+def stream_testlink(filename: str, testsuites=None):
+    """Stream TestLink XML (str chunks) for the given testsuites, or the parsed file; None if it does not exist."""
+    if testsuites is None:
+        full_path = os.path.join(settings.UPLOAD_FOLDER, filename)
+        if not os.path.exists(full_path):
+            return None
+        testsuites = get_testsuites(filename)
+    return iter_testlink_xml(testsuites)
+
+def write_testlink(filename: str, path: str, testsuites=None):
+    """Write TestLink XML for the given testsuites, or the parsed file, to `path`."""
+    if testsuites is None:
+        testsuites = get_testsuites(filename)
+    return write_testlink_xml_file(testsuites, path)
+
+def write_zentao(filename: str, path: str, testcases=None, case_type=None, apply_phase=None, encoding="utf8"):
+    """Write ZenTao CSV for the given test cases, or the parsed file, to `path`."""
+    if testcases is None:
+        testcases = get_testcases(filename)
+    return write_zentao_csv_file(testcases, path, case_type=case_type, apply_phase=apply_phase, encoding=encoding)
+
+def stream_zentao(filename: str, testcases=None, case_type=None, apply_phase=None, encoding="utf8"):
+    """Stream encoded ZenTao CSV chunks for the given test cases, or the parsed file."""
+    if testcases is None:
+        testcases = get_testcases(filename)
+    return iter_zentao_csv(testcases, case_type=case_type, apply_phase=apply_phase, encoding=encoding)
+
+def write_xlsx(filename: str, path: str, testcases=None, case_type=None, apply_phase=None):
+    """Write the xlsx workbook (ZenTao columns) of the given test cases, or the parsed file, to `path`."""
+    if testcases is None:
+        testcases = get_testcases(filename)
+    return write_xlsx_file(testcases, path, case_type=case_type, apply_phase=apply_phase)
+
+def stream_xlsx(filename: str, testcases=None, case_type=None, apply_phase=None):
+    """Stream the xlsx workbook (ZenTao columns) of the given test cases, or the parsed file, as bytes chunks."""
+    if testcases is None:
+        testcases = get_testcases(filename)
+    return iter_xlsx(testcases, case_type=case_type, apply_phase=apply_phase)
+
+def export_source_hash(filename: str, record=None):
+    """Key of what the exports of a file are generated from: the record's change token, else the XMind file hash (None if missing)."""
+    if record and record.get('content_hash'):
+        return 'record:' + record['content_hash']
+
+    full_path = os.path.join(settings.UPLOAD_FOLDER, filename)
+    if not os.path.exists(full_path):
+        return None
+    return 'file:' + parse_cache.make_key(full_path)
+
 def convert_to_zentao(filename: str, testcases=None, case_type=None, apply_phase=None):
     """Convert xmind to ZenTao CSV."""
     full_path = os.path.join(settings.UPLOAD_FOLDER, filename)
     return xmind_to_zentao_csv_file(full_path, testcases=testcases, case_type=case_type, apply_phase=apply_phase)
 
 from app.lib.xmind2testcase.metadata import TestSuite, TestCase, TestStep
-from app.lib.xmind2testcase.writer import write_xmind_zip
+from app.lib.xmind2testcase.writer import iter_xmind_zip, write_xmind_zip
 
 def convert_to_xmind(filename: str, testsuites=None):
-    """Convert DB testsuites to XMind file (BytesIO)."""
+    """Convert DB testsuites to XMind file (BytesIO), identical testsuites give identical bytes."""
     if testsuites:
-        return write_xmind_zip(testsuites)
+        return write_xmind_zip(testsuites, deterministic=True)
     return None
 
+def stream_xmind(filename: str, testsuites):
+    """Stream the XMind file of DB testsuites as bytes chunks, while it is generated."""
+    return iter_xmind_zip(testsuites, deterministic=True)
+
+def write_xmind(filename: str, path: str, testsuites):
+    """Write the XMind file of DB testsuites to `path`, identical testsuites give identical bytes."""
+    with open(path, 'wb') as f:
+        write_xmind_zip(testsuites, fileobj=f, deterministic=True)
+    return path
+
 def reconstruct_testsuites_from_db_list(testcase_list, root_name="Exported from XMind2TestCase"):
     """Reconstruct a TestSuite hierarchy from flat list of test cases.
     
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+异步数据库访问层基准测试
+
+在事件循环中处理一次大文件上传（解析 XMind 并写入用例表，示例用例放大到约指定数量），同时
+一个协程每 1 ms 醒来一次并记录延迟（事件循环被阻塞的时长），比较：
+- on-loop：旧实现，async 路由直接在事件循环中执行同步的解析与写入
+- executor：解析在普通工作线程中执行，只有写入通过 AsyncDatabase 在数据库线程中执行
+
+报告上传耗时、事件循环的最大与 p99 延迟。
+
+用法: python benchmarks/bench_async_db.py [用例数]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import closing
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+sys.path.insert(0, os.path.join(root, "app", "lib"))
+
+from app.core import database
+from app.core.config import settings
+from app.services import file_service, xmind_service
+from xmind2testcase import writer
+from xmind2testcase.utils import get_xmind_testsuites
+
+SAMPLE = os.path.join(root, "docs", "xmind_testcase_template_v1.1.xmind")
+
+
+def write_large_xmind(path, count):
+    testsuites = get_xmind_testsuites(SAMPLE)
+    testsuites[0].sub_suites = testsuites[0].sub_suites * max(1, count // 10)  # about 10 cases a copy
+    with open(path, "wb") as f:
+        writer.write_xmind_zip(testsuites, fileobj=f, deterministic=True)
+
+
+def parse(filename):
+    return list(xmind_service.iter_testcases(filename))
+
+
+def upload(db, filename, testcases=None):
+    if testcases is None:
+        testcases = parse(filename)
+    file_service.insert_record(db, filename, testcases=testcases)
+    return len(testcases)
+
+
+async def measure(run_upload):
+    done = asyncio.Event()
+    lags = []
+
+    async def monitor():
+        loop = asyncio.get_running_loop()
+        while not done.is_set():
+            start = loop.time()
+            await asyncio.sleep(0.001)
+            lags.append(loop.time() - start - 0.001)
+
+    watcher = asyncio.create_task(monitor())
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    cases = await run_upload()
+    elapsed = time.perf_counter() - start
+    done.set()
+    await watcher
+    return cases, elapsed, lags
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    directory = tempfile.mkdtemp()
+    settings.DATABASE_PATH = os.path.join(directory, "async.db3")
+    settings.UPLOAD_FOLDER = directory
+    database.init_db()
+    adb = database.AsyncDatabase()
+
+    def on_loop(filename):
+        async def run():
+            with closing(database.connect()) as db:
+                return upload(db, filename)
+        return run
+
+    def on_executor(filename):
+        async def run():
+            testcases = await asyncio.to_thread(parse, filename)
+            return await adb.run(upload, filename, testcases)
+        return run
+
+    print(f"{'mode':<10}{'cases':>7}{'upload (ms)':>13}{'max lag (ms)':>14}{'p99 lag (ms)':>14}")
+    for mode, factory in (("on-loop", on_loop), ("executor", on_executor)):
+        filename = f"{mode}.xmind"
+        write_large_xmind(os.path.join(directory, filename), count)
+        cases, elapsed, lags = asyncio.run(measure(factory(filename)))
+        p99 = statistics.quantiles(lags, n=100, method="inclusive")[-1] if len(lags) > 1 else lags[0]
+        print(f"{mode:<10}{cases:>7}{elapsed * 1000:>13.1f}{max(lags) * 1000:>14.1f}{p99 * 1000:>14.2f}")
+    adb.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+紧凑二进制格式基准测试
+
+将 docs/ 下示例 XMind 的用例复制放大到指定数量（名称、步骤各不相同），比较：
+- json：records.content 的存储格式 json.dumps(testcases)
+- json indent：xmind_testcase_to_json_file 的输出格式（indent=4）
+- compact：xmind2testcase.compact 的 .xtc 格式
+
+报告大小、编码耗时与加载耗时（多次取最优）。
+
+用法: python benchmarks/bench_compact.py [用例数] [重复次数]
+"""
+import gc
+import json
+import sys
+import time
+from pathlib import Path
+
+root = Path(__file__).parent.parent
+sys.path.insert(0, str(root / "app" / "lib"))
+
+from xmind2testcase import compact
+from xmind2testcase.utils import get_xmind_testcase_list
+
+SAMPLE = "xmind_testcase_template_v1.1.xmind"
+
+
+def scaled_testcases(count):
+    template = get_xmind_testcase_list(str(root / "docs" / SAMPLE))
+    testcases = []
+    while len(testcases) < count:
+        n = len(testcases)
+        for case in template[:count - n]:
+            steps = [dict(step, actions=f"{step['actions']} {n}") for step in case["steps"]]
+            testcases.append(dict(case, name=f"{case['name']} {n}", steps=steps))
+    return testcases
+
+
+def best_of(func, repeat):
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        del result
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    testcases = scaled_testcases(count)
+
+    formats = {
+        "json": (lambda: json.dumps(testcases).encode("utf-8"), json.loads),
+        "json indent": (lambda: json.dumps(testcases, indent=4, ensure_ascii=False).encode("utf-8"), json.loads),
+        "compact": (lambda: compact.dumps(testcases), compact.loads),
+    }
+
+    print(f"{count} cases, {sum(len(case['steps']) for case in testcases)} steps")
+    print(f"{'format':<14}{'size MB':>9}{'dump (s)':>10}{'load (s)':>10}")
+    for name, (dump, load) in formats.items():
+        data = dump()
+        assert load(data) == testcases
+        dump_time = best_of(dump, repeat)
+        load_time = best_of(lambda: load(data), repeat)
+        print(f"{name:<14}{len(data) / 1024 / 1024:>9.1f}{dump_time:>10.3f}{load_time:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+数据库连接池基准测试
+
+模拟首页请求（记录列表、配置、项目、三项统计，共六条查询），比较：
+- per-request：旧实现，每个请求 sqlite3.connect 一次、默认 rollback 日志，用完关闭
+- pooled：app.core.database.ConnectionPool，连接复用、WAL 等 PRAGMA 只设置一次
+
+读线程并发执行请求，同时一个写线程不断插入记录并提交（模拟上传），
+报告读请求吞吐与 p50/p99 延迟，以及写入次数。
+
+用法: python benchmarks/bench_db_pool.py [读线程数] [秒数]
+"""
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from contextlib import closing, contextmanager
+from pathlib import Path
+
+root = Path(__file__).parent.parent
+sys.path.insert(0, str(root))
+
+from app.core import database
+from app.core.config import settings
+
+INDEX_QUERIES = [
+    ("SELECT * FROM records WHERE is_deleted = 0 ORDER BY id DESC LIMIT ?", (8,)),
+    ("SELECT key, value FROM configs", ()),
+    ("SELECT id, name FROM projects WHERE is_deleted = 0 ORDER BY id DESC", ()),
+    ("SELECT SUM(created) FROM daily_record_counts WHERE day = ?", ("2024-01-01",)),
+    ("SELECT SUM(created) FROM daily_record_counts WHERE day >= ?", ("2024-01-01",)),
+    ("SELECT SUM(created) FROM project_record_counts", ()),
+]
+
+
+def build_database(path, records=2000):
+    settings.DATABASE_PATH = path
+    database.init_db()
+    with closing(sqlite3.connect(path)) as db:
+        db.executemany("INSERT INTO records (name, create_on, content) VALUES (?, ?, ?)",
+                       [(f"case_{i}.xmind", "2024-01-01 10:00:00", "[]") for i in range(records)])
+        db.commit()
+
+
+def per_request_connection(path):
+    @contextmanager
+    def connection():
+        with closing(sqlite3.connect(path, check_same_thread=False)) as db:
+            db.execute("PRAGMA journal_mode=DELETE")
+            db.row_factory = sqlite3.Row
+            yield db
+    return connection
+
+
+def run(mode, readers, seconds):
+    path = tempfile.mktemp(suffix=".db3")
+    build_database(path)
+    if mode == "pooled":
+        pool = database.ConnectionPool(path, max_size=readers + 1)
+        connection = pool.connection
+    else:
+        pool = None
+        connection = per_request_connection(path)
+
+    stop = time.perf_counter() + seconds
+    latencies, errors, writes = [], [], [0]
+
+    def reader():
+        local = []
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            try:
+                with connection() as db:
+                    for sql, params in INDEX_QUERIES:
+                        db.execute(sql, params).fetchall()
+            except sqlite3.OperationalError as e:
+                errors.append(e)
+                continue
+            local.append(time.perf_counter() - start)
+        latencies.extend(local)
+
+    def writer():
+        while time.perf_counter() < stop:
+            try:
+                with connection() as db:
+                    db.execute("INSERT INTO records (name, create_on, content) VALUES (?, ?, ?)",
+                               ("upload.xmind", "2024-01-01 12:00:00", "[]" * 2000))
+                    db.commit()
+                writes[0] += 1
+            except sqlite3.OperationalError as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)] + [threading.Thread(target=writer)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if pool is not None:
+        pool.close()
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99)] if latencies else 0
+    return len(latencies) / seconds, statistics.median(latencies or [0]), p99, writes[0], len(errors)
+
+
+def main():
+    readers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 3
+    print(f"{readers} reader threads + 1 writer, {seconds}s")
+    print(f"{'mode':<13}{'req/s':>9}{'p50 (ms)':>10}{'p99 (ms)':>10}{'writes':>8}{'errors':>8}")
+    for mode in ("per-request", "pooled"):
+        rps, p50, p99, writes, errors = run(mode, readers, seconds)
+        print(f"{mode:<13}{rps:>9.0f}{p50 * 1000:>10.2f}{p99 * 1000:>10.2f}{writes:>8}{errors:>8}")
+
+
+if __name__ == "__main__":
+    main()
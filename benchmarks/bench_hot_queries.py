@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+热点查询基准测试
+
+生成指定数量的记录（10% 已删除、50 个项目、约 2000 天的创建时间），分别在
+- 仅执行基线迁移（无索引，旧的 `is_deleted <> 1` 写法）
+- 执行全部迁移（热点索引，`is_deleted = 0` 写法）
+两个数据库上运行首页、项目页与按文件名查记录的查询，报告查询计划与耗时（多次取最优）。
+首页计数改为读取计数表，见 bench_stats_store。
+
+用法: python benchmarks/bench_hot_queries.py [记录数] [重复次数]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import closing
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+from app.core import migrations
+from app.core.database import connect
+
+QUERIES = {
+    "recent records": (
+        "SELECT r.id, r.name, r.create_on, p.name FROM records r LEFT JOIN projects p ON r.project_id = p.id "
+        "WHERE r.is_deleted {live} ORDER BY r.id DESC LIMIT 8", ()),
+    "project records": (
+        "SELECT r.id, r.name, r.create_on, p.name FROM records r LEFT JOIN projects p ON r.project_id = p.id "
+        "WHERE r.is_deleted {live} AND r.project_id = ? ORDER BY r.id DESC", (7,)),
+    "record by name": (
+        "SELECT id FROM records WHERE name = ? AND is_deleted {live} ORDER BY id DESC LIMIT 1", ("case_123457.xmind",)),
+}
+
+
+def build(path, count, versions):
+    directory = tempfile.mkdtemp()
+    for version, _, migration in migrations.list_migrations():
+        if version in versions:
+            shutil.copy(migration, directory)
+    with closing(connect(path)) as db:
+        migrations.migrate(db, directory)
+        db.execute("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 50) "
+                   "INSERT INTO projects (name, create_on) SELECT 'project ' || i, '2020-01-01' FROM n")
+        db.execute("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?) "
+                   "INSERT INTO records (name, create_on, project_id, is_deleted) "
+                   "SELECT 'case_' || i || '.xmind', DATE('2020-01-01', '+' || (i % 2000) || ' days') || "
+                   "'T10:00:00+08:00', i % 50 + 1, i % 10 = 0 FROM n", (count,))
+        db.commit()
+        db.execute("ANALYZE")
+    shutil.rmtree(directory)
+
+
+def best_of(db, sql, params, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        db.execute(sql, params).fetchall()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    directory = tempfile.mkdtemp()
+    setups = {
+        "baseline": ({1}, "<> 1"),
+        "indexed": ({version for version, _, _ in migrations.list_migrations()}, "= 0"),
+    }
+
+    results = {}
+    for name, (versions, live) in setups.items():
+        path = os.path.join(directory, name + ".db3")
+        start = time.perf_counter()
+        build(path, count, versions)
+        print(f"{name}: {count} records built in {time.perf_counter() - start:.1f}s")
+        with closing(connect(path)) as db:
+            for query, (sql, params) in QUERIES.items():
+                sql = sql.format(live=live)
+                plan = "; ".join(row[3] for row in db.execute("EXPLAIN QUERY PLAN " + sql, params))
+                results.setdefault(query, {})[name] = (best_of(db, sql, params, repeat), plan)
+
+    print(f"{'query':<17}{'baseline (ms)':>14}{'indexed (ms)':>14}  plan (indexed)")
+    for query, timings in results.items():
+        print(f"{query:<17}{timings['baseline'][0] * 1000:>14.2f}{timings['indexed'][0] * 1000:>14.2f}  "
+              f"{timings['indexed'][1]}")
+    shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
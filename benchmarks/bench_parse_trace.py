@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+解析器追踪开销基准测试
+
+将 docs/ 下的示例 XMind 按模块复制放大后，比较：
+- tracing 关闭（默认）：不构建任何调试载荷
+- tracing 开启：为每个 sheet/suite/case/step 构建 to_dict() 载荷，相当于旧版无条件的 logging.debug 参数
+
+用法: python benchmarks/bench_parse_trace.py [放大倍数] [重复次数]
+"""
+import copy
+import sys
+import time
+from pathlib import Path
+
+root = Path(__file__).parent.parent
+sys.path.insert(0, str(root / "app" / "lib"))
+
+import xmind
+from xmind2testcase.parser import xmind_to_testsuites
+from xmind2testcase.trace import tracer
+
+SAMPLES = ["xmind_testcase_template_v1.1.xmind", "zentao_testcase_template.xmind"]
+
+
+def scaled_workbook(path, scale):
+    sheets = xmind.load(str(path)).getData()
+    for sheet in sheets:
+        topic = sheet["topic"]
+        topic["topics"] = topic.get("topics", []) * scale
+    return sheets
+
+
+def count_cases(suites):
+    return sum(len(s.testcase_list) for suite in suites for s in suite.sub_suites)
+
+
+def timed_parse(workbook, repeat):
+    best = None
+    cases = 0
+    for _ in range(repeat):
+        data = copy.deepcopy(workbook)  # the parser filters topics in place
+        start = time.perf_counter()
+        suites = xmind_to_testsuites(data)
+        elapsed = time.perf_counter() - start
+        cases = count_cases(suites)
+        best = elapsed if best is None else min(best, elapsed)
+    return best, cases
+
+
+def main():
+    scale = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    print(f"{'sample':<40}{'cases':>8}{'traced (s)':>12}{'untraced (s)':>14}{'speedup':>9}")
+    for name in SAMPLES:
+        workbook = scaled_workbook(root / "docs" / name, scale)
+
+        tracer.reset()
+        tracer.enable(max_events=1)
+        traced, cases = timed_parse(workbook, repeat)
+        tracer.disable()
+
+        untraced, _ = timed_parse(workbook, repeat)
+        print(f"{name:<40}{cases:>8}{traced:>12.3f}{untraced:>14.3f}{traced / untraced:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
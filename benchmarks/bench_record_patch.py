@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+用例按条修改基准测试
+
+将 docs/ 下示例 XMind 的用例复制放大到指定数量，存入同一条记录，模拟预览页点一次步骤状态后的保存：
+- put：旧实现，发送全部用例，服务端用 save_testcases 重写整条记录
+- patch：发送一条 set_step 操作，服务端用 apply_ops 只改这一条用例
+
+报告请求体大小与服务端处理耗时（解析请求体 + 写入 + 提交，多次取最优）。
+
+用法: python benchmarks/bench_record_patch.py [用例数] [重复次数]
+"""
+import json
+import sys
+import tempfile
+import time
+from contextlib import closing
+from pathlib import Path
+
+root = Path(__file__).parent.parent
+sys.path.insert(0, str(root))
+sys.path.insert(0, str(root / "app" / "lib"))
+
+from app.core import database
+from app.core.config import settings
+from app.services import file_service, testcase_store
+from bench_testcase_store import scaled_testcases
+
+
+def best_of(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    testcases = scaled_testcases(count)
+
+    settings.DATABASE_PATH = tempfile.mktemp(suffix=".db3")
+    database.init_db()
+    with closing(database.connect()) as db:
+        record_id = file_service.insert_record(db, "patch.xmind", testcases=testcases)
+        case = next(i for i in range(count // 2, count) if testcases[i]["steps"])
+        state = {"status": "pass"}
+
+        def body(kind):
+            state["status"] = "fail" if state["status"] == "pass" else "pass"
+            testcases[case]["steps"][0]["status"] = state["status"]
+            version = testcase_store.record_version(db, record_id)
+            if kind == "put":
+                return json.dumps({"content": testcases, "version": version})
+            return json.dumps({"version": version, "ops": [
+                {"op": "set_step", "case": case, "step": 0, "field": "status", "value": state["status"]}]})
+
+        def put():
+            update = json.loads(body("put"))
+            testcase_store.save_testcases(db, record_id, update["content"], base_version=update["version"])
+            db.commit()
+
+        def patch():
+            update = json.loads(body("patch"))
+            testcase_store.apply_ops(db, record_id, update["version"], update["ops"])
+            db.commit()
+
+        print(f"{count} cases, one step status changed")
+        print(f"{'save':<8}{'body (KB)':>12}{'time (s)':>10}")
+        for name, func in (("put", put), ("patch", patch)):
+            size = len(body(name).encode("utf-8")) / 1024
+            print(f"{name:<8}{size:>12.1f}{best_of(func, repeat):>10.4f}")
+        assert testcase_store.load_testcases(db, record_id) == testcases
+
+
+if __name__ == "__main__":
+    main()
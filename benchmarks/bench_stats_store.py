@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+写入时维护的统计表基准测试
+
+- 首页计数：生成指定数量的记录（同 bench_hot_queries），比较按 `DATE(create_on)` 扫描 records 的
+  旧查询与读取 daily_record_counts / project_record_counts 计数表的耗时
+- 记录统计：将示例用例放大到指定数量存入一条记录，比较按用例表 GROUP BY 统计与读取 record_stats 的耗时
+
+多次取最优。
+
+用法: python benchmarks/bench_stats_store.py [记录数] [用例数] [重复次数]
+"""
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import closing
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+sys.path.insert(0, os.path.join(root, "app", "lib"))
+
+from app.core import database, migrations
+from app.core.config import settings
+from app.services import file_service, stats_store, testcase_store
+from bench_hot_queries import best_of, build
+from bench_testcase_store import best_of as best_call, scaled_testcases
+
+TODAY, WEEK_AGO = "2024-06-01", "2024-05-25"
+OLD_COUNTS = [
+    ("SELECT COUNT(*) FROM records WHERE DATE(create_on) = ?", (TODAY,)),
+    ("SELECT COUNT(*) FROM records WHERE DATE(create_on) >= ?", (WEEK_AGO,)),
+    ("SELECT COUNT(*) FROM records", ()),
+]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    cases = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    repeat = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    directory = tempfile.mkdtemp()
+
+    # records written before the counters, then counted by the statistics migration
+    path = os.path.join(directory, "records.db3")
+    build(path, count, {version for version, _, _ in migrations.list_migrations() if version < 6})
+    with closing(database.connect(path)) as db:
+        # timed with the DATE(create_on) index they had before the counters
+        old = sum(best_of(db, sql, params, repeat) for sql, params in OLD_COUNTS)
+        migrations.migrate(db)
+        new = best_call(lambda: (stats_store.created_count(db, day=TODAY), stats_store.created_count(db, since=WEEK_AGO),
+                                 stats_store.created_count(db)), repeat)
+        assert [db.execute(sql, params).fetchone()[0] for sql, params in OLD_COUNTS] == [
+            stats_store.created_count(db, day=TODAY), stats_store.created_count(db, since=WEEK_AGO),
+            stats_store.created_count(db)]
+    print(f"index page counts, {count} records: {old * 1000:.2f} ms -> {new * 1000:.3f} ms")
+
+    settings.DATABASE_PATH = os.path.join(directory, "cases.db3")
+    database.init_db()
+    with closing(database.connect()) as db:
+        record_id = file_service.insert_record(db, "stats.xmind", testcases=scaled_testcases(cases))
+        assert testcase_store._count_stats(db, record_id) == stats_store.load_record_stats(db, record_id)
+        old = best_call(lambda: testcase_store._count_stats(db, record_id), repeat)
+        new = best_call(lambda: stats_store.load_record_stats(db, record_id), repeat)
+    print(f"record stats, {cases} cases: {old * 1000:.2f} ms -> {new * 1000:.3f} ms")
+    shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+用例表存储基准测试
+
+将 docs/ 下示例 XMind 的用例复制放大到指定数量，存入同一条记录，比较：
+- blob：旧实现，records.content 中的整段 JSON，任何读取都要 json.loads 全部用例
+- tables：testcase_store，testcases / test_steps 表按行读取
+
+报告读取全部用例、按下标选取 3 条用例、按模块筛选以及统计结果的耗时（多次取最优）。
+
+用法: python benchmarks/bench_testcase_store.py [用例数] [重复次数]
+"""
+import gc
+import json
+import sys
+import tempfile
+import time
+from contextlib import closing
+from pathlib import Path
+
+root = Path(__file__).parent.parent
+sys.path.insert(0, str(root))
+sys.path.insert(0, str(root / "app" / "lib"))
+
+from app.core import database
+from app.core.config import settings
+from app.services import file_service, report_service, testcase_store
+from xmind2testcase.utils import get_xmind_testcase_list
+
+SAMPLE = "xmind_testcase_template_v1.1.xmind"
+SELECTED = [7, 1234, 42]
+
+
+def scaled_testcases(count):
+    template = get_xmind_testcase_list(str(root / "docs" / SAMPLE))
+    testcases = []
+    while len(testcases) < count:
+        n = len(testcases)
+        for case in template[:count - n]:
+            steps = [dict(step, actions=f"{step['actions']} {n}") for step in case["steps"]]
+            testcases.append(dict(case, name=f"{case['name']} {n}", suite=f"{case['suite']} {n // 1000}", steps=steps))
+    return testcases
+
+
+def best_of(func, repeat):
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    testcases = scaled_testcases(count)
+    suite = testcases[count // 2]["suite"]
+
+    settings.DATABASE_PATH = tempfile.mktemp(suffix=".db3")
+    database.init_db()
+    with closing(database.connect()) as db:
+        blob_id = file_service.insert_record(db, "blob.xmind", content=json.dumps(testcases), testcases=None)
+        db.execute("UPDATE records SET content = ? WHERE id = ?", (json.dumps(testcases), blob_id))
+        db.execute("DELETE FROM test_steps WHERE record_id = ?", (blob_id,))
+        db.execute("DELETE FROM testcases WHERE record_id = ?", (blob_id,))
+        db.commit()
+        start = time.perf_counter()
+        table_id = file_service.insert_record(db, "tables.xmind", testcases=testcases)
+        save_time = time.perf_counter() - start
+
+        def blob():
+            content = db.execute("SELECT content FROM records WHERE id = ?", (blob_id,)).fetchone()[0]
+            return json.loads(content)
+
+        reads = {
+            "all cases": (blob, lambda: testcase_store.load_testcases(db, table_id)),
+            "3 selected": (lambda: [cases[i] for cases in [blob()] for i in SELECTED],
+                           lambda: testcase_store.load_testcases(db, table_id, ordinals=SELECTED)),
+            "one suite": (lambda: [case for case in blob() if case["suite"] == suite],
+                          lambda: testcase_store.load_testcases(db, table_id, suite=suite)),
+            "stats": (lambda: report_service.record_stats(blob()),
+                      lambda: testcase_store.record_stats(db, table_id)),
+        }
+
+        print(f"{count} cases, {sum(len(case['steps']) for case in testcases)} steps, saved in {save_time:.3f}s")
+        print(f"{'read':<12}{'blob (s)':>10}{'tables (s)':>12}")
+        for name, (old, new) in reads.items():
+            assert old() == new()
+            print(f"{name:<12}{best_of(old, repeat):>10.4f}{best_of(new, repeat):>12.4f}")
+
+
+if __name__ == "__main__":
+    main()
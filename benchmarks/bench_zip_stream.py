@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+流式 ZIP 基准测试
+
+为合成的大型用例集生成下载包，比较：
+- buffered：旧实现，先把 content.json 整个 json.dumps，再把整个压缩包写进 BytesIO，之后才能开始响应
+- streamed：zipstream.iter_zip，条目边生成边压缩，数据描述符紧随数据写出，逐块交给响应
+
+每种实现在独立子进程中运行，报告峰值 RSS 增量（相对于构建好输入之后）和首字节时间（TTFB）。
+场景：xmind（writer 生成的 XMind 文件）与 all（XMind + TestLink XML + JSON，对应 /api/download-all）。
+
+用法: python benchmarks/bench_zip_stream.py [用例数]
+"""
+import json
+import resource
+import subprocess
+import sys
+import time
+import zipfile
+from io import BytesIO
+from pathlib import Path
+
+root = Path(__file__).parent.parent
+sys.path.insert(0, str(root / "app" / "lib"))
+
+from xmind2testcase import utils, writer
+from xmind2testcase.metadata import TestSuite, TestCase, TestStep
+from xmind2testcase.testlink import iter_testlink_xml
+from xmind2testcase.zipstream import iter_zip
+
+MODES = ["buffered", "streamed"]
+SCENARIOS = ["xmind", "all"]
+
+
+def build_testsuites(cases):
+    suites = []
+    for s in range(max(cases // 100, 1)):
+        testcases = []
+        for c in range(min(cases, 100)):
+            steps = [TestStep(step_number=i, actions=f"打开页面 {s}-{c}-{i} 并输入数据",
+                              expectedresults=f"页面 {s}-{c}-{i} 显示正确的结果") for i in range(1, 4)]
+            testcases.append(TestCase(name=f"模块 {s} - 用例 {c}", summary=f"用例 {c}", preconditions="已登录",
+                                      importance=c % 3 + 1, execution_type=1, steps=steps))
+        suites.append(TestSuite(name=f"模块 {s}", testcase_list=testcases))
+    return [TestSuite(name="Benchmark", sub_suites=suites)]
+
+
+def buffered_xmind(testsuites):
+    """the implementation before streaming: whole document string, whole archive in memory"""
+    out = BytesIO()
+    with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('content.json', json.dumps(writer.get_xmind_zen_content(testsuites)))
+        zf.writestr('manifest.json', json.dumps(writer.MANIFEST))
+        zf.writestr('metadata.json', json.dumps({}))
+    out.seek(0)
+    return out
+
+
+def buffered_all(testsuites):
+    testcases = utils.testsuites_to_testcase_list(testsuites)
+    out = BytesIO()
+    with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('case.xmind', buffered_xmind(testsuites).getvalue())
+        zf.writestr('case.xml', ''.join(iter_testlink_xml(testsuites)))
+        zf.writestr('case.json', json.dumps(testcases, indent=4, ensure_ascii=False))
+    out.seek(0)
+    return iter(lambda: out.read(64 * 1024), b'')
+
+
+def streamed_all(testsuites):
+    testcases = utils.testsuites_to_testcase_list(testsuites)
+    return iter_zip([
+        ('case.xmind', writer.iter_xmind_zip(testsuites)),
+        ('case.xml', writer.encode_chunks(iter_testlink_xml(testsuites))),
+        ('case.json', writer.encode_chunks(utils.iter_json_chunks(testcases, indent=4, ensure_ascii=False))),
+    ])
+
+
+def producer(scenario, mode, testsuites):
+    if scenario == "xmind":
+        if mode == "buffered":
+            out = buffered_xmind(testsuites)
+            return iter(lambda: out.read(64 * 1024), b'')
+        return writer.iter_xmind_zip(testsuites)
+    return buffered_all(testsuites) if mode == "buffered" else streamed_all(testsuites)
+
+
+def max_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run(scenario, mode, cases):
+    """one measurement, in a fresh process: prints rss delta (KB), ttfb (s), total (s), size (bytes)"""
+    testsuites = build_testsuites(cases)
+    baseline = max_rss_kb()
+
+    start = time.perf_counter()
+    ttfb = None
+    size = 0
+    for chunk in producer(scenario, mode, testsuites):
+        if ttfb is None:
+            ttfb = time.perf_counter() - start
+        size += len(chunk)  # sent and dropped, like a response body
+    total = time.perf_counter() - start
+    print(json.dumps([max_rss_kb() - baseline, ttfb, total, size]))
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--run":
+        run(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+        return
+
+    cases = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(f"{cases} cases")
+    print(f"{'scenario':<10}{'mode':<10}{'peak rss +MB':>14}{'ttfb (s)':>10}{'total (s)':>11}{'size MB':>9}")
+    for scenario in SCENARIOS:
+        for mode in MODES:
+            output = subprocess.run([sys.executable, __file__, "--run", scenario, mode, str(cases)],
+                                    check=True, capture_output=True, text=True).stdout
+            rss, ttfb, total, size = json.loads(output)
+            print(f"{scenario:<10}{mode:<10}{rss / 1024:>14.1f}{ttfb:>10.3f}{total:>11.3f}{size / 1024 / 1024:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
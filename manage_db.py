@@ -26,11 +26,8 @@ def init_db():
             return
         os.remove(settings.DATABASE_PATH)
     
-    conn = get_db()
-    with open(settings.SCHEMA_PATH, 'r', encoding='utf-8') as f:
-        conn.executescript(f.read())
-    conn.commit()
-    conn.close()
+    from app.core.database import init_db as migrate_db
+    migrate_db()
     print(f"✅ 数据库已初始化: {settings.DATABASE_PATH}")
 
 def clear_records():
@@ -42,9 +39,14 @@ def clear_records():
     
     conn = get_db()
     c = conn.cursor()
+    c.execute("DELETE FROM test_steps")
+    c.execute("DELETE FROM testcases")
+    c.execute("DELETE FROM record_stats")
+    c.execute("DELETE FROM daily_record_counts")
+    c.execute("DELETE FROM project_record_counts")
     c.execute("DELETE FROM records")
-    conn.commit()
     count = c.rowcount
+    conn.commit()
     conn.close()
     print(f"✅ 已删除 {count} 条记录")
 
@@ -57,6 +59,11 @@ def clear_projects():
     
     conn = get_db()
     c = conn.cursor()
+    c.execute("DELETE FROM test_steps")
+    c.execute("DELETE FROM testcases")
+    c.execute("DELETE FROM record_stats")
+    c.execute("DELETE FROM daily_record_counts")
+    c.execute("DELETE FROM project_record_counts")
     c.execute("DELETE FROM records")
     c.execute("DELETE FROM projects")
     conn.commit()
@@ -73,9 +80,15 @@ def show_stats():
     project_count = c.fetchone()[0]
     
     # 记录统计
-    c.execute("SELECT COUNT(*) FROM records WHERE is_deleted <> 1")
+    c.execute("SELECT COUNT(*) FROM records WHERE is_deleted = 0")
     record_count = c.fetchone()[0]
     
+    # 用例统计
+    c.execute("SELECT COUNT(*) FROM testcases")
+    testcase_count = c.fetchone()[0]
+    c.execute("SELECT COUNT(*) FROM test_steps")
+    step_count = c.fetchone()[0]
+    
     # 数据库大小
     db_size = os.path.getsize(settings.DATABASE_PATH) / 1024 / 1024
     
@@ -86,6 +99,7 @@ def show_stats():
     print("="*50)
     print(f"项目数量: {project_count}")
     print(f"记录数量: {record_count}")
+    print(f"用例数量: {testcase_count}（步骤 {step_count}）")
     print(f"数据库大小: {db_size:.2f} MB")
     print(f"数据库路径: {settings.DATABASE_PATH}")
     print("="*50 + "\n")
@@ -104,6 +118,17 @@ def backup_db():
     shutil.copy2(settings.DATABASE_PATH, backup_path)
     print(f"✅ 数据库已备份到: {backup_path}")
 
+def normalize_records():
+    """将旧记录的 JSON 用例列表迁移到用例表，并补齐记录的用例统计"""
+    from contextlib import closing
+    from app.core.database import connect, init_db as migrate_db
+    from app.services import testcase_store
+
+    migrate_db()
+    with closing(connect()) as conn:
+        count = testcase_store.normalize_records(conn)
+    print(f"✅ 已迁移 {count} 条记录的用例")
+
 def main():
     """主菜单"""
     while True:
@@ -115,10 +140,11 @@ def main():
         print("3. 清空所有项目")
         print("4. 显示统计信息")
         print("5. 备份数据库")
+        print("6. 迁移旧记录用例到用例表")
         print("0. 退出")
         print("="*50)
         
-        choice = input("\n请选择操作 (0-5): ").strip()
+        choice = input("\n请选择操作 (0-6): ").strip()
         
         if choice == '1':
             init_db()
@@ -130,6 +156,8 @@ def main():
             show_stats()
         elif choice == '5':
             backup_db()
+        elif choice == '6':
+            normalize_records()
         elif choice == '0':
             print("👋 再见！")
             break
@@ -0,0 +1,43 @@
+-- Baseline: the schema databases were created with before versioned migrations.
+-- Written with IF NOT EXISTS / OR IGNORE so databases created from the old schema.sql are adopted as they are.
+
+CREATE TABLE IF NOT EXISTS projects (
+  id integer primary key autoincrement,
+  name text not null,
+  description text,
+  create_on text,
+  is_deleted integer DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS records (
+  id integer primary key autoincrement,
+  project_id integer,
+  name text not null,
+  content text,
+  create_on text not null,
+  note text,
+  case_type text,
+  apply_phase text,
+  is_deleted integer DEFAULT 0,
+  foreign key(project_id) references projects(id)
+);
+
+CREATE TABLE IF NOT EXISTS configs (
+  key text primary key,
+  value text
+);
+
+INSERT OR IGNORE INTO configs (key, value) VALUES ('case_types', '功能测试,接口测试,性能测试,安全测试,配置相关,安装卸载,单元测试,其他');
+INSERT OR IGNORE INTO configs (key, value) VALUES ('apply_phases', '单元测试阶段,功能测试阶段,集成测试阶段,系统测试阶段,验收测试阶段,冒烟测试阶段');
+INSERT OR IGNORE INTO configs (key, value) VALUES ('projects', '默认项目');
+INSERT OR IGNORE INTO configs (key, value) VALUES ('enable_zentao', '1');
+INSERT OR IGNORE INTO configs (key, value) VALUES ('enable_testlink', '1');
+
+-- Automation Configuration Table
+CREATE TABLE IF NOT EXISTS automation_configs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    project_id INTEGER NOT NULL UNIQUE,
+    playwright_project_path TEXT,
+    execution_params TEXT, -- JSON string for extra params
+    FOREIGN KEY(project_id) REFERENCES projects(id)
+);
@@ -0,0 +1,15 @@
+"""
+records.content_hash: opaque change token of the test cases of a record, which export cache keys are built from.
+
+It starts as the SHA-256 of the cases and is chained from the previous token by partial edits,
+so it changes with the cases but is not a hash that can be recomputed from them.
+
+`records.content` now only holds the JSON list of records whose cases are not in the testcases table.
+Databases upgraded before versioned migrations may have the column already.
+"""
+
+
+def upgrade(db):
+    columns = {row[1] for row in db.execute("PRAGMA table_info(records)")}
+    if 'content_hash' not in columns:
+        db.execute("ALTER TABLE records ADD COLUMN content_hash text")
@@ -0,0 +1,57 @@
+-- Normalized test cases of records, one row per case and per step.
+-- `data` holds the case (or step) dict as JSON, with an empty `steps` list standing for the step rows;
+-- the other columns are indexed copies of the fields filters and statistics read.
+
+CREATE TABLE IF NOT EXISTS testcases (
+    id INTEGER PRIMARY KEY,
+    record_id INTEGER NOT NULL,
+    ordinal INTEGER NOT NULL,
+    suite TEXT,
+    name TEXT,
+    priority INTEGER,
+    result TEXT,
+    execution_type INTEGER,
+    tc_id TEXT,
+    step_count INTEGER, -- NULL when `steps` is not a list and stays in `data` as is
+    data TEXT NOT NULL,
+    FOREIGN KEY(record_id) REFERENCES records(id)
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_testcases_record_ordinal ON testcases(record_id, ordinal);
+CREATE INDEX IF NOT EXISTS idx_testcases_record_suite ON testcases(record_id, suite);
+CREATE INDEX IF NOT EXISTS idx_testcases_record_priority ON testcases(record_id, priority);
+CREATE INDEX IF NOT EXISTS idx_testcases_record_result ON testcases(record_id, result);
+CREATE INDEX IF NOT EXISTS idx_testcases_record_execution_type ON testcases(record_id, execution_type);
+CREATE INDEX IF NOT EXISTS idx_testcases_tc_id ON testcases(tc_id);
+
+CREATE TABLE IF NOT EXISTS test_steps (
+    id INTEGER PRIMARY KEY,
+    testcase_id INTEGER NOT NULL,
+    record_id INTEGER NOT NULL,
+    ordinal INTEGER NOT NULL,
+    status TEXT,
+    result TEXT,
+    execution_type INTEGER,
+    data TEXT NOT NULL,
+    FOREIGN KEY(testcase_id) REFERENCES testcases(id),
+    FOREIGN KEY(record_id) REFERENCES records(id)
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_test_steps_testcase_ordinal ON test_steps(testcase_id, ordinal);
+CREATE INDEX IF NOT EXISTS idx_test_steps_record_status ON test_steps(record_id, status);
+CREATE INDEX IF NOT EXISTS idx_test_steps_record_result ON test_steps(record_id, result);
+
+-- Compatibility views: each case as the dict the `records.content` list used to hold, and the whole list
+CREATE VIEW IF NOT EXISTS testcase_documents AS
+SELECT t.id AS testcase_id, t.record_id, t.ordinal,
+       CASE WHEN t.step_count IS NULL THEN t.data
+            ELSE json_set(t.data, '$.steps', (
+                SELECT json_group_array(json(s.data))
+                FROM (SELECT data FROM test_steps WHERE testcase_id = t.id ORDER BY ordinal) s))
+       END AS document
+FROM testcases t;
+
+CREATE VIEW IF NOT EXISTS record_contents AS
+SELECT record_id, json_group_array(json(document)) AS content
+FROM (SELECT record_id, document FROM testcase_documents ORDER BY record_id, ordinal)
+GROUP BY record_id;
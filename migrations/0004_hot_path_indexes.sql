@@ -0,0 +1,10 @@
+-- Indexes of the hot queries: recent and project record lists, record lookup by file name,
+-- the per-day counts of the index page and the project lists. Live rows are `is_deleted = 0`.
+
+CREATE INDEX IF NOT EXISTS idx_records_live ON records(is_deleted, id);
+CREATE INDEX IF NOT EXISTS idx_records_project ON records(project_id, is_deleted, id);
+CREATE INDEX IF NOT EXISTS idx_records_name ON records(name, is_deleted);
+CREATE INDEX IF NOT EXISTS idx_records_create_date ON records(DATE(create_on));
+
+CREATE INDEX IF NOT EXISTS idx_projects_live ON projects(is_deleted, id);
+CREATE INDEX IF NOT EXISTS idx_projects_name ON projects(name, is_deleted);
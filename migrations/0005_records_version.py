@@ -0,0 +1,12 @@
+"""
+records.version: edit counter of the test cases of a record.
+
+Every save of the cases moves it to the next number, and an edit based on an older
+number is refused instead of overwriting the changes made since (optimistic locking).
+"""
+
+
+def upgrade(db):
+    columns = {row[1] for row in db.execute("PRAGMA table_info(records)")}
+    if 'version' not in columns:
+        db.execute("ALTER TABLE records ADD COLUMN version integer NOT NULL DEFAULT 0")
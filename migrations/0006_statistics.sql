@@ -0,0 +1,33 @@
+-- Statistics maintained when records are written, so dashboards and reports read them instead of
+-- counting records or test cases (see app/services/stats_store.py).
+-- `day` is the date part of `records.create_on`, the local date it was written on;
+-- records without a project count under project_id 0.
+
+CREATE TABLE IF NOT EXISTS daily_record_counts (
+    day TEXT NOT NULL,
+    project_id INTEGER NOT NULL,
+    created INTEGER NOT NULL DEFAULT 0,
+    deleted INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, project_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS project_record_counts (
+    project_id INTEGER PRIMARY KEY,
+    created INTEGER NOT NULL DEFAULT 0,
+    deleted INTEGER NOT NULL DEFAULT 0
+);
+
+-- case, step and suite aggregates of a record as JSON, see report_service.record_stats
+CREATE TABLE IF NOT EXISTS record_stats (
+    record_id INTEGER PRIMARY KEY,
+    data TEXT NOT NULL,
+    FOREIGN KEY(record_id) REFERENCES records(id)
+);
+
+INSERT INTO daily_record_counts (day, project_id, created, deleted)
+SELECT substr(create_on, 1, 10), COALESCE(project_id, 0), COUNT(*), SUM(is_deleted = 1)
+FROM records GROUP BY 1, 2;
+
+INSERT INTO project_record_counts (project_id, created, deleted)
+SELECT COALESCE(project_id, 0), COUNT(*), SUM(is_deleted = 1)
+FROM records GROUP BY 1;
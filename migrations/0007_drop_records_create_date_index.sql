@@ -0,0 +1,5 @@
+-- The per-day counts of the index page are read from daily_record_counts since 0006, which
+-- backfills with substr(create_on, 1, 10): nothing queries DATE(create_on) anymore, so the index
+-- from 0004 only costs every record insert.
+
+DROP INDEX IF EXISTS idx_records_create_date;
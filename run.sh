@@ -55,14 +55,10 @@ init_project() {
     print_info "同步依赖包..."
     uv sync
     
-    # 初始化数据库
-    if [ ! -f "data.db3" ]; then
-        print_info "初始化数据库..."
-        sqlite3 data.db3 < schema.sql
-        print_success "数据库已初始化"
-    else
-        print_warning "数据库已存在，跳过初始化"
-    fi
+    # 初始化数据库（已有数据库则执行尚未执行的迁移）
+    print_info "初始化数据库..."
+    uv run python -c "from app.core.database import init_db; init_db()"
+    print_success "数据库已是最新版本"
     
     print_success "项目初始化完成"
 }
@@ -8,9 +8,28 @@ from pathlib import Path
 # 添加项目根目录到 Python 路径
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
+# xmind2testcase 与 xmindparser 以顶层包方式互相导入
+sys.path.insert(0, str(project_root / "app" / "lib"))
 
 @pytest.fixture
-def app():
+def isolated_settings(tmp_path, monkeypatch):
+    """数据库与上传目录指向临时目录，并初始化数据库"""
+    from app.core.config import settings
+    from app.core.database import init_db
+    from app.services.export_cache import export_cache
+    from app.services.parse_cache import parse_cache
+
+    upload_folder = tmp_path / "uploads"
+    upload_folder.mkdir()
+    monkeypatch.setattr(settings, "DATABASE_PATH", str(tmp_path / "data.db3"))
+    monkeypatch.setattr(settings, "UPLOAD_FOLDER", str(upload_folder))
+    monkeypatch.setattr(parse_cache, "disk_dir", str(upload_folder / ".parse_cache"))
+    monkeypatch.setattr(export_cache, "cache_dir", str(upload_folder / ".exports"))
+    init_db()
+    return settings
+
+@pytest.fixture
+def app(isolated_settings):
     """FastAPI 应用实例"""
     from app.main import create_app
     return create_app()
@@ -25,3 +44,8 @@ def client(app):
 def sample_xmind_file():
     """示例 XMind 文件路径"""
     return project_root / "docs" / "xmind_testcase_template.xmind"
+
+@pytest.fixture
+def zen_xmind_file():
+    """XMind Zen 格式的示例文件路径"""
+    return project_root / "app" / "static" / "guide" / "XMind测试用例模板.xmind"
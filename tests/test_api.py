@@ -25,3 +25,23 @@ def test_static_files(client):
     """测试静态文件访问"""
     response = client.get("/static/css/style.css")
     assert response.status_code in [200, 404]  # 404 if file doesn't exist yet
+
+def test_testlink_download_is_streamed(client, isolated_settings, sample_xmind_file):
+    """TestLink XML 直接流式写入响应，不生成临时文件"""
+    import shutil
+    from pathlib import Path
+    from xml.etree import ElementTree
+
+    upload_folder = Path(isolated_settings.UPLOAD_FOLDER)
+    shutil.copy(sample_xmind_file.parent / "xmind_testcase_template_v1.1.xmind", upload_folder / "case.xmind")
+
+    response = client.get("/case.xmind/to/testlink")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/xml")
+    assert "case.xml" in response.headers["content-disposition"]
+
+    root = ElementTree.fromstring(response.content)
+    assert root.tag == "testsuite" and root.find("testsuite/testsuite/testcase") is not None
+    assert not (upload_folder / "case.xml").exists()
+
+    assert client.get("/missing.xmind/to/testlink").status_code == 404
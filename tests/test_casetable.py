@@ -0,0 +1,73 @@
+"""
+列式用例表测试
+"""
+import shutil
+from pathlib import Path
+
+import pytest
+
+from xmind2testcase.casetable import CaseTable
+from xmind2testcase.metadata import TestCase
+from xmind2testcase.testlink import xmind_to_testlink_xml_file
+from xmind2testcase import utils
+from xmind2testcase.utils import get_xmind_case_table, get_xmind_testsuites
+from xmind2testcase.zentao import xmind_to_zentao_csv_file
+
+docs_dir = Path(__file__).parent.parent / "docs"
+
+
+@pytest.fixture(params=["zen", "legacy"])
+def xmind_file(request, zen_xmind_file):
+    return str(zen_xmind_file if request.param == "zen" else docs_dir / "xmind_testcase_template_v1.1.xmind")
+
+
+def test_metadata_is_slotted():
+    case = TestCase(name="a")
+    assert not hasattr(case, "__dict__")
+    case.labels = ["x"]
+    with pytest.raises(AttributeError):
+        case.sheet_name = "s"
+
+
+def test_rows_match_to_dict(xmind_file):
+    testsuites = get_xmind_testsuites(xmind_file)
+    table = get_xmind_case_table(xmind_file)
+    expected = utils.testsuites_to_testcase_list(testsuites)
+
+    assert len(table) == len(expected)
+    assert table.to_testcase_list() == expected
+    assert [dict(row, steps=[s.to_dict() for s in row.steps]) for row in table] == expected
+    assert table[-1] == expected[-1]
+    assert [s.to_dict() for s in table.to_testsuites()] == [s.to_dict() for s in testsuites]
+
+
+def test_from_testcase_list_round_trip(xmind_file):
+    testcases = get_xmind_case_table(xmind_file).to_testcase_list()
+    table = CaseTable.from_testcase_list(testcases)
+    assert table.to_testcase_list() == testcases
+    assert table.step_count == sum(len(c["steps"]) for c in testcases)
+
+
+def test_strings_are_interned():
+    cases = [{"name": "n" + str(i), "suite": "S", "product": "P", "importance": i % 3 + 1,
+              "steps": [{"step_number": 1, "actions": "".join(["open", " page"]), "expectedresults": "ok"}]}
+             for i in range(3)]
+    table = CaseTable.from_testcase_list(cases)
+    actions = [row.steps[0].actions for row in table]
+    assert actions[0] is actions[1] is actions[2]
+    assert [row.importance for row in table] == [1, 2, 3]
+    assert table[0]["suite"] == "S" and table[2].product == "P"
+
+
+def test_exporters_consume_table(tmp_path, xmind_file):
+    target = tmp_path / "case.xmind"
+    shutil.copy(xmind_file, target)
+    target = str(target)
+
+    expected_csv = Path(xmind_to_zentao_csv_file(target)).read_bytes()
+    expected_xml = Path(xmind_to_testlink_xml_file(target)).read_bytes()
+    Path(target[:-6] + ".xml").unlink()
+
+    table = get_xmind_case_table(target)
+    assert Path(xmind_to_zentao_csv_file(target, testcases=table)).read_bytes() == expected_csv
+    assert Path(xmind_to_testlink_xml_file(target, testsuites=table)).read_bytes() == expected_xml
@@ -0,0 +1,74 @@
+"""
+命令行批量转换测试
+"""
+import shutil
+from pathlib import Path
+
+import pytest
+
+from xmind2testcase import cli
+
+docs_dir = Path(__file__).parent.parent / "docs"
+
+
+@pytest.fixture
+def workbooks(tmp_path):
+    nested = tmp_path / "nested"
+    nested.mkdir()
+    for i, f in enumerate(sorted(docs_dir.glob("*.xmind"))):
+        shutil.copy(f, (nested if i % 2 else tmp_path) / f.name)
+    return tmp_path
+
+
+def test_find_xmind_files(workbooks):
+    every = cli.find_xmind_files([str(workbooks)])
+    assert len(every) == len(list(docs_dir.glob("*.xmind")))
+    top_level = cli.find_xmind_files([str(workbooks / "*.xmind"), str(workbooks / "missing.xmind")])
+    assert top_level and set(top_level) < set(every)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_batch_convert_writes_every_format_once(workbooks, workers):
+    (workbooks / "broken.xmind").write_bytes(b"not a zip")
+
+    summary = cli.batch_convert([str(workbooks)], workers=workers)
+    assert summary["files"] == len(list(docs_dir.glob("*.xmind")))
+    assert list(summary["failures"]) == [str(workbooks / "broken.xmind")]
+    assert summary["cases"] > 0 and summary["cases_per_second"] > 0
+
+    for xmind_file in workbooks.rglob("*.xmind"):
+        if xmind_file.name != "broken.xmind":
+            for suffix in (".json", ".xml", ".csv"):
+                assert xmind_file.with_suffix(suffix).exists()
+
+
+def test_single_parse_matches_separate_writers(tmp_path):
+    source = docs_dir / "xmind_testcase_template_v1.1.xmind"
+    fused = tmp_path / "fused.xmind"
+    separate = tmp_path / "separate.xmind"
+    shutil.copy(source, fused)
+    shutil.copy(source, separate)
+
+    outputs = cli.convert_xmind_file(str(fused))["outputs"]
+    expected = {
+        "json": cli.xmind_testcase_to_json_file(str(separate)),
+        "xml": cli.xmind_to_testlink_xml_file(str(separate)),
+        "csv": cli.xmind_to_zentao_csv_file(str(separate)),
+    }
+    for fmt, path in outputs.items():
+        assert Path(path).read_bytes() == Path(expected[fmt]).read_bytes()
+
+
+@pytest.mark.parametrize("value", ["x", "0", "-2", None])
+def test_batch_rejects_invalid_worker_counts(value, monkeypatch, capsys):
+    argv = ["xmind2testcase", "batch", "cases", "-w"] + ([value] if value is not None else [])
+    monkeypatch.setattr(cli.sys, "argv", argv)
+    with pytest.raises(SystemExit) as exc:
+        cli.cli_main()
+    assert exc.value.code == 2
+    assert "Usage:" in capsys.readouterr().out
+
+
+def test_parse_batch_args():
+    assert cli._parse_batch_args(["cases", "-xml", "-w", "3"]) == (["cases"], ("xml",), 3)
+    assert cli._parse_batch_args(["a", "b"]) == (["a", "b"], cli.FORMATS, None)
@@ -0,0 +1,116 @@
+"""
+紧凑二进制用例格式测试
+"""
+import json
+import shutil
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from xmind2testcase import cli, compact
+from xmind2testcase.casetable import CaseTable
+from xmind2testcase.utils import get_xmind_testcase_list
+
+docs_dir = Path(__file__).parent.parent / "docs"
+
+
+@pytest.fixture
+def testcases():
+    return get_xmind_testcase_list(str(docs_dir / "xmind_testcase_template_v1.1.xmind"))
+
+
+def test_round_trip(testcases):
+    data = compact.dumps(testcases)
+    assert data.startswith(compact.MAGIC)
+    assert compact.loads(data) == testcases
+    assert compact.loads(compact.dumps(CaseTable.from_testcase_list(testcases))) == testcases
+    assert len(data) * 3 < len(json.dumps(testcases))
+
+
+def test_round_trip_keeps_types_and_absent_keys():
+    testcases = [
+        {"name": "a\x00b", "labels": ["x", 1], "steps": [{"actions": "do"}, {"result": 2.5, "status": None}]},
+        {"name": "b", "steps": None, "importance": 1, "estimate": 1.0, "automated": True},
+        {},
+        {"big": 2 ** 70, "inf": float("inf"), "text": "é😀", "": "", "steps": []},
+        {"steps": [1, 2]},
+    ]
+    loaded = compact.loads(compact.dumps(testcases))
+    assert loaded == testcases
+    assert type(loaded[1]["importance"]) is int and type(loaded[1]["estimate"]) is float
+    assert loaded[1]["automated"] is True and "status" not in loaded[0]["steps"][0]
+    assert compact.loads(compact.dumps([])) == []
+
+
+def test_round_trip_keeps_key_order(testcases):
+    """各行键顺序不同时按原顺序还原，JSON 文本逐字节一致"""
+    mixed = [
+        {"name": "a", "suite": "S", "steps": [{"actions": "do", "status": "pass"}, {"status": "fail", "actions": "x"}]},
+        {"suite": "T", "steps": [], "name": "b", "extra": 1},
+        {"extra": 2, "name": "c"},
+    ]
+    data = compact.dumps(mixed)
+    assert json.dumps(compact.loads(data)) == json.dumps(mixed)
+    assert data[4:6] == b"\x02\x00"
+
+    # data with the keys of every row in the same order stays version 1, without key orders
+    assert compact.dumps(testcases)[4:8] == b"\x01\x00\x00\x00"
+
+    # corrupted key orders are invalid data
+    messages = set()
+    for i in range(len(data) // 2, len(data)):
+        try:
+            compact.loads(data[:i] + b"\xff" + data[i + 1:])
+        except ValueError as e:
+            messages.add(str(e))
+    assert "Invalid compact testcase data: bad key order" in messages
+
+
+def test_invalid_data_is_rejected(testcases):
+    data = compact.dumps(testcases)
+    for broken in (b"", b"XXXX" + data[4:], data[:4] + b"\x09\x00" + data[6:], data[:len(data) // 2]):
+        with pytest.raises(ValueError):
+            compact.loads(broken)
+
+    # every byte overwritten in turn: corrupted value indexes are invalid data too, never an IndexError
+    small = compact.dumps([{"name": "a", "labels": ["x"], "steps": [{"actions": "do"}]}, {"name": "b"}])
+    messages = set()
+    for i in range(len(small)):
+        try:
+            compact.loads(small[:i] + b"\xff" + small[i + 1:])
+        except ValueError as e:
+            messages.add(str(e))
+    assert "Invalid compact testcase data: bad value index" in messages
+
+
+def test_cli_writes_compact_file(tmp_path, testcases):
+    target = tmp_path / "case.xmind"
+    shutil.copy(docs_dir / "xmind_testcase_template_v1.1.xmind", target)
+
+    outputs = cli.convert_xmind_file(str(target), ("xtc",))["outputs"]
+    assert list(outputs) == ["xtc"]
+    assert compact.read_compact_file(outputs["xtc"]) == testcases
+    assert cli._parse_batch_args(["dir", "-xtc"])[1] == ("xtc",)
+
+
+def test_record_export_and_import(client, isolated_settings, testcases):
+    db = sqlite3.connect(isolated_settings.DATABASE_PATH)
+    db.execute("INSERT INTO records (name, create_on, content) VALUES (?, ?, ?)",
+               ("demo.xmind", "2024-01-01 00:00:00", json.dumps(testcases)))
+    db.commit()
+    record_id = db.execute("SELECT max(id) FROM records").fetchone()[0]
+    db.close()
+
+    exported = client.get(f"/api/records/{record_id}/compact")
+    assert exported.status_code == 200
+    assert "demo.xtc" in exported.headers["content-disposition"]
+    assert compact.loads(exported.content) == testcases
+
+    edited = [dict(testcases[0], name="edited")]
+    response = client.put(f"/api/records/{record_id}/compact", content=compact.dumps(edited))
+    assert response.json() == {"status": "success", "cases": 1}
+    assert client.get(f"/api/records/{record_id}/content").json() == edited
+
+    assert client.put(f"/api/records/{record_id}/compact", content=b"not compact").status_code == 400
+    assert client.put("/api/records/999999/compact", content=compact.dumps(edited)).status_code == 404
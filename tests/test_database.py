@@ -0,0 +1,100 @@
+"""
+数据库连接池测试
+"""
+import sqlite3
+import threading
+
+import pytest
+
+from app.core import database
+from app.core.database import ConnectionPool
+
+
+def test_connection_pragmas(isolated_settings):
+    with ConnectionPool(max_size=1).connection() as db:
+        assert db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert db.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        assert db.execute("PRAGMA busy_timeout").fetchone()[0] == isolated_settings.DB_BUSY_TIMEOUT_MS
+        assert db.execute("PRAGMA cache_size").fetchone()[0] == -isolated_settings.DB_CACHE_SIZE_KB
+        assert isinstance(db.execute("SELECT 1 AS one").fetchone(), sqlite3.Row)
+
+
+def test_connections_are_reused(isolated_settings):
+    pool = ConnectionPool(max_size=2)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        assert second is first
+
+    stats = pool.stats()
+    assert stats["opened"] == 1
+    assert stats["acquired"] == 2
+    assert stats["idle"] == 1 and stats["in_use"] == 0
+
+
+def test_pool_is_bounded(isolated_settings):
+    pool = ConnectionPool(max_size=1, timeout=0.05)
+    with pool.connection():
+        with pytest.raises(sqlite3.OperationalError):
+            pool.acquire()
+
+    stats = pool.stats()
+    assert stats["open"] == 1
+    assert stats["waits"] == 1 and stats["timeouts"] == 1
+
+
+def test_waiter_gets_released_connection(isolated_settings):
+    pool = ConnectionPool(max_size=1, timeout=5)
+    db = pool.acquire()
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(pool.acquire()))
+    waiter.start()
+    waiter.join(0.05)
+    assert not acquired
+
+    pool.release(db)
+    waiter.join()
+    assert acquired == [db]
+    assert pool.stats()["waits"] == 1
+
+
+def test_uncommitted_changes_are_rolled_back(isolated_settings):
+    pool = ConnectionPool(max_size=1)
+    with pool.connection() as db:
+        db.execute("INSERT INTO configs (key, value) VALUES ('pool', 'uncommitted')")
+    with pool.connection() as db:
+        assert not db.in_transaction
+        assert db.execute("SELECT * FROM configs WHERE key = 'pool'").fetchone() is None
+
+
+def test_writer_does_not_block_readers(isolated_settings):
+    pool = ConnectionPool(max_size=2, timeout=1)
+    with pool.connection() as writer, pool.connection() as reader:
+        writer.execute("INSERT INTO configs (key, value) VALUES ('pool', 'written')")
+        assert writer.in_transaction
+        # the reader sees the last committed state instead of waiting for the write transaction
+        assert reader.execute("SELECT * FROM configs WHERE key = 'pool'").fetchone() is None
+        writer.commit()
+        assert reader.execute("SELECT value FROM configs WHERE key = 'pool'").fetchone()["value"] == "written"
+
+
+def test_pool_follows_database_path(isolated_settings, tmp_path, monkeypatch):
+    pool = database.get_pool()
+    assert database.get_pool() is pool
+
+    monkeypatch.setattr(isolated_settings, "DATABASE_PATH", str(tmp_path / "other.db3"))
+    other = database.get_pool()
+    assert other is not pool and other.path == isolated_settings.DATABASE_PATH
+    with pytest.raises(sqlite3.ProgrammingError):
+        pool.acquire()
+    database.close_pool()
+
+
+def test_requests_share_pooled_connections(client):
+    for _ in range(3):
+        assert client.get("/").status_code == 200
+
+    stats = client.get("/api/metrics").json()["database"]
+    assert stats["opened"] == 1
+    assert stats["acquired"] >= 3
+    assert stats["in_use"] == 0
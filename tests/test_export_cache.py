@@ -0,0 +1,106 @@
+"""
+导出文件缓存测试
+"""
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from app.services.export_cache import ExportCache
+
+docs_dir = Path(__file__).parent.parent / "docs"
+
+
+def test_single_flight_generation(tmp_path):
+    cache = ExportCache(cache_dir=str(tmp_path), max_bytes=1024 * 1024, max_age=3600)
+    key = cache.make_key("record:abc", "testlink", [1, 2], {"root_name": "a"})
+    calls = []
+    started = threading.Event()
+
+    def generate(path):
+        calls.append(path)
+        started.set()
+        time.sleep(0.05)
+        Path(path).write_text("payload")
+
+    paths = []
+    threads = [threading.Thread(target=lambda: paths.append(cache.get_or_create(key, ".xml", generate)))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert set(paths) == {str(tmp_path / (key + ".xml"))}
+    assert Path(paths[0]).read_text() == "payload"
+    assert not list(tmp_path.glob("*.tmp"))
+    stats = cache.stats()
+    assert stats["misses"] == 1 and stats["hits"] + stats["coalesced"] == 7
+
+
+def test_key_covers_source_filter_format_and_options():
+    keys = {
+        ExportCache.make_key("record:a", "zentao"),
+        ExportCache.make_key("record:b", "zentao"),
+        ExportCache.make_key("record:a", "testlink"),
+        ExportCache.make_key("record:a", "zentao", [0]),
+        ExportCache.make_key("record:a", "zentao", None, {"case_type": "x"}),
+    }
+    assert len(keys) == 5
+
+
+def test_eviction_by_size_and_age(tmp_path):
+    cache = ExportCache(cache_dir=str(tmp_path), max_bytes=25, max_age=3600)
+    for i, name in enumerate(["old", "mid", "new"]):
+        cache.get_or_create(name, ".csv", lambda path: Path(path).write_text("x" * 10))
+        os.utime(tmp_path / (name + ".csv"), (time.time() - 100 + i, time.time() - 100 + i))
+    cache.evict()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["mid.csv", "new.csv"]
+
+    cache.max_age = 50
+    cache.evict()
+    assert not list(tmp_path.iterdir())
+
+
+def test_recently_used_artifacts_are_not_evicted(tmp_path):
+    """刚命中的文件在宽限期内不会被其他请求的淘汰删除"""
+    cache = ExportCache(cache_dir=str(tmp_path), max_bytes=15, max_age=3600, grace=60)
+    old = time.time() - 100
+    for name in ["old", "hit"]:
+        cache.get_or_create(name, ".csv", lambda path: Path(path).write_text("x" * 10))
+        os.utime(tmp_path / (name + ".csv"), (old, old))
+
+    cache.get_or_create("hit", ".csv", lambda path: None)
+    cache.get_or_create("new", ".csv", lambda path: Path(path).write_text("x" * 10))
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["hit.csv", "new.csv"]
+
+
+def test_downloads_reuse_and_invalidate(client, isolated_settings):
+    from app.services.export_cache import export_cache
+    from app.services.file_service import insert_record
+
+    shutil.copy(docs_dir / "xmind_testcase_template_v1.1.xmind", Path(isolated_settings.UPLOAD_FOLDER) / "case.xmind")
+    before = export_cache.stats()
+
+    first = client.get("/case.xmind/to/zentao")
+    again = client.get("/case.xmind/to/zentao")
+    assert first.status_code == again.status_code == 200
+    assert first.content == again.content
+    stats = export_cache.stats()
+    assert (stats["misses"] - before["misses"], stats["hits"] - before["hits"]) == (1, 1)
+
+    db = sqlite3.connect(isolated_settings.DATABASE_PATH)
+    cases = [{"name": "only case", "suite": "S", "preconditions": "", "importance": 1, "execution_type": 1,
+              "steps": [{"step_number": 1, "actions": "do", "expectedresults": "done"}]}]
+    insert_record(db, "case.xmind", content=json.dumps(cases), case_type="接口测试", apply_phase="冒烟测试阶段")
+    db.close()
+
+    edited = client.get("/case.xmind/to/zentao")
+    assert edited.content != first.content
+    assert "only case" in edited.content.decode("utf-8")
+    assert client.get("/case.xmind/to/zentao", params={"cases": "5"}).content.decode("utf-8").count("\n") == 1
+    assert client.get("/case.xmind/to/testlink").status_code == 200
@@ -0,0 +1,70 @@
+"""
+多格式导出测试
+"""
+import csv
+import io
+import json
+import shutil
+import sqlite3
+import zipfile
+from pathlib import Path
+from xml.etree import ElementTree
+
+docs_dir = Path(__file__).parent.parent / "docs"
+
+
+def test_export_all_from_file(isolated_settings):
+    from app.services import export_service
+
+    target = Path(isolated_settings.UPLOAD_FOLDER) / "case.xmind"
+    shutil.copy(docs_dir / "xmind_testcase_template_v1.1.xmind", target)
+
+    chunks, timings = export_service.export_all("case.xmind")
+    assert list(timings) == ["load"]
+    archive = io.BytesIO(b"".join(chunks))
+    assert list(timings) == ["load", "xmind", "testlink", "zentao", "json", "total"]
+
+    with zipfile.ZipFile(archive) as zf:
+        assert all(info.flag_bits & 0x08 for info in zf.infolist())  # streamed with data descriptors
+        assert zf.namelist() == ["case.xmind", "case.xml", "case.csv", "case.json"]
+        assert zf.read("case.xmind") == target.read_bytes()
+        testcases = json.loads(zf.read("case.json"))
+        assert len(list(csv.reader(io.StringIO(zf.read("case.csv").decode("utf-8"))))) == len(testcases) + 1
+        assert len(ElementTree.fromstring(zf.read("case.xml")).findall(".//testcase")) == len(testcases)
+
+    assert export_service.export_all("missing.xmind") is None
+
+
+def test_aborted_export_is_cleaned_up(isolated_settings):
+    from app.services import export_service
+
+    shutil.copy(docs_dir / "xmind_testcase_template_v1.1.xmind", Path(isolated_settings.UPLOAD_FOLDER) / "case.xmind")
+    before = export_service.stats()["exports"]
+
+    chunks, timings = export_service.export_all("case.xmind")
+    assert next(chunks).startswith(b"PK")
+    chunks.close()
+    assert "total" not in timings and export_service.stats()["exports"] == before
+
+
+def test_download_all_uses_record(client, isolated_settings):
+    from app.services.file_service import insert_record
+
+    shutil.copy(docs_dir / "xmind_testcase_template_v1.1.xmind", Path(isolated_settings.UPLOAD_FOLDER) / "case.xmind")
+    db = sqlite3.connect(isolated_settings.DATABASE_PATH)
+    cases = [{"name": "S > edited case", "suite": "S", "preconditions": "", "importance": 1, "execution_type": 1,
+              "steps": [{"step_number": 1, "actions": "do", "expectedresults": "done"}]}]
+    insert_record(db, "case.xmind", content=json.dumps(cases))
+    db.close()
+
+    response = client.post("/api/download-all", data={"filename": "case.xmind"})
+    assert response.status_code == 200
+    assert response.headers["server-timing"].startswith("load;dur=")
+
+    with zipfile.ZipFile(io.BytesIO(response.content)) as zf:
+        assert json.loads(zf.read("case.json")) == cases
+        assert "edited case" in zf.read("case.csv").decode("utf-8")
+        with zipfile.ZipFile(io.BytesIO(zf.read("case.xmind"))) as xmind:
+            assert "edited case" in xmind.read("content.json").decode("unicode_escape")
+
+    assert client.post("/api/download-all", data={"filename": "missing.xmind"}).status_code == 404
@@ -0,0 +1,136 @@
+"""
+数据库迁移与热点查询计划测试
+"""
+import json
+import sqlite3
+from contextlib import closing
+
+import pytest
+
+from app.core import migrations
+from app.core.database import connect, init_db
+from app.services import testcase_store
+
+# 热点查询：首页/项目页记录列表、按文件名查记录、首页计数、项目列表、用例读取与统计
+HOT_QUERIES = [
+    ("SELECT r.id, r.name, r.create_on, r.note, p.name as project_name, r.project_id, r.case_type, r.apply_phase "
+     "FROM records r LEFT JOIN projects p ON r.project_id = p.id WHERE r.is_deleted = 0 ORDER BY r.id DESC LIMIT ?",
+     (8,)),
+    ("SELECT r.id, r.name, r.create_on, r.note, p.name as project_name, r.project_id, r.case_type, r.apply_phase "
+     "FROM records r LEFT JOIN projects p ON r.project_id = p.id WHERE r.is_deleted = 0 AND r.project_id = ? "
+     "ORDER BY r.id DESC", (3,)),
+    ("SELECT id, name, note, project_id, case_type, apply_phase FROM records "
+     "WHERE name = ? AND is_deleted = 0 ORDER BY id DESC LIMIT 1", ("case.xmind",)),
+    ("SELECT * from records where is_deleted = 0 ORDER BY id desc LIMIT -1 offset 20", ()),
+    ("SELECT SUM(created) FROM daily_record_counts WHERE day = ?", ("2024-01-01",)),
+    ("SELECT SUM(created) FROM daily_record_counts WHERE day >= ?", ("2024-01-01",)),
+    ("SELECT created FROM project_record_counts WHERE project_id = ?", (3,)),
+    ("SELECT data FROM record_stats WHERE record_id = ?", (1,)),
+    ("SELECT id, name FROM projects WHERE is_deleted = 0 ORDER BY id DESC", ()),
+    ("SELECT id FROM projects WHERE name = ? AND is_deleted = 0", ("默认项目",)),
+    ("SELECT t.id, t.ordinal, t.data FROM testcases t WHERE t.record_id = ? "
+     "AND t.ordinal IN (SELECT value FROM json_each(?)) ORDER BY t.ordinal", (1, "[3, 1]")),
+    ("SELECT s.testcase_id, s.data FROM testcases t JOIN test_steps s ON s.testcase_id = t.id "
+     "WHERE t.record_id = ? ORDER BY t.ordinal, s.ordinal", (1,)),
+    ("SELECT COALESCE(status, 'not_run') AS st, COUNT(*) FROM test_steps WHERE record_id = ? GROUP BY st", (1,)),
+]
+
+# sqlite_stat1 rows describing 1M records (10% deleted, 50 projects, ~2000 days) and 10M test cases
+STATS_1M = [
+    ("records", None, "1000000"),
+    ("records", "idx_records_live", "1000000 500000 1"),
+    ("records", "idx_records_project", "1000000 20000 18000 1"),
+    ("records", "idx_records_name", "1000000 1 1"),
+    ("projects", None, "50"),
+    ("projects", "idx_projects_live", "50 25 1"),
+    ("projects", "idx_projects_name", "50 1 1"),
+    ("testcases", None, "10000000"),
+    ("testcases", "idx_testcases_record_ordinal", "10000000 10 1"),
+    ("testcases", "idx_testcases_record_suite", "10000000 10 2"),
+    ("testcases", "idx_testcases_record_result", "10000000 10 3"),
+    ("test_steps", None, "30000000"),
+    ("test_steps", "idx_test_steps_testcase_ordinal", "30000000 3 1"),
+    ("test_steps", "idx_test_steps_record_status", "30000000 30 10"),
+]
+
+
+@pytest.fixture
+def db(isolated_settings):
+    with closing(connect()) as db:
+        yield db
+
+
+def test_fresh_database_is_at_latest_version(db, isolated_settings):
+    versions = [version for version, _, _ in migrations.list_migrations()]
+    assert [row[0] for row in db.execute("SELECT version FROM schema_version ORDER BY version")] == versions
+    assert migrations.current_version(db) == versions[-1]
+    assert migrations.migrate(db) == []
+    assert db.execute("SELECT value FROM configs WHERE key = 'projects'").fetchone()[0] == "默认项目"
+
+
+def test_database_from_old_schema_is_adopted(isolated_settings, tmp_path, monkeypatch):
+    # what schema.sql created before versioned migrations, with a record
+    path = tmp_path / "old.db3"
+    with closing(sqlite3.connect(path)) as old:
+        old.executescript("""
+            create table projects (id integer primary key autoincrement, name text not null, description text,
+                                   create_on text, is_deleted integer DEFAULT 0);
+            create table records (id integer primary key autoincrement, project_id integer, name text not null,
+                                  content text, create_on text not null, note text, case_type text,
+                                  apply_phase text, is_deleted integer DEFAULT 0);
+            create table configs (key text primary key, value text);
+            INSERT INTO configs (key, value) VALUES ('projects', '项目A');
+        """)
+        old.execute("INSERT INTO records (name, create_on, content) VALUES (?, ?, ?)",
+                    ("old.xmind", "2024-01-01 00:00:00", json.dumps([{"name": "a", "steps": []}])))
+        old.commit()
+
+    monkeypatch.setattr(isolated_settings, "DATABASE_PATH", str(path))
+    init_db()
+    with closing(connect()) as db:
+        assert migrations.current_version(db) == migrations.list_migrations()[-1][0]
+        assert db.execute("SELECT value FROM configs WHERE key = 'projects'").fetchone()[0] == "项目A"
+        assert testcase_store.load_testcases(db, 1) == [{"name": "a", "steps": []}]
+
+
+def test_failed_migration_is_rolled_back(tmp_path):
+    (tmp_path / "0001_first.sql").write_text("CREATE TABLE first (id INTEGER);\n")
+    (tmp_path / "0002_broken.sql").write_text("CREATE TABLE second (id INTEGER);\nSELECT * FROM missing;\n")
+    (tmp_path / "notes.txt").write_text("not a migration")
+
+    with closing(sqlite3.connect(tmp_path / "test.db3")) as db:
+        with pytest.raises(sqlite3.OperationalError):
+            migrations.migrate(db, str(tmp_path))
+        tables = {row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert not {"first", "second", "schema_version"} & tables
+        assert not db.in_transaction
+
+        (tmp_path / "0002_broken.sql").write_text("CREATE TABLE second (id INTEGER);\n")
+        assert migrations.migrate(db, str(tmp_path)) == [1, 2]
+        assert migrations.current_version(db) == 2
+
+
+def test_statements_are_split_on_complete_sql():
+    script = "-- comment; not a statement\nINSERT INTO t VALUES ('a;b');\nCREATE TABLE x (\n  id INTEGER\n);\n-- end\n"
+    assert list(migrations.iter_statements(script)) == [
+        "-- comment; not a statement\nINSERT INTO t VALUES ('a;b');", "CREATE TABLE x (\n  id INTEGER\n);"]
+    with pytest.raises(ValueError):
+        list(migrations.iter_statements("CREATE TABLE y (id INTEGER)"))
+
+
+def test_hot_queries_use_indexes_at_1m_records(db):
+    # the planner only knows table sizes from sqlite_stat1: describe 1M records instead of inserting them
+    db.execute("ANALYZE")
+    db.execute("DELETE FROM sqlite_stat1")
+    db.executemany("INSERT INTO sqlite_stat1 (tbl, idx, stat) VALUES (?, ?, ?)", STATS_1M)
+    db.commit()
+    db.execute("ANALYZE sqlite_schema")
+
+    for sql, params in HOT_QUERIES:
+        details = [row[3] for row in db.execute("EXPLAIN QUERY PLAN " + sql, params)]
+        scans = [detail for detail in details if detail.startswith("SCAN") and "VIRTUAL TABLE" not in detail]
+        assert not scans, (sql, details)
+        assert not any("TEMP B-TREE FOR ORDER BY" in detail for detail in details), (sql, details)
+
+    indexes = {row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert "idx_records_create_date" not in indexes
@@ -0,0 +1,84 @@
+"""
+解析结果缓存测试
+"""
+import shutil
+
+from app.services.parse_cache import ParseCache
+
+
+def test_memory_tier_hits_and_evictions(tmp_path, zen_xmind_file, sample_xmind_file):
+    first = tmp_path / "a.xmind"
+    second = tmp_path / "b.xmind"
+    shutil.copy(zen_xmind_file, first)
+    shutil.copy(sample_xmind_file.parent / "xmind_testcase_template_v1.1.xmind", second)
+
+    cache = ParseCache(max_entries=1, disk=False)
+    suites = cache.get_testsuites(str(first))
+    assert cache.get_testsuites(str(first)) is suites
+    assert cache.get_testcases(str(first))
+
+    cache.get_testsuites(str(second))
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["entries"]) == (2, 2, 1, 1)
+
+
+def test_key_follows_content_not_name(tmp_path, zen_xmind_file):
+    """相同内容不同文件名命中同一缓存项"""
+    first = tmp_path / "a.xmind"
+    renamed = tmp_path / "renamed.xmind"
+    shutil.copy(zen_xmind_file, first)
+    shutil.copy(zen_xmind_file, renamed)
+
+    cache = ParseCache(disk=False)
+    cache.get_testsuites(str(first))
+    cache.get_testsuites(str(renamed))
+    assert cache.stats()["hits"] == 1
+
+
+def test_disk_tier_survives_memory_clear(tmp_path, zen_xmind_file):
+    xmind_file = tmp_path / "a.xmind"
+    shutil.copy(zen_xmind_file, xmind_file)
+
+    cache = ParseCache(disk=True, disk_dir=str(tmp_path / "cache"))
+    expected = cache.get_testcases(str(xmind_file))
+    cache.clear()
+
+    assert cache.get_testcases(str(xmind_file)) == expected
+    stats = cache.stats()
+    assert (stats["misses"], stats["disk_writes"], stats["disk_hits"]) == (1, 1, 1)
+
+
+def test_metrics_endpoint(client):
+    response = client.get("/api/metrics")
+    assert response.status_code == 200
+    assert "hits" in response.json()["parse_cache"]
+
+
+def test_disk_tier_is_versioned_json(tmp_path, zen_xmind_file, monkeypatch):
+    """磁盘缓存为带版本号的 JSON，版本变化后旧文件不再命中"""
+    import json
+
+    from app.services import parse_cache as parse_cache_module
+
+    xmind_file = tmp_path / "a.xmind"
+    shutil.copy(zen_xmind_file, xmind_file)
+    cache_dir = tmp_path / "cache"
+
+    cache = ParseCache(disk=True, disk_dir=str(cache_dir))
+    expected = [suite.to_dict() for suite in cache.get_testsuites(str(xmind_file))]
+    key = cache.make_key(str(xmind_file))
+    with open(cache_dir / (key + ".json"), encoding="utf-8") as f:
+        assert json.load(f)["version"] == parse_cache_module.CACHE_FORMAT_VERSION
+
+    cache.clear()
+    assert [suite.to_dict() for suite in cache.get_testsuites(str(xmind_file))] == expected
+
+    monkeypatch.setattr(parse_cache_module, "CACHE_FORMAT_VERSION", parse_cache_module.CACHE_FORMAT_VERSION + 1)
+    assert cache.make_key(str(xmind_file)) != key
+
+    # A file left with an older format version under the new key is discarded, not served
+    stale = json.loads((cache_dir / (key + ".json")).read_text(encoding="utf-8"))
+    (cache_dir / (cache.make_key(str(xmind_file)) + ".json")).write_text(json.dumps(stale), encoding="utf-8")
+    cache.clear()
+    cache.get_testsuites(str(xmind_file))
+    assert cache.stats()["disk_hits"] == 1
@@ -0,0 +1,138 @@
+"""
+xmind2testcase 解析器测试
+"""
+import copy
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from xmind2testcase import parser, utils
+from xmind2testcase.utils import get_xmind_testcase_list
+from xmindparser.parallel import count_topics
+
+docs_dir = Path(__file__).parent.parent / "docs"
+
+
+def test_parsing_does_not_touch_module_config(zen_xmind_file):
+    """分隔符保存在解析上下文中，而不是写入全局 config"""
+    before = dict(parser.config)
+    context = parser.ParseContext()
+    assert get_xmind_testcase_list(str(zen_xmind_file), context)
+    assert context.sep == "/"
+    assert parser.config == before
+
+
+def test_concurrent_parsing_is_isolated(zen_xmind_file):
+    """不同分隔符的文件在线程池中并发解析，结果与串行一致"""
+    files = [str(zen_xmind_file), str(docs_dir / "xmind_testcase_template_v1.1.xmind")]
+    expected = {f: get_xmind_testcase_list(f) for f in files}
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        jobs = [(f, pool.submit(get_xmind_testcase_list, f)) for f in files * 20]
+        for f, job in jobs:
+            assert job.result() == expected[f]
+
+
+def test_context_overrides_config():
+    topics = [{"title": "A"}, {"title": "#B"}, {"title": "!C"}, {"title": "D"}]
+    context = parser.ParseContext(ignore_char="!")
+    context.sep = "/"
+    assert parser.gen_testcase_title(topics, context) == "A / #B / D"
+    assert parser.gen_testcase_title(topics) == "A D"
+
+
+def test_trace_disabled_builds_no_payloads(zen_xmind_file, monkeypatch):
+    """关闭追踪时不会调用 to_dict() 构建调试载荷"""
+    from xmind2testcase import metadata
+
+    def fail(self):
+        raise AssertionError("to_dict() called while tracing is disabled")
+
+    for cls in (metadata.TestSuite, metadata.TestCase, metadata.TestStep):
+        monkeypatch.setattr(cls, "to_dict", fail)
+
+    assert parser.tracer.enabled is False
+    from xmind2testcase.utils import get_xmind_testsuites
+    assert get_xmind_testsuites(str(zen_xmind_file))
+
+
+def test_trace_counts_stages(zen_xmind_file):
+    from xmind2testcase.utils import get_xmind_testsuites
+
+    parser.tracer.reset()
+    parser.tracer.enable()
+    try:
+        get_xmind_testsuites(str(zen_xmind_file))
+    finally:
+        parser.tracer.disable()
+
+    snapshot = parser.tracer.snapshot()
+    assert snapshot["counters"] == {"sheet": 1, "testsuite": 2, "testcase": 3, "teststep": 4}
+    assert snapshot["timings"]["sheet"] > 0
+    stage, label, data = snapshot["events"][-1]
+    assert stage == "sheet" and data["name"] == "现代化系统测试模板"
+
+
+def _deep_sheet(depth):
+    leaf = {"title": "step", "note": None, "comment": None, "markers": []}
+    topic = leaf
+    for level in range(depth):
+        topic = {"title": "L%d" % level, "note": None, "comment": None, "markers": [], "topics": [topic]}
+    root = {"title": "root", "note": None, "comment": None, "markers": [], "topics": [topic]}
+    return {"title": "sheet", "topic": root}
+
+
+def test_deep_map_does_not_hit_recursion_limit():
+    """远超递归深度限制的思维导图也能解析"""
+    import sys
+    depth = sys.getrecursionlimit() * 3
+    sheet = _deep_sheet(depth)
+    assert parser.get_max_depth(sheet["topic"]) == depth + 1
+
+    suites = parser.xmind_to_testsuites([sheet])
+    cases = suites[0].sub_suites[0].testcase_list
+    assert len(cases) == 1
+    assert cases[0].name.count(" - ") == depth - 1
+
+
+def test_recurse_parse_testcase_order_and_filtering():
+    def topic(title, *children, markers=None):
+        return {"title": title, "note": None, "comment": None, "markers": markers or [], "topics": list(children)}
+
+    tree = topic("M", topic("A", topic("s1", topic("#e1")), markers=["priority-2"]), topic("#skip", topic("x")),
+                 topic("B", topic("B1", topic("s")), topic("B2")), topic("C", topic("s2"), markers=["priority-1"]))
+    cases = list(parser.recurse_parse_testcase(tree, context=parser.ParseContext()))
+    assert [c.name for c in cases] == ["M A", "M B B1 s", "M B B2", "M C"]
+    assert cases[0].steps[0].expectedresults == ""
+
+
+def test_fused_testcase_dicts_match_object_path():
+    """单遍生成的扁平用例与 TestSuite 对象路径的结果一致"""
+    files = sorted(docs_dir.glob("*.xmind"))
+    assert files
+    for f in files:
+        expected = utils.testsuites_to_testcase_list(utils.get_xmind_testsuites(str(f)))
+        assert list(utils.iter_xmind_testcases(str(f))) == expected
+
+
+def test_iter_json_chunks_matches_json_dumps():
+    samples = [[], [{}], [{"a": [1, {"b": "x\ny"}], "中": "文"}, 2, "s"], [[]]]
+    for items in samples:
+        assert "".join(utils.iter_json_chunks(iter(items))) == json.dumps(items)
+        assert "".join(utils.iter_json_chunks(items, indent=4, ensure_ascii=False)) == \
+            json.dumps(items, indent=4, separators=(",", ": "), ensure_ascii=False)
+
+
+def test_parallel_sheets_keep_order_and_results(zen_xmind_file):
+    """多 sheet 并行解析：大 sheet 进入进程池、小 sheet 留在本进程，结果保持 sheet 顺序"""
+    sheets = []
+    for f in [zen_xmind_file] + sorted(docs_dir.glob("*.xmind")):
+        sheets.extend(utils.load_xmind_sheets(str(f)))
+    sizes = sorted(count_topics(s["topic"], lambda t: t.get("topics") or []) for s in sheets)
+    serial = parser.xmind_to_testsuites(copy.deepcopy(sheets))
+    serial_cases = list(parser.iter_testcase_dicts(copy.deepcopy(sheets)))
+
+    context = parser.ParseContext(workers=2, parallel_min_topics=sizes[len(sizes) // 2])
+    parallel = parser.xmind_to_testsuites(copy.deepcopy(sheets), context)
+    assert [s.to_dict() for s in parallel] == [s.to_dict() for s in serial]
+    assert list(parser.iter_testcase_dicts(copy.deepcopy(sheets), context)) == serial_cases
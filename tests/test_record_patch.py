@@ -0,0 +1,172 @@
+"""
+用例按条修改（PATCH）与版本号冲突检测测试
+"""
+import copy
+import json
+from contextlib import closing
+
+import pytest
+
+from app.core.database import connect
+from app.services import file_service, testcase_store
+
+CASES = [
+    {"name": "a", "suite": "S1", "result": 0, "steps": [{"actions": "x", "status": "not_run"},
+                                                       {"actions": "y", "status": "not_run"}]},
+    {"name": "b", "suite": "S1", "result": "Pass", "steps": []},
+    {"name": "c", "suite": "S2", "result": 0, "steps": [{"actions": "z"}]},
+    {"name": "d", "steps": None},
+]
+
+OPS = [
+    {"op": "set", "case": 0, "field": "result", "value": "Fail"},
+    {"op": "set_step", "case": 0, "step": 1, "field": "status", "value": "fail"},
+    {"op": "insert", "case": 1, "value": {"name": "new", "suite": "S1", "steps": [{"actions": "n"}]}},
+    {"op": "delete", "case": 3},
+    {"op": "move", "case": 3, "to": 0},
+    {"op": "set", "case": 2, "field": "steps", "value": [{"actions": "w", "status": "pass"}]},
+    {"op": "insert", "value": {"name": "last"}},
+    {"op": "set_step", "case": 1, "step": 0, "field": "comment", "value": "看这里"},
+]
+
+
+def expected(testcases, ops):
+    """同一批操作在 Python 列表上的结果"""
+    testcases = copy.deepcopy(testcases)
+    for op in ops:
+        if op["op"] == "set":
+            testcases[op["case"]][op["field"]] = op["value"]
+        elif op["op"] == "set_step":
+            testcases[op["case"]]["steps"][op["step"]][op["field"]] = op["value"]
+        elif op["op"] == "insert":
+            testcases.insert(op.get("case", len(testcases)), op["value"])
+        elif op["op"] == "delete":
+            del testcases[op["case"]]
+        else:
+            testcases.insert(op["to"], testcases.pop(op["case"]))
+    return testcases
+
+
+@pytest.fixture
+def db(isolated_settings):
+    with closing(connect()) as db:
+        yield db
+
+
+def case_ids(db, record_id):
+    return dict(db.execute("SELECT json_extract(data, '$.name'), id FROM testcases WHERE record_id = ?", (record_id,)))
+
+
+def test_ops_rewrite_only_the_edited_cases(db):
+    record_id = file_service.insert_record(db, "demo.xmind", testcases=CASES)
+    assert testcase_store.record_version(db, record_id) == 1
+    before_ids = case_ids(db, record_id)
+    before_hash = testcase_store.record_content_hash(db, record_id)
+
+    assert testcase_store.apply_ops(db, record_id, 1, OPS) == 2
+    db.commit()
+    result = expected(CASES, OPS)
+    assert testcase_store.load_testcases(db, record_id) == result
+    assert [row[0] for row in db.execute("SELECT ordinal FROM testcases WHERE record_id = ? ORDER BY ordinal",
+                                         (record_id,))] == list(range(len(result)))
+    # untouched and moved cases keep their rows
+    after_ids = case_ids(db, record_id)
+    assert after_ids["b"] == before_ids["b"] and after_ids["d"] == before_ids["d"]
+    assert testcase_store.record_stats(db, record_id)["steps"] == {"Total": 3, "pass": 1, "fail": 1, "not_run": 1}
+    assert testcase_store.record_content_hash(db, record_id) != before_hash
+
+
+def test_ops_update_the_stored_stats_incrementally(db):
+    """逐条操作只按被改动的用例增量更新统计，结果与整体重算一致"""
+    record_id = file_service.insert_record(db, "demo.xmind", testcases=CASES)
+    statements = []
+    db.set_trace_callback(statements.append)
+    version = 1
+    for op in OPS + [{"op": "delete", "case": 0}, {"op": "set", "case": 0, "field": "suite", "value": 7}]:
+        version = testcase_store.apply_ops(db, record_id, version, [op])
+    db.commit()
+    db.set_trace_callback(None)
+
+    # no statement counts every row of the record
+    assert not [sql for sql in statements if "GROUP BY" in sql and "WHERE record_id =" in sql]
+    recounted = json.loads(json.dumps(testcase_store._count_stats(db, record_id)))
+    assert testcase_store.record_stats(db, record_id) == recounted
+    assert sorted(recounted["suites"]) == ["7", "Root", "S1"]
+
+
+def test_ops_on_a_json_text_record(db):
+    db.execute("INSERT INTO records (name, create_on, content) VALUES (?, ?, ?)",
+               ("legacy.xmind", "2024-01-01 00:00:00", json.dumps(CASES)))
+    db.commit()
+    record_id = db.execute("SELECT max(id) FROM records").fetchone()[0]
+    assert testcase_store.apply_ops(db, record_id, 0, OPS) == 1
+    db.commit()
+    assert testcase_store.load_testcases(db, record_id) == expected(CASES, OPS)
+    assert db.execute("SELECT content FROM records WHERE id = ?", (record_id,)).fetchone()[0] is None
+
+
+def test_stale_version_is_a_conflict(db):
+    record_id = file_service.insert_record(db, "demo.xmind", testcases=CASES)
+    testcase_store.save_testcases(db, record_id, CASES[:2], base_version=1)
+    db.commit()
+
+    with pytest.raises(testcase_store.VersionConflict) as e:
+        testcase_store.apply_ops(db, record_id, 1, OPS[:1])
+    db.rollback()
+    assert e.value.version == 2
+    with pytest.raises(testcase_store.VersionConflict):
+        testcase_store.save_testcases(db, record_id, CASES, base_version=1)
+    db.rollback()
+    assert testcase_store.load_testcases(db, record_id) == CASES[:2]
+
+    # normalizing keeps the cases, and so the version editors hold
+    assert testcase_store.normalize_records(db) == 0
+    assert testcase_store.record_version(db, record_id) == 2
+
+
+@pytest.mark.parametrize("op", [
+    {"op": "set", "case": 4, "field": "name", "value": "x"},
+    {"op": "set", "case": True, "field": "name", "value": "x"},
+    {"op": "set_step", "case": 1, "step": 0, "field": "status", "value": "pass"},
+    {"op": "insert", "case": 0, "value": "not a case"},
+    {"op": "set", "case": 0, "field": "steps", "value": ["not a step"]},
+    {"op": "move", "case": 0, "to": 4},
+    {"op": "rename"},
+])
+def test_invalid_ops_are_refused(client, isolated_settings, op):
+    with closing(connect()) as db:
+        record_id = file_service.insert_record(db, "demo.xmind", testcases=CASES)
+
+    # valid operations before the invalid one are rolled back with it
+    response = client.patch(f"/api/records/{record_id}/cases", json={"version": 1, "ops": [OPS[0], op]})
+    assert response.status_code == 400
+    assert client.get(f"/api/records/{record_id}/content").json() == CASES
+    with closing(connect()) as db:
+        assert testcase_store.record_version(db, record_id) == 1
+
+
+def test_patch_api(client, isolated_settings):
+    with closing(connect()) as db:
+        record_id = file_service.insert_record(db, "demo.xmind", testcases=CASES)
+
+    url = f"/api/records/{record_id}/cases"
+    assert client.patch(url, json={"version": 1, "ops": OPS[:2]}).json() == {"status": "success", "version": 2}
+    assert client.get(f"/api/records/{record_id}/content").json() == expected(CASES, OPS[:2])
+
+    # a second editor still at version 1
+    response = client.patch(url, json={"version": 1, "ops": OPS[2:3]})
+    assert response.status_code == 409
+    assert response.json()["detail"]["version"] == 2
+    response = client.put(f"/api/records/{record_id}", json={"content": CASES, "version": 1})
+    assert response.status_code == 409
+    # a whole-list save must say which version it is an edit of
+    assert client.put(f"/api/records/{record_id}", json={"content": CASES}).status_code == 428
+    assert client.get(f"/api/records/{record_id}/content").json() == expected(CASES, OPS[:2])
+
+    assert client.put(f"/api/records/{record_id}", json={"content": CASES, "version": 2}).json() == \
+        {"status": "success", "version": 3}
+    assert client.patch(f"/api/records/{record_id + 1}/cases", json={"version": 0, "ops": []}).status_code == 404
+
+    page = client.get(f"/preview/id/{record_id}").text
+    assert "let recordVersion = 3;" in page
+    assert "let casesStored = true;" in page
@@ -0,0 +1,50 @@
+"""
+执行报告测试
+"""
+import json
+import sqlite3
+
+from app.services import report_service
+
+CASES = [
+    {"name": "a|b", "suite": "S1", "result": "Pass", "comment": "line\nbreak",
+     "steps": [{"status": "pass"}, {"status": "fail"}, {}, {"status": "block"}]},
+    {"name": "b", "suite": "S1", "result": 0, "steps": []},
+    {"name": "c", "suite": "S2", "result": "Block", "steps": [{"status": "pass"}]},
+]
+
+
+def test_aggregates_in_one_pass():
+    stats = report_service.record_stats(CASES)
+    assert stats["cases"] == {"Pass": 1, "Fail": 0, "Block": 1, "Skip": 0, "Not Run": 1, "Total": 3, "Executed": 2}
+    assert stats["steps"] == {"Total": 5, "pass": 2, "fail": 1, "not_run": 1, "block": 1}
+    assert stats["suites"]["S1"] == {"Total": 2, "Pass": 1, "Fail": 0, "Block": 0, "Skip": 0, "Not Run": 1}
+
+
+def test_markdown_rows_are_streamed():
+    chunks = list(report_service.iter_markdown_report("demo.xmind", CASES * 3, rows_per_chunk=4))
+    assert len(chunks) == 1 + 3
+    report = "".join(chunks)
+    assert report.startswith("# demo执行结果")
+    assert "- **已执行**: 6" in report
+    assert "\n| 1 | S1 | a-b | 通过 | 总:4 (通过:1, 失败:1, 阻塞:1) | line break |" in report
+    assert "\n| 2 | S1 | b | 0 |  |  |" in report
+    assert report.endswith("\n| 9 | S2 | c | 阻塞 | 总:1 (通过:1) |  |")
+
+
+def test_stats_api_matches_report(client, isolated_settings):
+    db = sqlite3.connect(isolated_settings.DATABASE_PATH)
+    db.execute("INSERT INTO records (name, create_on, content) VALUES (?, ?, ?)",
+               ("demo.xmind", "2024-01-01 00:00:00", json.dumps(CASES)))
+    db.commit()
+    record_id = db.execute("SELECT max(id) FROM records").fetchone()[0]
+    db.close()
+
+    stats = client.get(f"/api/records/{record_id}/stats").json()
+    assert stats == report_service.record_stats(CASES)
+
+    report = client.get(f"/api/records/{record_id}/export")
+    assert report.headers["content-type"].startswith("text/markdown")
+    assert report.text == "".join(report_service.iter_markdown_report("demo.xmind", CASES))
+
+    assert client.get("/api/records/999999/stats").status_code == 404
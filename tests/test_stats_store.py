@@ -0,0 +1,107 @@
+"""
+写入时维护的统计表测试
+"""
+import json
+from contextlib import closing
+from datetime import datetime
+
+import arrow
+import pytest
+
+from app.core.database import connect, init_db
+from app.services import file_service, report_service, stats_store, testcase_store
+
+CASES = [
+    {"name": "a", "suite": "S1", "result": "Pass", "steps": [{"status": "pass"}, {"status": "fail"}]},
+    {"name": "b", "suite": "S2", "result": 0, "steps": [{}]},
+]
+
+
+@pytest.fixture
+def db(isolated_settings):
+    with closing(connect()) as db:
+        yield db
+
+
+def counts(db):
+    return {"today": stats_store.created_count(db, day=datetime.now().strftime("%Y-%m-%d")),
+            "since": stats_store.created_count(db, since="2024-01-01"),
+            "total": stats_store.created_count(db)}
+
+
+def test_counters_follow_record_writes(db):
+    project_id = db.execute("INSERT INTO projects (name, create_on) VALUES ('P', '2024-01-01')").lastrowid
+    first = file_service.insert_record(db, "a.xmind", project_id=project_id, testcases=CASES)
+    file_service.insert_record(db, "b.xmind", project_id=project_id, testcases=[])
+    file_service.insert_record(db, "c.xmind", testcases=[])
+    assert counts(db) == {"today": 3, "since": 3, "total": 3}
+    assert stats_store.project_record_count(db, project_id) == 2
+    assert stats_store.project_record_count(db, None) == 1
+
+    file_service.delete_record("a.xmind", first, db)
+    file_service.delete_record("a.xmind", first, db)  # already deleted: counted once
+    assert counts(db) == {"today": 3, "since": 3, "total": 3}  # as the index page always showed
+    assert db.execute("SELECT created, deleted FROM project_record_counts WHERE project_id = ?",
+                      (project_id,)).fetchone()[:] == (2, 1)
+
+
+def test_days_are_the_local_dates_written(db):
+    late = str(arrow.get("2024-06-01T23:30:00+08:00"))  # 2024-05-31 in UTC
+    db.execute("INSERT INTO records (name, create_on) VALUES (?, ?)", ("late.xmind", late))
+    stats_store.record_created(db, None, late)
+    db.commit()
+    assert stats_store.created_count(db, day="2024-06-01") == 1
+    assert stats_store.created_count(db, day="2024-05-31") == 0
+
+
+def test_migration_counts_existing_records(db, isolated_settings):
+    project_id = db.execute("INSERT INTO projects (name, create_on) VALUES ('P', '2024-01-01')").lastrowid
+    for i, (create_on, is_deleted) in enumerate([("2024-01-01 10:00:00", 0), ("2024-01-01T12:00:00+08:00", 1),
+                                                 ("2024-02-01 10:00:00", 0)]):
+        db.execute("INSERT INTO records (name, create_on, project_id, is_deleted) VALUES (?, ?, ?, ?)",
+                   (f"{i}.xmind", create_on, project_id, is_deleted))
+    db.executescript("DROP TABLE daily_record_counts; DROP TABLE project_record_counts; DROP TABLE record_stats; "
+                     "DELETE FROM schema_version WHERE version = 6;")
+
+    init_db()
+    assert stats_store.created_count(db, day="2024-01-01") == 2
+    assert stats_store.created_count(db, since="2024-01-02") == 1
+    assert db.execute("SELECT created, deleted FROM project_record_counts").fetchone()[:] == (3, 1)
+
+
+def test_record_stats_are_stored_on_save(db):
+    record_id = file_service.insert_record(db, "a.xmind", testcases=CASES)
+    assert stats_store.load_record_stats(db, record_id) == report_service.record_stats(CASES)
+
+    testcase_store.apply_ops(db, record_id, 1, [{"op": "set_step", "case": 1, "step": 0, "field": "status",
+                                                 "value": "pass"}, {"op": "delete", "case": 0}])
+    db.commit()
+    stored = stats_store.load_record_stats(db, record_id)
+    assert stored == report_service.record_stats(testcase_store.load_testcases(db, record_id))
+    assert stored["steps"] == {"Total": 1, "pass": 1, "fail": 0, "not_run": 0}
+
+    odd = [{"name": "x", "steps": ["not a dict"]}]
+    testcase_store.save_testcases(db, record_id, odd)
+    db.commit()
+    assert stats_store.load_record_stats(db, record_id) is None
+
+
+def test_reports_read_the_stored_stats(client, isolated_settings):
+    with closing(connect()) as db:
+        record_id = file_service.insert_record(db, "a.xmind", testcases=CASES)
+        # a record saved before the stats were kept
+        db.execute("DELETE FROM record_stats")
+        db.commit()
+        assert client.get(f"/api/records/{record_id}/stats").json() == report_service.record_stats(CASES)
+        assert testcase_store.normalize_records(db) == 0
+        stored = stats_store.load_record_stats(db, record_id)
+        assert stored == report_service.record_stats(CASES)
+
+        # what the API and the report show is the stored row
+        stored["cases"]["Pass"] = 42
+        db.execute("UPDATE record_stats SET data = ? WHERE record_id = ?", (json.dumps(stored), record_id))
+        db.commit()
+
+    assert client.get(f"/api/records/{record_id}/stats").json()["cases"]["Pass"] == 42
+    assert "- **通过**: 42" in client.get(f"/api/records/{record_id}/export").text
+    assert "| 1 | S1 | a | 通过 | 总:2 (通过:1, 失败:1) |  |" in client.get(f"/api/records/{record_id}/export").text
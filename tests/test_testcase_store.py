@@ -0,0 +1,144 @@
+"""
+用例表存储测试
+"""
+import hashlib
+import json
+import sqlite3
+from contextlib import closing
+
+import pytest
+
+from app.core.database import connect
+from app.services import file_service, report_service, testcase_store
+
+CASES = [
+    {"name": "a|b", "version": 1, "steps": [{"step_number": 1, "actions": "x", "status": "pass"},
+                                           {"step_number": 2, "actions": "y", "status": "fail"}, {}],
+     "suite": "S1", "importance": 1, "result": "Pass", "tc_id": "TC-1"},
+    {"name": "b", "suite": "S1", "result": 0, "steps": [], "importance": 2},
+    {"name": "c", "suite": "S2", "result": "Block", "steps": [{"status": "pass"}], "extra": {"nested": [1.5]}},
+    {"name": "d", "steps": None, "result": "Skip"},
+    {"name": "e"},
+]
+
+
+@pytest.fixture
+def db(isolated_settings):
+    with closing(connect()) as db:
+        yield db
+
+
+def insert(db, testcases, name="demo.xmind"):
+    return file_service.insert_record(db, name, testcases=testcases)
+
+
+def test_round_trip_keeps_the_dicts(db):
+    record_id = insert(db, CASES)
+    loaded = testcase_store.load_testcases(db, record_id)
+    assert json.dumps(loaded) == json.dumps(CASES)  # same keys, same order
+    assert db.execute("SELECT content FROM records WHERE id = ?", (record_id,)).fetchone()[0] is None
+    assert db.execute("SELECT COUNT(*) FROM test_steps WHERE record_id = ?", (record_id,)).fetchone()[0] == 4
+
+    row = db.execute("SELECT suite, priority, result, tc_id, step_count FROM testcases "
+                     "WHERE record_id = ? AND ordinal = 0", (record_id,)).fetchone()
+    assert tuple(row) == ("S1", 1, "Pass", "TC-1", 3)
+
+
+def test_compatibility_views(db):
+    record_id = insert(db, CASES)
+    documents = db.execute("SELECT document FROM testcase_documents WHERE record_id = ? ORDER BY ordinal",
+                           (record_id,)).fetchall()
+    assert [json.loads(row[0]) for row in documents] == CASES
+    content = db.execute("SELECT content FROM record_contents WHERE record_id = ?", (record_id,)).fetchone()[0]
+    assert json.loads(content) == CASES
+
+
+def test_content_hash_matches_the_json_text(db):
+    record_id = insert(db, CASES)
+    expected = hashlib.sha256(json.dumps(CASES).encode("utf-8")).hexdigest()
+    assert testcase_store.record_content_hash(db, record_id) == expected
+    assert file_service.get_record_by_filename(db, "demo.xmind")["content_hash"] == expected
+
+
+def test_partial_reads_and_filters(db):
+    record_id = insert(db, CASES)
+    assert testcase_store.load_testcases(db, record_id, ordinals=[2, 0, 2, 99]) == [CASES[2], CASES[0], CASES[2]]
+    assert testcase_store.load_testcases(db, record_id, ordinals=[]) == []
+    assert testcase_store.load_testcases(db, record_id, suite="S1") == CASES[:2]
+    assert testcase_store.load_testcases(db, record_id, result="Block") == [CASES[2]]
+    assert testcase_store.load_testcases(db, record_id + 1) is None
+
+
+def test_stats_are_counted_by_sql(db):
+    record_id = insert(db, CASES)
+    stats = testcase_store.record_stats(db, record_id)
+    assert stats == report_service.record_stats(CASES)
+    assert list(stats["suites"]) == ["S1", "S2", "Root"]
+
+
+def test_save_replaces_rows(db):
+    record_id = insert(db, CASES)
+    testcase_store.save_testcases(db, record_id, CASES[:1])
+    db.commit()
+    assert testcase_store.load_testcases(db, record_id) == CASES[:1]
+    assert db.execute("SELECT COUNT(*) FROM test_steps WHERE record_id = ?", (record_id,)).fetchone()[0] == 3
+
+    testcase_store.save_testcases(db, record_id, [])
+    db.commit()
+    assert testcase_store.load_testcases(db, record_id) == []
+
+
+def test_unsupported_shapes_stay_json_text(db):
+    odd = [{"name": "ok", "steps": ["not a dict"]}, "not a case", {"name": "\ud800"}]
+    record_id = insert(db, odd)
+    assert db.execute("SELECT COUNT(*) FROM testcases WHERE record_id = ?", (record_id,)).fetchone()[0] == 0
+    assert testcase_store.load_testcases(db, record_id) == odd
+    assert testcase_store.load_testcases(db, record_id, ordinals=[1]) == ["not a case"]
+
+    surrogate = [{"name": "\ud800", "steps": []}]
+    record_id = insert(db, surrogate, name="surrogate.xmind")
+    assert testcase_store.load_testcases(db, record_id) == surrogate
+
+
+def test_legacy_records_are_read_then_normalized(db):
+    db.execute("INSERT INTO records (name, create_on, content) VALUES (?, ?, ?)",
+               ("legacy.xmind", "2024-01-01 00:00:00", json.dumps(CASES)))
+    db.commit()
+    record_id = db.execute("SELECT max(id) FROM records").fetchone()[0]
+    legacy_hash = testcase_store.record_content_hash(db, record_id)
+    assert testcase_store.load_testcases(db, record_id, ordinals=[1]) == [CASES[1]]
+    assert testcase_store.record_stats(db, record_id) == report_service.record_stats(CASES)
+
+    assert testcase_store.normalize_records(db) == 1
+    assert testcase_store.normalize_records(db) == 0
+    assert db.execute("SELECT content FROM records WHERE id = ?", (record_id,)).fetchone()[0] is None
+    assert testcase_store.load_testcases(db, record_id) == CASES
+    assert testcase_store.record_content_hash(db, record_id) == legacy_hash
+
+
+def test_existing_database_is_upgraded(isolated_settings):
+    from app.core.database import init_db
+
+    with closing(sqlite3.connect(isolated_settings.DATABASE_PATH)) as raw:
+        raw.executescript("DROP VIEW record_contents; DROP VIEW testcase_documents; DROP TABLE test_steps; "
+                          "DROP TABLE testcases; ALTER TABLE records DROP COLUMN content_hash; "
+                          "DROP TABLE schema_version;")
+    init_db()
+    with closing(connect()) as db:
+        record_id = insert(db, CASES)
+        assert testcase_store.load_testcases(db, record_id) == CASES
+
+
+def test_content_api_filters(client, isolated_settings):
+    with closing(connect()) as db:
+        record_id = insert(db, CASES)
+
+    assert client.get(f"/api/records/{record_id}/content").json() == CASES
+    assert client.get(f"/api/records/{record_id}/content", params={"cases": "2,0"}).json() == [CASES[2], CASES[0]]
+    assert client.get(f"/api/records/{record_id}/content", params={"suite": "S2"}).json() == [CASES[2]]
+
+    edited = CASES[:2]
+    assert client.put(f"/api/records/{record_id}", json={"content": edited, "version": 1}).json() == \
+        {"status": "success", "version": 2}
+    assert client.get(f"/api/records/{record_id}/content").json() == edited
+    assert client.get(f"/api/records/{record_id}/stats").json() == report_service.record_stats(edited)
@@ -0,0 +1,43 @@
+"""
+TestLink XML 流式输出测试
+"""
+from xml.etree import ElementTree
+
+from xmind2testcase.metadata import TestCase, TestStep, TestSuite
+from xmind2testcase import testlink
+
+
+def make_suites():
+    steps = [TestStep(1, "open <page>", "shows ]]> & more"), TestStep(2, "#skipped", "x")]
+    case = TestCase(name='say "hi"\nnow', summary="line1\nline2", preconditions="无", steps=steps)
+    return [TestSuite(name="P", details="", sub_suites=[
+        TestSuite(name="S", details="d", testcase_list=[case, TestCase(name="#ignored")]),
+        TestSuite(name="!skip", testcase_list=[]),
+    ])]
+
+
+def test_cdata_and_attributes_round_trip():
+    root = ElementTree.fromstring(testlink.testsuites_to_xml_content(make_suites()))
+    suites = root.findall("testsuite/testsuite")
+    assert [s.get("name") for s in suites] == ["S"]
+
+    cases = suites[0].findall("testcase")
+    assert [c.get("name") for c in cases] == ['say "hi"\nnow']
+    assert cases[0].findtext("summary") == "line1<br />\nline2"
+    assert cases[0].findtext("status") == "7"
+
+    steps = cases[0].findall("steps/step")
+    assert len(steps) == 1
+    assert steps[0].findtext("actions") == "open &lt;page&gt;"
+    assert steps[0].findtext("expectedresults") == "shows ]]&gt; &amp; more"
+
+
+def test_indentation_only_changes_whitespace():
+    def shape(element):
+        return element.tag, element.attrib, (element.text or "").strip(), [shape(c) for c in element]
+
+    chunks = list(testlink.iter_testlink_xml(make_suites()))
+    assert len(chunks) > 3 and "\n\t\t\t<testcase" in "".join(chunks)
+    compact = ElementTree.fromstring(testlink.testsuites_to_xml_content(make_suites()))
+    pretty = ElementTree.fromstring("".join(chunks).encode("utf-8"))
+    assert shape(pretty) == shape(compact)
@@ -0,0 +1,92 @@
+"""
+XMind 写出测试
+"""
+import json
+import shutil
+import sqlite3
+import zipfile
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+
+from xmind2testcase import writer
+from xmind2testcase.utils import get_xmind_testcase_list, get_xmind_testsuites
+
+docs_dir = Path(__file__).parent.parent / "docs"
+
+
+@pytest.fixture
+def testsuites():
+    return get_xmind_testsuites(str(docs_dir / "xmind_testcase_template_v1.1.xmind"))
+
+
+def strip_ids(topic):
+    if isinstance(topic, dict):
+        return {k: strip_ids(v) for k, v in topic.items() if k != "id"}
+    if isinstance(topic, list):
+        return [strip_ids(v) for v in topic]
+    return topic
+
+
+def test_streamed_content_matches_dict_content(testsuites):
+    content = writer.get_xmind_zen_content(testsuites, deterministic=True)
+    assert "".join(writer.iter_xmind_zen_content(testsuites, deterministic=True)) == json.dumps(content)
+    assert strip_ids(content) == strip_ids(writer.get_xmind_zen_content(testsuites))
+
+    ids = []
+    pending = [content[0]["rootTopic"]]
+    while pending:
+        topic = pending.pop()
+        ids.append(topic["id"])
+        pending.extend(topic.get("children", {}).get("attached", []))
+    assert len(ids) == len(set(ids))
+
+
+def test_deterministic_zip_is_byte_identical(testsuites):
+    first = writer.write_xmind_zip(testsuites, deterministic=True).getvalue()
+    assert writer.write_xmind_zip(testsuites, deterministic=True).getvalue() == first
+    assert writer.write_xmind_zip(testsuites).getvalue() != first
+
+    with zipfile.ZipFile(BytesIO(first)) as zf:
+        assert zf.namelist() == ["content.json", "manifest.json", "metadata.json"]
+        assert all(info.date_time == writer.ZIP_DATE_TIME for info in zf.infolist())
+        assert json.loads(zf.read("content.json")) == writer.get_xmind_zen_content(testsuites, deterministic=True)
+
+
+def test_written_file_parses_back(tmp_path, testsuites):
+    target = tmp_path / "round_trip.xmind"
+    with open(target, "wb") as f:
+        writer.write_xmind_zip(testsuites, fileobj=f, deterministic=True)
+
+    names = [case["name"] for case in get_xmind_testcase_list(str(target))]
+    assert names and len(names) == len(get_xmind_testcase_list(str(docs_dir / "xmind_testcase_template_v1.1.xmind")))
+
+
+def test_download_has_stable_etag(client, isolated_settings, monkeypatch):
+    from app.api.routers import conversion
+    from app.services.file_service import insert_record
+
+    shutil.copy(docs_dir / "xmind_testcase_template_v1.1.xmind", Path(isolated_settings.UPLOAD_FOLDER) / "case.xmind")
+    assert client.get("/case.xmind/to/xmind").status_code == 404
+
+    db = sqlite3.connect(isolated_settings.DATABASE_PATH)
+    cases = [{"name": "S > module > case", "suite": "S", "importance": 1, "execution_type": 1,
+              "steps": [{"step_number": 1, "actions": "do", "expectedresults": "done"}]}]
+    insert_record(db, "case.xmind", content=json.dumps(cases))
+    db.close()
+
+    first = client.get("/case.xmind/to/xmind")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    again = client.get("/case.xmind/to/xmind")
+    assert again.headers["etag"] == etag and again.content == first.content
+    assert client.get("/case.xmind/to/xmind", params={"cases": "0"}).headers["etag"] != etag
+
+    # a revalidation is answered from the record row alone, the test cases are not read
+    monkeypatch.setattr(conversion, "load_record_testcases", lambda *args: pytest.fail("test cases loaded"))
+    not_modified = client.get("/case.xmind/to/xmind", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304 and not not_modified.content
+    for header in (f'"other", {etag}', f"W/{etag}", "*"):
+        assert client.get("/case.xmind/to/xmind", headers={"If-None-Match": header}).status_code == 304
+    assert client.get("/case.xmind/to/xmind", headers={"If-None-Match": '"other", W/"another"'}).status_code == 200
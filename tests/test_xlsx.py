@@ -0,0 +1,74 @@
+"""
+XLSX 导出测试
+"""
+import csv
+import io
+import shutil
+import zipfile
+from pathlib import Path
+from xml.etree import ElementTree
+
+from xmind2testcase import xlsx, zentao
+from xmind2testcase.utils import get_xmind_testcase_list
+
+docs_dir = Path(__file__).parent.parent / "docs"
+NS = {"m": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+
+
+def sheet_rows(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert "[Content_Types].xml" in zf.namelist()
+        sheet = ElementTree.fromstring(zf.read("xl/worksheets/sheet1.xml"))
+    rows = []
+    for row in sheet.iterfind("m:sheetData/m:row", NS):
+        rows.append([cell.findtext("m:is/m:t", namespaces=NS) or cell.findtext("m:v", namespaces=NS) or ""
+                     for cell in row.iterfind("m:c", NS)])
+    return rows, sheet
+
+
+def test_rows_match_zentao_columns():
+    testcases = get_xmind_testcase_list(str(docs_dir / "xmind_testcase_template_v1.1.xmind"))
+    testcases[0] = dict(testcases[0], name=testcases[0]["name"] + " <&>\x01")
+    data = b"".join(xlsx.iter_xlsx(testcases))
+    assert data == b"".join(xlsx.iter_xlsx(testcases))
+
+    rows, sheet = sheet_rows(data)
+    csv_rows = list(csv.reader(io.StringIO(b"".join(zentao.iter_zentao_csv(testcases)).decode("utf-8"))))
+    assert rows[0] == zentao.FILEHEADER
+    assert len(rows) == len(csv_rows)
+    assert rows[1][1] == csv_rows[1][1].replace("\x01", "")
+    assert rows[1][3] == csv_rows[1][3].rstrip("\n") and "\n" in rows[1][3]
+
+    step_cell = sheet.find("m:sheetData/m:row[2]/m:c[4]", NS)
+    assert step_cell.get("s") == str(xlsx.STYLE_WRAPPED)
+
+
+def test_testcases_are_consumed_row_by_row():
+    consumed = []
+
+    def testcases():
+        for i in range(3):
+            consumed.append(i)
+            yield {"suite": "S", "name": f"case {i}", "preconditions": "", "importance": 1, "execution_type": 1,
+                   "steps": [{"step_number": 1, "actions": "do", "expectedresults": "done"}]}
+
+    pieces = xlsx.iter_sheet_xml(testcases())
+    for _ in range(4):  # sheet start, columns, sheetData, header row
+        next(pieces)
+    assert consumed == []
+    assert 'r="2"' in next(pieces) and consumed == [0]
+
+
+def test_download_route(client, isolated_settings):
+    shutil.copy(docs_dir / "xmind_testcase_template_v1.1.xmind", Path(isolated_settings.UPLOAD_FOLDER) / "case.xmind")
+
+    response = client.get("/case.xmind/to/xlsx")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == xlsx.MEDIA_TYPE
+    assert "case.xlsx" in response.headers["content-disposition"]
+    rows, _ = sheet_rows(response.content)
+    assert len(rows) == len(get_xmind_testcase_list(str(docs_dir / "xmind_testcase_template_v1.1.xmind"))) + 1
+
+    filtered, _ = sheet_rows(client.get("/case.xmind/to/xlsx", params={"cases": "0"}).content)
+    assert filtered == rows  # without a record the whole file is exported
+    assert client.get("/missing.xmind/to/xlsx").status_code == 404
@@ -0,0 +1,81 @@
+"""
+xmindparser 读取器测试
+"""
+import io
+import json
+from zipfile import ZipFile
+
+import pytest
+
+from xmindparser import xmind_to_dict, iter_xmind_sheets
+from xmindparser import zenreader
+
+
+def test_iter_json_array_small_chunks():
+    """逐块解码顶层数组，块边界落在任意位置都应得到完整结果"""
+    data = [{"title": "a\\u4e2d]", "n": 1}, [1, 2, {"x": "}"}], 12345, "s,t", None]
+    text = json.dumps(data)
+    for chunk_size in (1, 2, 3, 7, 1024):
+        assert list(zenreader.iter_json_array(io.StringIO(text), chunk_size)) == data
+
+
+def test_iter_json_array_rejects_truncated():
+    with pytest.raises(ValueError):
+        list(zenreader.iter_json_array(io.StringIO('[{"a": 1}, {"b"'), 4))
+
+
+def test_zen_streaming_matches_full_load(zen_xmind_file):
+    """流式读取与一次性 json.loads 的结果一致"""
+    with ZipFile(zen_xmind_file) as xmind:
+        sheets = json.loads(xmind.read("content.json").decode("utf-8"))
+
+    expected = [zenreader.sheet_to_dict(s) for s in sheets]
+    assert list(iter_xmind_sheets(str(zen_xmind_file))) == expected
+    assert xmind_to_dict(str(zen_xmind_file)) == expected
+
+
+@pytest.fixture(params=[False, True], ids=["default", "show_topic_id"])
+def show_topic_id(request, monkeypatch):
+    import xmindparser
+    monkeypatch.setitem(xmindparser.config, "showTopicId", request.param)
+    return request.param
+
+
+@pytest.mark.parametrize("name", [
+    "xmind_testcase_demo.xmind",
+    "xmind_testcase_template_v1.1.xmind",
+    "zentao_testcase_template.xmind",
+])
+def test_xreader_single_pass_matches_legacy(name, show_topic_id):
+    """单次遍历引擎与旧版 sheet_to_dict 输出完全一致（含评论、备注、标签、标记）"""
+    from pathlib import Path
+    from xmindparser import xreader
+
+    path = str(Path(__file__).parent.parent / "docs" / name)
+    xreader.open_xmind(path)
+    expected = [xreader.sheet_to_dict(s) for s in xreader.get_sheets()]
+
+    actual = list(xreader.iter_sheet_dicts(path))
+    assert json.dumps(actual, ensure_ascii=False) == json.dumps(expected, ensure_ascii=False)
+
+
+def test_zen_parallel_conversion_keeps_sheet_order(tmp_path, zen_xmind_file):
+    """并行模式下多 sheet 的转换结果与串行一致且顺序不变"""
+    with ZipFile(zen_xmind_file) as xmind:
+        sheets = json.loads(xmind.read("content.json").decode("utf-8"))
+
+    many = []
+    for i in range(6):
+        for sheet in sheets:
+            sheet = json.loads(json.dumps(sheet))
+            sheet["title"] = "{} {}".format(sheet["title"], i)
+            many.append(sheet)
+
+    target = tmp_path / "many.xmind"
+    with ZipFile(target, "w") as xmind:
+        xmind.writestr("content.json", json.dumps(many))
+
+    expected = xmind_to_dict(str(target))
+    assert [s["title"] for s in expected] == [s["title"] for s in many]
+    assert xmind_to_dict(str(target), workers=2) == expected
+    assert xmind_to_dict(str(target), workers=2, min_topics=10 ** 9) == expected
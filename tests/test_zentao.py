@@ -0,0 +1,60 @@
+"""
+禅道 CSV 流式导出测试
+"""
+import csv
+import io
+import shutil
+from pathlib import Path
+
+import pytest
+
+from xmind2testcase import zentao
+from xmind2testcase.utils import get_xmind_testcase_list
+
+docs_dir = Path(__file__).parent.parent / "docs"
+
+
+def test_step_text_is_joined_per_step():
+    steps = [{"step_number": 1, "actions": "a\nb ", "expectedresults": " r1"},
+             {"step_number": 2, "actions": "c", "expectedresults": ""}]
+    assert zentao.gen_case_step_and_expected_result(steps) == ("1. ab\n2. c\n", "1. r1\n")
+
+
+def test_chunks_concatenate_to_one_document():
+    testcases = get_xmind_testcase_list(str(docs_dir / "zentao_testcase_template.xmind")) * 50
+    whole = b"".join(zentao.iter_zentao_csv(testcases))
+    chunks = list(zentao.iter_zentao_csv(iter(testcases), chunk_size=512))
+    assert len(chunks) > 2 and b"".join(chunks) == whole
+
+    rows = list(csv.reader(io.StringIO(whole.decode("utf-8"))))
+    assert rows[0] == zentao.FILEHEADER and len(rows) == len(testcases) + 1
+
+
+def test_gbk_output_like_the_demo_file():
+    testcases = [{"suite": "商品列表", "name": "验证返回按钮 😀", "preconditions": "", "importance": 1,
+                  "execution_type": 1, "steps": [{"step_number": 1, "actions": "进入页面", "expectedresults": "返回"}]}]
+    data = b"".join(zentao.iter_zentao_csv(testcases, encoding="gbk"))
+    demo = (docs_dir / "zentao_testcase_template_demo(gbk).csv").read_bytes()
+
+    text = data.decode("gbk")
+    assert demo.decode("gbk").split("\r\n")[0].startswith("所属模块,") and text.startswith("所属模块,")
+    assert "\r\n" in text and "验证返回按钮 ?" in text
+
+    with pytest.raises(ValueError):
+        list(zentao.iter_zentao_csv(testcases, encoding="latin-1"))
+
+
+def test_download_streams_without_disk(client, isolated_settings, monkeypatch):
+    from app.services.export_cache import export_cache
+
+    monkeypatch.setattr(export_cache, "max_bytes", 0)
+    upload_folder = Path(isolated_settings.UPLOAD_FOLDER)
+    shutil.copy(docs_dir / "zentao_testcase_template.xmind", upload_folder / "case.xmind")
+
+    response = client.get("/case.xmind/to/zentao", params={"encoding": "gbk"})
+    assert response.status_code == 200
+    assert "charset=gbk" in response.headers["content-type"]
+    assert response.content.decode("gbk").startswith("所属模块,")
+    assert not list(upload_folder.glob("*.csv")) and not (upload_folder / ".exports").exists()
+
+    assert client.get("/case.xmind/to/zentao", params={"encoding": "latin-1"}).status_code == 400